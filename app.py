@@ -3,6 +3,7 @@ from src.services.data_extraction import main as extract_main
 from src.services.data_processing import main as process_main
 from src.services.data_embedding import main as embed_main
 from src.services.opensearch_indexing import main as index_main
+from src.services.embed_and_index import main as embed_index_main
 from src.services.querying import main as query_main
 import warnings
 warnings.filterwarnings("ignore")   
@@ -25,6 +26,9 @@ if __name__ == "__main__":
     # print("\nDATA INDEXING...\n")
     # index_main()
 
+    # print("\nDATA EMBEDDING + INDEXING (one streaming pass, replaces the two steps above)...\n")
+    # embed_index_main(embed_chunks=False, doc_limit=None)
+
     # print("\nGETTING CHAT READY...\n")
     # answer = query_main()
     # print(answer)
\ No newline at end of file
@@ -31,6 +31,31 @@ attachment_chunks_dir = os.path.join(data_dir, "chunked_attachments")
 thread_documents_dir = os.path.join(data_dir, "thread_documents")             
 stripped_emails_dir = os.path.join(data_dir, "stripped_emails")
 email_attachment_dir = os.path.join(data_dir, "email_attachment_doc")  
+thread_maps_dir = os.path.join(data_dir, "indexes", "thread_maps")
+attachment_index_path = os.path.join(data_dir, "indexes", "attachment_index.json")
+corpus_index_path = os.path.join(data_dir, "indexes", "corpus_index.jsonl")
+parse_cache_path = os.path.join(data_dir, "cache", "parse_cache.sqlite")
+llm_cache_path = os.path.join(data_dir, "cache", "llm_cache.sqlite")
+embedding_cache_path = os.path.join(data_dir, "cache", "embedding_cache.sqlite")
+vector_compression_path = os.path.join(data_dir, "indexes", "vector_compression.npz")
+vector_logs_dir = os.path.join(data_dir, "indexes", "vectors")
+near_duplicates_path = os.path.join(data_dir, "indexes", "near_duplicates.json")
+sender_suppression_path = os.path.join(data_dir, "indexes", "sender_suppression.json")
+stale_thread_docs_path = os.path.join(data_dir, "indexes", "stale_thread_docs.json")
+batch_jobs_dir = os.path.join(data_dir, "batches")
+benchmarks_dir = os.path.join(data_dir, "benchmarks")
+quarantine_dir = os.path.join(data_dir, "quarantine")
+quarantine_report_path = os.path.join(quarantine_dir, "quarantine_report.jsonl")
+
+# Bump a parser's version whenever its output changes, so cached results are re-extracted
+PARSER_VERSIONS = {
+    "scannable_pdf": 1,
+    "image_pdf": 1,
+    "image": 1,
+    "tabular": 2,
+    "word_doc": 1,
+    "text": 1,
+}
 
 
 # poppler_path = r"C:\Users\jklas\Downloads\Release-24.08.0-0\poppler-24.08.0\Library\bin"
@@ -39,6 +64,88 @@ email_attachment_dir = os.path.join(data_dir, "email_attachment_doc")
 poppler_path = os.path.join(apps_dir, "poppler", "Release-24.08.0-0", "poppler-24.08.0", "Library", "bin")
 tesseract_path = os.path.join(apps_dir, "tesseract", "tesseract.exe")
 
+ATTACHMENT_TIMEOUT_S = 120           # wall-clock limit per attachment parse before it's killed & quarantined
+ATTACHMENT_MEMORY_LIMIT_MB = None    # optional address-space cap for the parse worker (POSIX only)
+
+PDF_BACKEND = "pymupdf"              # "pymupdf" (fast, MuPDF) or "pypdf2"; shared by classifier and parser
+
+THREAD_SUBJECT_FALLBACK = False      # also merge threads sharing a normalized subject (for mail with broken headers)
+THREAD_SUBJECT_WINDOW_DAYS = 14      # ...when their time spans are at most this many days apart
+
+LLM_MAX_CONCURRENT = 20             # sliding window of in-flight API tasks per executor
+LLM_MAX_RETRIES = 5
+LLM_RPM = 500                       # chat completions: requests / tokens per minute budget
+LLM_TPM = 200_000
+EMBEDDINGS_RPM = 3_000              # embeddings: requests / tokens per minute budget
+EMBEDDINGS_TPM = 1_000_000
+RATE_LIMIT_COOLDOWN_S = 10          # pause after a 429 without a Retry-After header
+
+EMBEDDER = "openai"                 # "openai", "local" (CPU model from LOCAL_EMBEDDING_MODEL_PATH) or "hashing" (deterministic, for tests)
+LOCAL_EMBEDDING_MODEL_PATH = os.path.join(apps_dir, "models", "all-MiniLM-L6-v2")    # ONNX export (model.onnx + tokenizer.json) or sentence-transformers folder
+LOCAL_EMBEDDING_BATCH_SIZE = 64     # texts per forward pass
+LOCAL_EMBEDDING_THREADS = os.cpu_count() or 1
+LOCAL_EMBEDDING_WORKERS = 2         # batches in flight, sharing LOCAL_EMBEDDING_THREADS
+LOCAL_EMBEDDING_MAX_TOKENS = 256
+HASHING_EMBEDDING_DIM = 384
+EMBEDDING_DIMENSIONS = None         # text-embedding-3-* only: ask the API for shortened vectors (e.g. 512)
+
+VECTOR_PCA_DIM = None               # knn index: project vectors onto this many PCA components fitted on the corpus
+VECTOR_QUANTIZATION = None          # knn index: None (float32), "fp16" (faiss SQ encoder) or "int8" (byte vectors)
+RESCORE_OVERSAMPLE = 4              # compressed searches fetch k * this candidates, re-ranked exactly on the full vectors
+VECTOR_FIT_SAMPLE = 20_000          # corpus vectors used to fit PCA / the int8 scale
+
+EMBEDDINGS_BATCHED = True           # pack many texts per embeddings request instead of one request per document
+EMBEDDINGS_BATCH_INPUTS = 2048      # endpoint limit: inputs per request...
+EMBEDDINGS_BATCH_TOKENS = 300_000   # ...and tokens summed over all inputs of a request
+EMBEDDINGS_MAX_INPUT_TOKENS = 8191  # longer inputs are truncated to the model's context
+
+EMBEDDING_CACHE_ENABLED = True      # (model, sha256(text)) → float32 vector, shared by ingestion and querying
+EMBEDDING_CACHE_MAX_ENTRIES = 2_000_000
+EMBEDDING_CACHE_MAX_MB = 4096       # least-recently-used vectors are evicted beyond either limit
+EMBEDDING_CACHE_COMMIT_EVERY = 500  # writes batched per commit (and eviction check)
+
+BATCH_MAX_REQUESTS = 50_000         # Batch API cap of requests per input file
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_S = 60                   # seconds between batch status polls
+BATCH_MAX_RETRIES = 2               # resubmissions of failed batch requests
+
+STREAM_QUEUE_BATCHES = 4            # fused embed-and-index stage: packed batches read ahead of the embedders...
+STREAM_QUEUE_DOCS = 5_000           # ...and embedded documents waiting for bulk indexing (bounded, so memory stays flat)
+STREAM_EMBED_WORKERS = 8            # batches being embedded at once (one request each, under the shared rate budget)
+STREAM_INDEX_BATCH = 500            # documents per bulk request
+
+PROGRESSIVE_SLICE = "month"         # progressive ingestion slice size: "day", "month" or "year"
+
+THREAD_DEDUP_ENABLED = True         # drop reply text repeated from the in_reply_to parent (quotes, forwarded chains)
+REDUNDANCY_THRESHOLD = 0.8          # share of a sentence's word shingles found in the parent to count as repeated
+REDUNDANCY_SHINGLE_SIZE = 3         # words per shingle
+
+NEAR_DUP_ENABLED = True             # skip near-duplicate emails (newsletters, automated reports) in LLM / index stages
+NEAR_DUP_THRESHOLD = 0.8            # estimated Jaccard similarity of word shingles to count as a duplicate
+NEAR_DUP_SHINGLE_SIZE = 5           # words per shingle
+NEAR_DUP_NUM_PERM = 64              # MinHash permutations...
+NEAR_DUP_BANDS = 16                 # ...split into LSH bands (rows = NUM_PERM / BANDS)
+NEAR_DUP_MIN_WORDS = 20             # shorter bodies ("Thanks!") are never treated as duplicates
+
+SENDER_SUPPRESSION_ENABLED = True   # learn bulk / automated senders from corpus statistics and skip their mail in costly stages
+BULK_MIN_MESSAGES = 5               # senders with fewer messages are never suppressed
+BULK_MAX_REPLY_RATE = 0.05          # ...nor senders whose mail gets replies more often than this
+BULK_UNSUBSCRIBE_SHARE = 0.5        # share of a sender's messages with a List-Unsubscribe header to count as a mailing list
+BULK_BOILERPLATE_SHARE = 0.3        # average share of a body taken by BOILERPLATE footers to count as templated
+BULK_SENDER_PATTERNS = [r"^no-?reply", r"^do-?not-?reply", r"^notifications?@", r"^mailer-daemon@", r"^newsletters?@", r"^marketing@"]
+SENDER_ALLOWLIST = []               # addresses / @domains that are never suppressed
+
+THREAD_DELTA_SUMMARIES = True       # threads that only gained messages: summarize previous summary + new messages only
+MAP_REDUCE_SUMMARIES = True         # threads longer than one prompt: summarize chunks concurrently, then combine
+MAP_CHUNK_TOKENS = 3000             # tokens per map-step chunk
+MAX_REDUCE_ROUNDS = 4              # reduce rounds before the combined partial summaries are truncated instead
+
+TABULAR_RENDER_MODE = "compact"      # "compact" = schema + stats + first/last rows, "full" = whole table as markdown
+TABULAR_CHUNK_ROWS = 10_000          # rows read per streamed chunk
+TABULAR_HEAD_ROWS = 20               # first N rows kept in compact mode (smaller tables are rendered whole)
+TABULAR_TAIL_ROWS = 5                # last N rows kept in compact mode
+TABULAR_MAX_CELL_CHARS = 200         # per-cell truncation in compact mode
+
 num_emails= 5000
 n_char=None
 verbosity = 100
@@ -70,6 +177,10 @@ EMAILS_INDEX = "email_documents"
 MAX_TOKENS = 400   # ideal chunk length
 OVERLAP = 50    # tokens of overlap between chunks
 ENCODER_NAME = "cl100k_base"  # or whichever matches your 4o embedding
+TOKENIZER_THREADS = os.cpu_count() or 1     # encode_batch threads for token counting
+TOKENIZER_PIECE_CHARS = 20_000              # long texts are counted in pieces of about this many characters, in parallel
+TOKEN_COUNT_CACHE_SIZE = 10_000             # LRU of token counts for repeated strings...
+TOKEN_COUNT_CACHE_MAX_CHARS = 20_000        # ...up to this long
 
 SMALL_QUERY_MODEL       = "gpt-3.5-turbo"       # Max 4 096 tokens
 QUERY_MODEL             = "gpt-3.5-turbo-16k"   # Max 16 000 tokens
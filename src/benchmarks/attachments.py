@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+import multiprocessing as mp
+from config import *
+from src.benchmarks.fixtures import generate_fixtures
+from src.tools.pdf_backends import get_pdf_backend
+from src.tools.attachemnt_classifier import AttachmentClassifier
+from src.tools.parsing import extract_scannable_pdf, extract_image_pdf, extract_image, extract_tabular, extract_word_doc
+
+try:
+    import resource                                             # POSIX only, used for peak RSS
+except ImportError:
+    resource = None
+
+# stage name → (fixture kinds it consumes, function(paths, fixtures_dir))
+def _classify_types(paths, fixtures_dir):
+    AttachmentClassifier(fixtures_dir, SUPPORTED_EXTENSIONS).get_types()
+
+def _classify_pdfs(paths, fixtures_dir):
+    classifier = AttachmentClassifier(fixtures_dir, SUPPORTED_EXTENSIONS)
+    classifier.get_types()
+    classifier.get_scannable_pdfs()
+
+def _classify_images(paths, fixtures_dir):
+    classifier = AttachmentClassifier(fixtures_dir, SUPPORTED_EXTENSIONS)
+    classifier.get_types()
+    classifier.get_relevant_images()
+
+def _each(extract_fn):
+    def run(paths, fixtures_dir):
+        for path in paths:
+            extract_fn(path)
+    return run
+
+STAGES = {
+    "classify_types":       (["digital_pdf", "image_pdf", "text_png", "blank_png", "csv", "xlsx", "docx"], _classify_types),
+    "classify_pdfs":        (["digital_pdf", "image_pdf"], _classify_pdfs),
+    "classify_images":      (["text_png", "blank_png"], _classify_images),
+    "parse_scannable_pdfs": (["digital_pdf"], _each(extract_scannable_pdf)),
+    "parse_image_pdfs":     (["image_pdf"], _each(extract_image_pdf)),
+    "parse_images":         (["text_png"], _each(extract_image)),
+    "parse_tabular":        (["csv", "xlsx"], _each(extract_tabular)),
+    "parse_word_docs":      (["docx"], _each(extract_word_doc)),
+}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)   # bytes on macOS, KB on Linux
+
+
+def _stage_worker(stage, paths, fixtures_dir, queue):
+    """Runs one stage in a fresh process so its peak RSS isn't polluted by earlier stages."""
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        STAGES[stage][1](paths, fixtures_dir)
+        error = None
+    except Exception as e:
+        error = repr(e)
+    elapsed = time.perf_counter() - start
+    queue.put({"seconds": elapsed, "peak_rss_mb": _peak_rss_mb(), "baseline_rss_mb": baseline, "error": error})
+
+
+def _count_pages(paths):
+    pages = 0
+    for path in paths:
+        if path.lower().endswith(".pdf"):
+            try:
+                pages += get_pdf_backend().page_count(path)
+            except Exception:
+                pass
+    return pages
+
+
+def run_benchmarks(fixtures, fixtures_dir, stages=None, repeats=1):
+    results = {}
+    for stage in stages or STAGES:
+        kinds, _ = STAGES[stage]
+        paths = [p for kind in kinds for p in fixtures.get(kind, [])]
+        pages = _count_pages(paths)
+
+        runs = []
+        for _ in range(repeats):
+            queue = mp.Queue()
+            proc = mp.Process(target=_stage_worker, args=(stage, paths, fixtures_dir, queue))
+            proc.start()
+            runs.append(queue.get())
+            proc.join()
+
+        best = min(runs, key=lambda r: r["seconds"])
+        seconds = best["seconds"]
+        results[stage] = {
+            "files": len(paths),
+            "pages": pages,
+            "seconds": round(seconds, 3),
+            "files_per_s": round(len(paths) / seconds, 2) if seconds else None,
+            "pages_per_s": round(pages / seconds, 2) if seconds and pages else None,
+            "peak_rss_mb": max(r["peak_rss_mb"] or 0 for r in runs) or None,
+            "baseline_rss_mb": best["baseline_rss_mb"],
+            "error": best["error"]
+        }
+        r = results[stage]
+        print(f"   -> {stage:22s} {r['files_per_s']} files/s, {r['pages_per_s']} pages/s, peak RSS {r['peak_rss_mb']} MB"
+              + (f" [ERROR {r['error']}]" if r["error"] else ""))
+    return results
+
+
+def compare_runs(old_path, new_path):
+    """Prints per-stage throughput and memory deltas between two result files."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)["stages"]
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)["stages"]
+
+    for stage in new:
+        if stage not in old:
+            continue
+        o, n = old[stage], new[stage]
+        speedup = round(n["files_per_s"] / o["files_per_s"], 2) if o.get("files_per_s") and n.get("files_per_s") else None
+        rss = round((n["peak_rss_mb"] or 0) - (o["peak_rss_mb"] or 0), 1)
+        print(f"   -> {stage:22s} {o['files_per_s']} → {n['files_per_s']} files/s (x{speedup}), peak RSS {rss:+} MB")
+
+
+def main(fixtures_dir=os.path.join(benchmarks_dir, "fixtures"), n_files=5, stages=None, repeats=1, compare_to=None):
+    print(f"Generating synthetic fixtures in '{fixtures_dir}'...")
+    fixtures = generate_fixtures(fixtures_dir, n_files=n_files)
+
+    print("Running attachment benchmarks...")
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"PDF_BACKEND": PDF_BACKEND, "TABULAR_RENDER_MODE": TABULAR_RENDER_MODE, "n_files": n_files, "repeats": repeats},
+        "stages": run_benchmarks(fixtures, fixtures_dir, stages, repeats)
+    }
+
+    os.makedirs(benchmarks_dir, exist_ok=True)
+    out_path = os.path.join(benchmarks_dir, f"attachments_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out_path}")
+
+    if compare_to:
+        print(f"Comparing against {compare_to}:")
+        compare_runs(compare_to, out_path)
+    return results
+
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m src.benchmarks.attachments
@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+from opensearchpy.serializer import JSONSerializer
+from config import *
+from src.benchmarks.embeddings import SimulatedEmbeddingsAPI, write_thread_docs
+from src.tools.async_executor import AsyncExecutor
+from src.tools.embedders import OpenAIEmbedder
+from src.services.data_embedding import async_embed_paths
+from src.services.opensearch_indexing import index_paths
+from src.services.embed_and_index import embed_and_index_paths
+
+
+class SimulatedOpenSearch():
+    """
+    Offline stand-in for the OpenSearch client as used by helpers.bulk: every bulk
+    request blocks for a fixed round trip plus a little per document.
+    """
+    def __init__(self, latency_s=0.1, per_doc_s=0.0002):
+        self.latency_s = latency_s
+        self.per_doc_s = per_doc_s
+        self.bulk_requests = 0
+        self.indexed = 0
+        self.transport = SimpleNamespace(serializer=JSONSerializer())
+        self.indices = SimpleNamespace(refresh=lambda index: None)
+
+    def bulk(self, body, *args, **kwargs):
+        lines = body.splitlines()
+        ids = [json.loads(line)["index"]["_id"] for line in lines[::2]]
+        self.bulk_requests += 1
+        self.indexed += len(ids)
+        time.sleep(self.latency_s + self.per_doc_s * len(ids))
+        return {"errors": False, "items": [{"index": {"_id": i, "status": 201}} for i in ids]}
+
+
+def run_two_pass(paths):
+    """data_embedding (rewrites every document) followed by opensearch indexing (re-reads them)."""
+    client, os_client = SimulatedEmbeddingsAPI(), SimulatedOpenSearch()
+    executor = AsyncExecutor("embeddings", rpm=EMBEDDINGS_RPM, tpm=EMBEDDINGS_TPM)
+    start = time.perf_counter()
+    asyncio.run(async_embed_paths(paths, total=len(paths), executor=executor, embedder=OpenAIEmbedder(client=client), use_cache=False))
+    index_paths(os_client, paths, "bench", batch_size=STREAM_INDEX_BATCH)
+    return time.perf_counter() - start, client, os_client
+
+
+def run_fused(paths):
+    client, os_client = SimulatedEmbeddingsAPI(), SimulatedOpenSearch()
+    executor = AsyncExecutor("embeddings", rpm=EMBEDDINGS_RPM, tpm=EMBEDDINGS_TPM)
+    start = time.perf_counter()
+    asyncio.run(embed_and_index_paths(paths, os_client, "bench", total=len(paths), executor=executor,
+                                      embedder=OpenAIEmbedder(client=client), use_cache=False))
+    return time.perf_counter() - start, client, os_client
+
+
+def main(n_docs=20_000, fixtures_dir=os.path.join(benchmarks_dir, "embed_index_fixtures")):
+    """
+    Embeds and indexes the same synthetic thread documents in two passes (embed and
+    rewrite, then re-read and bulk-index) and with the fused streaming stage, against
+    the simulated embeddings API and a simulated OpenSearch bulk endpoint.
+    """
+    print(f"Benchmarking embedding + indexing on {n_docs} documents (simulated APIs)...")
+    results = {}
+    for mode, run in (("two_pass", run_two_pass), ("fused", run_fused)):
+        paths = write_thread_docs(fixtures_dir, n_docs)         # fresh documents without embeddings
+        seconds, client, os_client = run(paths)
+        results[mode] = r = {
+            "documents": n_docs,
+            "seconds": round(seconds, 3),
+            "docs_per_s": round(n_docs / seconds, 1),
+            "embedding_requests": client.requests,
+            "bulk_requests": os_client.bulk_requests,
+            "indexed": os_client.indexed,
+            "fixtures_mb": round(sum(os.path.getsize(p) for p in paths) / 2**20, 1)
+        }
+        print(f"   -> {mode:8s} {r['docs_per_s']} docs/s, {r['embedding_requests']} embedding + {r['bulk_requests']} bulk requests, "
+              f"{r['seconds']}s, documents on disk {r['fixtures_mb']} MB")
+
+    speedup = round(results["fused"]["docs_per_s"] / results["two_pass"]["docs_per_s"], 1)
+    print(f"[INFO] Fused embed-and-index: x{speedup} documents/s")
+
+    os.makedirs(benchmarks_dir, exist_ok=True)
+    out_path = os.path.join(benchmarks_dir, f"embed_and_index_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "config": {"n_docs": n_docs, "STREAM_EMBED_WORKERS": STREAM_EMBED_WORKERS, "STREAM_INDEX_BATCH": STREAM_INDEX_BATCH,
+                       "STREAM_QUEUE_BATCHES": STREAM_QUEUE_BATCHES, "STREAM_QUEUE_DOCS": STREAM_QUEUE_DOCS},
+            "modes": results
+        }, f, indent=2)
+    print(f"Results written to {out_path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m src.benchmarks.embed_and_index
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+from config import *
+from src.benchmarks.fixtures import WORDS
+from src.tools.async_executor import AsyncExecutor
+from src.tools.embedders import OpenAIEmbedder
+from src.services.data_embedding import async_embed_paths
+
+
+class SimulatedEmbeddingsAPI():
+    """
+    Offline stand-in for AsyncOpenAI().embeddings: every request costs a fixed
+    round trip plus a little per input, and returns zero vectors in input order.
+    """
+    def __init__(self, latency_s=0.2, per_input_s=0.0005, dimension=1536):
+        self.latency_s = latency_s
+        self.per_input_s = per_input_s
+        self.dimension = dimension
+        self.requests = 0
+        self.embeddings = self
+
+    async def create(self, model, input):
+        texts = [input] if isinstance(input, str) else input
+        self.requests += 1
+        await asyncio.sleep(self.latency_s + self.per_input_s * len(texts))
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=[0.0] * self.dimension) for i in range(len(texts))
+        ])
+
+
+def write_thread_docs(out_dir, n_docs, seed=0):
+    """Synthetic thread documents with summaries of ~60–250 words."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(n_docs):
+        path = os.path.join(out_dir, f"bench-thread-{i}.json")
+        summary = " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 250)))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"type": "thread", "thread_id": f"bench-thread-{i}", "summary_text": summary}, f)
+        paths.append(path)
+    return paths
+
+
+async def run_mode(paths, batched, simulate):
+    client = SimulatedEmbeddingsAPI() if simulate else None
+    executor = AsyncExecutor("embeddings", rpm=EMBEDDINGS_RPM, tpm=EMBEDDINGS_TPM)     # fresh rate budget per mode
+    start = time.perf_counter()
+    embedder = OpenAIEmbedder(client=client)
+    await async_embed_paths(paths, total=len(paths), batched=batched, executor=executor, embedder=embedder, use_cache=False)
+    seconds = time.perf_counter() - start
+    return {
+        "documents": len(paths),
+        "seconds": round(seconds, 3),
+        "docs_per_s": round(len(paths) / seconds, 1),
+        "requests": client.requests if client else executor.completed + executor.failed,
+    }
+
+
+def main(n_docs=1000, simulate=True, fixtures_dir=os.path.join(benchmarks_dir, "embedding_fixtures")):
+    """
+    Embeds the same synthetic thread documents one request per document and with
+    token-aware batching, under the configured embeddings rate limits. `simulate`
+    uses SimulatedEmbeddingsAPI instead of the OpenAI API.
+    """
+    print(f"Benchmarking embeddings on {n_docs} documents ({'simulated API' if simulate else EMBEDDINGS_MODEL})...")
+    results = {}
+    for mode, batched in (("one_per_request", False), ("batched", True)):
+        paths = write_thread_docs(fixtures_dir, n_docs)         # fresh documents without embeddings
+        results[mode] = asyncio.run(run_mode(paths, batched, simulate))
+        r = results[mode]
+        print(f"   -> {mode:16s} {r['docs_per_s']} docs/s, {r['requests']} requests, {r['seconds']}s")
+
+    speedup = round(results["batched"]["docs_per_s"] / results["one_per_request"]["docs_per_s"], 1)
+    print(f"[INFO] Batched embedding: x{speedup} documents/s")
+
+    os.makedirs(benchmarks_dir, exist_ok=True)
+    out_path = os.path.join(benchmarks_dir, f"embeddings_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "config": {"n_docs": n_docs, "simulate": simulate, "EMBEDDINGS_RPM": EMBEDDINGS_RPM,
+                       "EMBEDDINGS_BATCH_INPUTS": EMBEDDINGS_BATCH_INPUTS, "EMBEDDINGS_BATCH_TOKENS": EMBEDDINGS_BATCH_TOKENS},
+            "modes": results
+        }, f, indent=2)
+    print(f"Results written to {out_path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m src.benchmarks.embeddings
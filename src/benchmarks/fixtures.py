@@ -0,0 +1,111 @@
+import os
+import random
+from config import *
+import pandas as pd                                             # Tabular data handling
+from PIL import Image, ImageDraw                                # Image handling (e.g. opening images, metadata extraction)
+
+WORDS = (
+    "invoice delivery route driver schedule payment station block shift depot van "
+    "parcel customer report weekly total amount account contract rate fuel update "
+    "request approval manager team meeting agenda summary performance review"
+).split()
+
+
+def _sentence(rng, n_words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def _fixture_name(kind, idx, ext):
+    """Mirrors the attachment naming used by parse_message_to_dict: _id_{message_id}_id_{filename}."""
+    return f"{id_marker}bench-{kind}-{idx}@example.com{id_marker}{kind}_{idx}.{ext}"
+
+
+def _text_image(rng, width=1200, height=800, lines=20):
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for i in range(lines):
+        draw.text((40, 30 + i * 36), _sentence(rng), fill="black")
+    return img
+
+
+def _noise_image(rng, width=900, height=600):
+    return Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+
+
+def make_digital_pdf(path, rng, pages=5):
+    import pymupdf
+    doc = pymupdf.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        text = "\n".join(_sentence(rng) for _ in range(40))
+        page.insert_text((50, 60), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def make_image_pdf(path, rng, pages=2):
+    images = [_text_image(rng) for _ in range(pages)]
+    images[0].save(path, "PDF", save_all=True, append_images=images[1:])
+
+
+def make_docx(path, rng, paragraphs=60):
+    from docx import Document
+    document = Document()
+    for _ in range(paragraphs):
+        document.add_paragraph(" ".join(_sentence(rng) for _ in range(4)))
+    document.save(path)
+
+
+def make_table(rng, rows):
+    return pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=rows, freq="min"),
+        "station": [rng.choice(["DLO1", "DBI2", "DEH1", "DWN2"]) for _ in range(rows)],
+        "route": [rng.randrange(1, 400) for _ in range(rows)],
+        "packages": [rng.randrange(0, 300) for _ in range(rows)],
+        "amount": [round(rng.uniform(0, 500), 2) for _ in range(rows)],
+        "note": [rng.choice(WORDS) for _ in range(rows)],
+    })
+
+
+def generate_fixtures(out_dir, n_files=5, pdf_pages=5, csv_rows=100_000, xlsx_rows=20_000, seed=0):
+    """
+    Writes a reproducible set of synthetic attachments into `out_dir`:
+    digital PDFs, image-only PDFs, PNGs with and without text, large CSV/XLSX and DOCX.
+    Returns {kind: [paths]}.
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    fixtures = {kind: [] for kind in ["digital_pdf", "image_pdf", "text_png", "blank_png", "csv", "xlsx", "docx"]}
+
+    for idx in range(n_files):
+        path = os.path.join(out_dir, _fixture_name("digital_pdf", idx, "pdf"))
+        make_digital_pdf(path, rng, pages=pdf_pages)
+        fixtures["digital_pdf"].append(path)
+
+        path = os.path.join(out_dir, _fixture_name("image_pdf", idx, "pdf"))
+        make_image_pdf(path, rng)
+        fixtures["image_pdf"].append(path)
+
+        path = os.path.join(out_dir, _fixture_name("text_png", idx, "png"))
+        _text_image(rng).save(path)
+        fixtures["text_png"].append(path)
+
+        path = os.path.join(out_dir, _fixture_name("blank_png", idx, "png"))
+        _noise_image(rng).save(path)
+        fixtures["blank_png"].append(path)
+
+        path = os.path.join(out_dir, _fixture_name("docx", idx, "docx"))
+        make_docx(path, rng)
+        fixtures["docx"].append(path)
+
+    # Large tables are expensive to generate, a couple of each is enough
+    for idx in range(2):
+        path = os.path.join(out_dir, _fixture_name("csv", idx, "csv"))
+        make_table(rng, csv_rows).to_csv(path, index=False)
+        fixtures["csv"].append(path)
+
+        path = os.path.join(out_dir, _fixture_name("xlsx", idx, "xlsx"))
+        make_table(rng, xlsx_rows).to_excel(path, index=False)
+        fixtures["xlsx"].append(path)
+
+    return fixtures
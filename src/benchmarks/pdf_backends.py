@@ -0,0 +1,95 @@
+import os
+import json
+import time
+from collections import Counter
+from config import *
+from src.tools.pdf_backends import PDF_BACKENDS, PyPDF2Backend
+
+
+def word_f1(candidate, reference):
+    """Bag-of-words F1 between two extractions, 1.0 = same words in the same amounts."""
+    cand = Counter(candidate.split())
+    ref = Counter(reference.split())
+    if not cand and not ref:
+        return 1.0
+    overlap = sum((cand & ref).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(cand.values())
+    recall = overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def benchmark_pdf_backends(pdf_paths, backend_names=tuple(PDF_BACKENDS), reference=PyPDF2Backend.name):
+    """
+    Extracts every PDF with each backend and reports files/s, pages/s and the
+    mean word-F1 of each backend's text against the `reference` backend.
+    """
+    texts = {}
+    results = {}
+
+    for name in backend_names:
+        try:
+            backend = PDF_BACKENDS[name]()
+        except ImportError as e:
+            print(f"[WARNING] Skipping backend {name!r}: {e}")
+            continue
+
+        texts[name] = {}
+        pages = chars = failures = 0
+        start = time.perf_counter()
+        for path in pdf_paths:
+            try:
+                page_texts = backend.page_texts(path)
+            except Exception:
+                failures += 1
+                continue
+            pages += len(page_texts)
+            text = "\n".join(t for t in page_texts if t)
+            chars += len(text)
+            texts[name][path] = text
+        elapsed = time.perf_counter() - start
+
+        results[name] = {
+            "files": len(pdf_paths),
+            "failures": failures,
+            "pages": pages,
+            "chars": chars,
+            "seconds": round(elapsed, 3),
+            "files_per_s": round(len(pdf_paths) / elapsed, 2) if elapsed else None,
+            "pages_per_s": round(pages / elapsed, 2) if elapsed else None
+        }
+
+    if reference in texts:
+        for name in texts:
+            shared = [p for p in texts[name] if p in texts[reference]]
+            scores = [word_f1(texts[name][p], texts[reference][p]) for p in shared]
+            results[name]["fidelity_vs_" + reference] = round(sum(scores) / len(scores), 4) if scores else None
+
+    return results
+
+
+def main(pdf_dir=attachments_dir, sample_size=200):
+    pdf_paths = sorted(
+        os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf")
+    )[:sample_size]
+    print(f"Benchmarking PDF backends on {len(pdf_paths)} PDFs from '{pdf_dir}'...")
+
+    results = benchmark_pdf_backends(pdf_paths)
+    for name, r in results.items():
+        print(f"   -> {name:8s} {r['pages_per_s']} pages/s, {r['files_per_s']} files/s, "
+              f"fidelity {r.get('fidelity_vs_' + PyPDF2Backend.name)}, failures {r['failures']}")
+
+    os.makedirs(benchmarks_dir, exist_ok=True)
+    out_path = os.path.join(benchmarks_dir, f"pdf_backends_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out_path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m src.benchmarks.pdf_backends
@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import time
+import random
+from datetime import datetime, timedelta, timezone
+from config import *
+from src.tools.thread_union_find import assign_threads
+
+
+def synthetic_corpus(n_messages, max_depth=10_000, broken_share=0.02, seed=0):
+    """
+    Builds (message_id, in_reply_to, references, subject, date) records made of
+    deep reply chains. Some messages only carry References, and a share lose all
+    their headers (only subject + date remain) to exercise the subject fallback.
+    Returns (records, expected { message_id: chain number }).
+    """
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    records, expected = [], {}
+    chain = 0
+    while len(records) < n_messages:
+        depth = min(rng.randint(1, max_depth), n_messages - len(records))
+        subject = f"thread {chain} about route {rng.randrange(1000)}"
+        refs = []
+        parent = None
+        for i in range(depth):
+            mid = f"c{chain}-m{i}@bench"
+            date = start + timedelta(days=chain * 30, minutes=i)
+            roll = rng.random()
+            if i and roll < broken_share:
+                records.append((mid, None, [], f"Re: {subject}", date))
+            elif i and roll < 0.2:
+                records.append((mid, None, refs[-5:], f"Re: {subject}", date))   # References only
+            else:
+                records.append((mid, parent, refs[-5:], subject if not i else f"Re: {subject}", date))
+            expected[mid] = chain
+            parent = mid
+            refs.append(mid)
+        chain += 1
+    return records, expected
+
+
+def thread_accuracy(thread_map, expected):
+    """Share of messages whose thread holds exactly their own chain."""
+    chains_per_thread = {}
+    for mid, tid in thread_map.items():
+        chains_per_thread.setdefault(tid, set()).add(expected[mid])
+    threads_per_chain = {}
+    for mid, tid in thread_map.items():
+        threads_per_chain.setdefault(expected[mid], set()).add(tid)
+    correct = sum(
+        1 for mid, tid in thread_map.items()
+        if len(chains_per_thread[tid]) == 1 and len(threads_per_chain[expected[mid]]) == 1
+    )
+    return correct / len(thread_map)
+
+
+def main(sizes=(50_000, 100_000, 250_000, 500_000), max_depth=10_000):
+    print(f"Benchmarking union-find threading (recursion limit {sys.getrecursionlimit()}, max chain depth {max_depth})...")
+    results = []
+    for n in sizes:
+        records, expected = synthetic_corpus(n, max_depth=max_depth)
+        for fallback in (False, True):
+            start = time.perf_counter()
+            thread_map = assign_threads(records, subject_fallback=fallback)
+            elapsed = time.perf_counter() - start
+            r = {
+                "messages": n,
+                "subject_fallback": fallback,
+                "seconds": round(elapsed, 3),
+                "messages_per_s": round(n / elapsed),
+                "us_per_message": round(elapsed / n * 1e6, 2),
+                "threads": len(set(thread_map.values())),
+                "accuracy": round(thread_accuracy(thread_map, expected), 4)
+            }
+            results.append(r)
+            print(f"   -> {n:>7} msgs, fallback={fallback!s:5}: {r['seconds']}s ({r['us_per_message']} µs/msg), "
+                  f"{r['threads']} threads, accuracy {r['accuracy']}")
+
+    os.makedirs(benchmarks_dir, exist_ok=True)
+    out_path = os.path.join(benchmarks_dir, f"thread_map_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out_path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m src.benchmarks.thread_map
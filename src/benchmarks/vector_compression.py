@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import numpy as np
+from config import *
+from src.tools.vector_compression import VectorCompressor, corpus_vectors
+
+HNSW_M = 16                                                     # OpenSearch default graph degree
+CONFIGS = (
+    ("float32",       None, None),
+    ("fp16",          None, "fp16"),
+    ("int8",          None, "int8"),
+    ("pca",           256,  None),
+    ("pca_int8",      256,  "int8"),
+)
+
+
+def synthetic_vectors(n, dimension=1536, clusters=50, seed=0):
+    """Unit vectors around `clusters` random topics, with a low-rank spread like real embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    basis = rng.standard_normal((64, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n)] + rng.standard_normal((n, 64)).astype(np.float32) @ basis * 0.3
+    vectors += rng.standard_normal((n, dimension)).astype(np.float32) * 0.5
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def top_k(queries, vectors, k):
+    """Exact top-k by l2 distance (= cosine ranking for the unit vectors searched here)."""
+    q, v = queries.astype(np.float32), vectors.astype(np.float32)
+    distances = (q ** 2).sum(axis=1)[:, None] - 2 * q @ v.T + (v ** 2).sum(axis=1)[None, :]
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def index_bytes(compressor):
+    """Per-vector native memory of the knn index: vector codes + HNSW graph (OpenSearch sizing formula)."""
+    bytes_per_value = {"fp16": 2, "int8": 1}.get(compressor.quantization, 4)
+    return round(1.1 * (bytes_per_value * compressor.index_dimension + 8 * HNSW_M))
+
+
+def source_bytes(compressor, vector):
+    """Per-document `_source` bytes of the vector fields (the JSON embedding + the stored full vector)."""
+    fields = compressor.doc_fields(vector)
+    return len(json.dumps(fields["embedding"])) + len(fields.get("embedding_full", ""))
+
+
+def run_config(pca_dim, quantization, docs, queries, truth, k):
+    compressor = VectorCompressor.fit(docs, pca_dim, quantization) if (pca_dim or quantization) else VectorCompressor(docs.shape[1])
+    start = time.perf_counter()
+    codes = compressor.compress(docs)
+    if quantization == "fp16":
+        codes = codes.astype(np.float16)                        # what the faiss SQfp16 encoder stores
+    found = top_k(compressor.compress(queries), codes, compressor.candidates(k))
+    seconds = time.perf_counter() - start
+
+    rescored = np.array([
+        c[np.argsort(-(docs[c] @ q))][:k] for q, c in zip(queries, found)  # exact cosine on the full vectors
+    ])
+    return {
+        "index_dimension": compressor.index_dimension,
+        "quantization": quantization or "float32",
+        "index_bytes_per_vector": index_bytes(compressor),
+        "index_mb": round(index_bytes(compressor) * len(docs) / 2**20, 2),
+        "source_bytes_per_doc": source_bytes(compressor, docs[0].tolist()),
+        "recall_at_k": round(recall(found[:, :k], truth), 4),
+        "recall_at_k_rescored": round(recall(rescored, truth), 4),
+        "seconds": round(seconds, 3)
+    }
+
+
+def main(n_docs=10_000, n_queries=200, k=10, use_corpus=True):
+    """
+    Recall@k, knn index memory and stored bytes of each compression setting against
+    the float32 baseline, with and without exact re-scoring of k * RESCORE_OVERSAMPLE
+    candidates. Uses the thread documents' embeddings when there are enough of them,
+    synthetic clustered vectors otherwise. Search is exact (no HNSW), so recall only
+    reflects the compression loss.
+    """
+    vectors = corpus_vectors(limit=n_docs + n_queries) if use_corpus and os.path.isdir(thread_documents_dir) else np.zeros((0, 0))
+    source = "corpus"
+    if len(vectors) < n_docs + n_queries:
+        vectors, source = synthetic_vectors(n_docs + n_queries), "synthetic"
+    docs, queries = vectors[:n_docs], vectors[n_docs:n_docs + n_queries]
+    truth = top_k(queries, docs, k)
+    print(f"Benchmarking vector compression on {len(docs)} {source} vectors ({docs.shape[1]}-d), {len(queries)} queries, recall@{k}...")
+
+    results = {}
+    for name, pca_dim, quantization in CONFIGS:
+        if pca_dim and pca_dim >= docs.shape[1]:
+            continue
+        results[name] = r = run_config(pca_dim, quantization, docs, queries, truth, k)
+        print(f"   -> {name:9s} {r['index_dimension']:>5}-d {r['quantization']:7s} {r['index_bytes_per_vector']:>6} B/vector "
+              f"({r['index_mb']} MB), recall {r['recall_at_k']:.3f}, rescored {r['recall_at_k_rescored']:.3f}")
+
+    os.makedirs(benchmarks_dir, exist_ok=True)
+    out_path = os.path.join(benchmarks_dir, f"vector_compression_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "config": {"n_docs": len(docs), "n_queries": len(queries), "k": k, "source": source,
+                       "dimension": int(docs.shape[1]), "RESCORE_OVERSAMPLE": RESCORE_OVERSAMPLE, "HNSW_M": HNSW_M},
+            "results": results
+        }, f, indent=2)
+    print(f"Results written to {out_path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
+
+
+# python -m src.benchmarks.vector_compression
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+from config import *
+from src.tools.safe_step import safe_step
+from src.tools.openai_batch import OpenAIBatchClient, LocalBatchClient, batch_request, write_request_files, read_jsonl, run_batch_job
+from src.tools.corpus_index import build_corpus_index
+from src.tools.thread_summaries import build_thread_map, group_threads, plan_thread_refresh, prune_thread_docs, iter_thread_docs
+from src.tools.thread_assignments import save_thread_map
+from src.tools.attachment_index import load_attachment_index
+from src.tools.async_thread_summaries import build_summary_messages, messages_cache_key, build_thread_doc, SUMMARY_TEMPERATURE
+from src.tools.llm_cache import LLMCache
+from src.tools.embedding_cache import get_embedding_cache
+from src.tools.embedders import OpenAIEmbedder, get_embedder
+from src.tools.near_duplicates import NearDuplicates
+from src.tools.sender_suppression import SenderSuppression
+from src.services.data_embedding import embedding_text
+
+
+def write_json(path, doc):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+
+
+@safe_step
+def batch_summarize_threads(client, work_dir, out_dir=thread_documents_dir, use_cache=True):
+    """
+    Writes one chat-completion request per new/changed thread (prompts built exactly
+    as in the online mode), runs them as batch jobs and writes the thread documents
+    from the results. Cached prompts are written straight away without a request.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    index = build_corpus_index(emails_dir)
+    thread_map = build_thread_map(index)                        # threads of the current index, as in data_processing.main
+    save_thread_map(thread_map)
+    attachment_index = load_attachment_index()
+    groups = group_threads(index, thread_map)
+    near_duplicates = NearDuplicates.load() if NEAR_DUP_ENABLED else None
+    suppression = SenderSuppression.load() if SENDER_SUPPRESSION_ENABLED else None
+    prune_thread_docs(out_dir, groups)
+    plan = plan_thread_refresh(groups, attachment_index, out_dir, near_duplicates=near_duplicates, suppression=suppression)
+    cache = LLMCache() if use_cache else None
+
+    # -----REQUEST FILES---------------------------------
+    # thread documents wait in a meta file (not in memory) until their summary arrives
+    meta_path = os.path.join(work_dir, "summary_meta.jsonl")
+    os.makedirs(work_dir, exist_ok=True)
+    cached = 0
+
+    def requests(meta):
+        nonlocal cached
+        for tid, data in iter_thread_docs(groups, index, attachment_index, plan):
+            messages = build_summary_messages(data)
+            key = messages_cache_key(messages)
+            doc = build_thread_doc(tid, data, None)
+
+            summary = cache.get(key) if cache is not None else None
+            if summary is not None:
+                write_json(os.path.join(out_dir, f"{tid}.json"), {**doc, "summary_text": summary})
+                cached += 1
+                continue
+
+            custom_id = f"summary:{tid}"
+            meta.write(json.dumps({"custom_id": custom_id, "key": key, "doc": doc}, ensure_ascii=False) + "\n")
+            yield batch_request(custom_id, "/v1/chat/completions", {
+                "model": SUMMARY_MODEL,
+                "messages": messages,
+                "temperature": SUMMARY_TEMPERATURE
+            })
+
+    with open(meta_path, "w", encoding="utf-8") as meta:
+        paths = write_request_files(requests(meta), work_dir, "summaries")
+    print(f"[INFO] Summary batch: {sum(1 for _ in read_jsonl(meta_path))} requests in {len(paths)} files, {cached} served from cache")
+
+    # -----SUBMIT + INGEST---------------------------------
+    results, errors = run_batch_job(client, paths, "/v1/chat/completions", work_dir)
+
+    written = 0
+    for m in read_jsonl(meta_path):
+        body = results.get(m["custom_id"])
+        if body is None:
+            continue
+        summary = body["choices"][0]["message"]["content"].strip()
+        if cache is not None:
+            cache.put(m["key"], SUMMARY_MODEL, SUMMARY_TEMPERATURE, summary)
+        write_json(os.path.join(out_dir, f"{m['doc']['thread_id']}.json"), {**m["doc"], "summary_text": summary})
+        written += 1
+
+    if cache is not None:
+        cache.close()
+    print(f"Done: {written + cached} thread documents written, {len(errors)} failed → {out_dir}")
+    return errors
+
+
+@safe_step
+def batch_embed_documents(client, work_dir, locations=(thread_documents_dir,), reembed=False):
+    """
+    Writes one embeddings request per document without an `embedding` (every
+    document with `reembed`), runs them as batch jobs and writes the vectors back.
+    Texts in the embedding cache are written straight away without a request.
+    """
+    if not isinstance(get_embedder(), OpenAIEmbedder):
+        print(f"[WARNING] The Batch API only embeds with OpenAI models; use data_embedding with EMBEDDER={EMBEDDER!r}")
+        return {}
+    embedder = get_embedder()
+    cache = get_embedding_cache()
+    cached = 0
+
+    def requests():
+        nonlocal cached
+        for location in locations:
+            for fn in sorted(os.listdir(location)):
+                if not fn.endswith(".json"):
+                    continue
+                path = os.path.join(location, fn)
+                with open(path, "r", encoding="utf-8") as f:
+                    content = json.load(f)
+                text = embedding_text(content)
+                if not text or (content.get("embedding") and not reembed):
+                    continue
+                vector = cache.get(embedder.name, text) if cache is not None else None
+                if vector is not None:
+                    write_json(path, {**content, "embedding": list(vector), "embedding_model": embedder.name})
+                    cached += 1
+                    continue
+                yield batch_request(f"embed:{path}", "/v1/embeddings", {"model": embedder.model, "input": text, **embedder.params})
+
+    paths = write_request_files(requests(), work_dir, "embeddings")
+    if not paths:
+        print(f"[INFO] Nothing to embed ({cached} served from cache)")
+        return {}
+
+    results, errors = run_batch_job(client, paths, "/v1/embeddings", work_dir)
+
+    for custom_id, body in results.items():
+        path = custom_id.split(":", 1)[1]
+        with open(path, "r", encoding="utf-8") as f:
+            content = json.load(f)
+        content["embedding"] = body["data"][0]["embedding"]
+        content["embedding_model"] = embedder.name
+        if cache is not None:
+            cache.put(embedder.name, embedding_text(content), content["embedding"])
+        write_json(path, content)
+
+    if cache is not None:
+        cache.flush()
+    print(f"Done: {len(results) + cached} documents embedded ({cached} from cache), {len(errors)} failed")
+    return errors
+
+
+def main(summarize=True, embed=True, results_dir=None):
+    """
+    Batch API mode for bulk summarization + embedding. With `results_dir`, runs
+    offline against LocalBatchClient and its pre-recorded result files.
+    """
+    client = LocalBatchClient(results_dir) if results_dir else OpenAIBatchClient()
+    work_dir = os.path.join(batch_jobs_dir, time.strftime("%Y%m%d_%H%M%S"))
+
+    # ---SUMMARIZING THREADS------------------------------
+    if summarize:
+        print("Batch summarizing threads...")
+        batch_summarize_threads(client, os.path.join(work_dir, "summaries"))
+        print()
+
+    # ---EMBEDDING THREAD DOCUMENTS------------------------------
+    if embed:
+        print("Batch embedding thread documents...")
+        batch_embed_documents(client, os.path.join(work_dir, "embeddings"))
+        print()
+
+
+if __name__ == "__main__":
+    main()
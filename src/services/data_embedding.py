@@ -1,63 +1,120 @@
 import os
 import json
 import asyncio
-from openai import AsyncOpenAI
 import aiofiles
-from tenacity import retry, stop_after_attempt, wait_exponential
 from src.tools.safe_step import safe_step
+from src.tools.async_executor import AsyncExecutor, get_executor, estimate_tokens
+from src.tools.embedding_batcher import prepare_input, pack_batches, embed_batch
+from src.tools.embedders import Embedder, get_embedder
+from src.tools.embedding_cache import EmbeddingCache, get_embedding_cache
 from config import *
 
 # Configuration
-MAX_CONCURRENT = 20
-BATCH_SIZE = MAX_CONCURRENT * 2
 PROGRESS_STEP = 100
+BATCH_PROGRESS_STEP = 10
 
-@retry(
-    stop=stop_after_attempt(5),
-    wait=wait_exponential(min=1, max=60)
-)
-async def call_embeddings(client: AsyncOpenAI, text: str):
-    return await client.embeddings.create(
-        model=EMBEDDINGS_MODEL,
-        input=text
-    )
-
-async def embed_file(path: str, client: AsyncOpenAI, sem: asyncio.Semaphore):
+def embedding_text(content: dict):
     """
-    Read JSON, generate embedding for chunk_text or summary_text, and write back.
+    The field a document is embedded on: chunk_text for emails/attachments, summary_text
+    for threads. Downgraded bulk-sender mail (`bulk_sender`) isn't embedded.
     """
-    async with sem:
-        # Read document
-        async with aiofiles.open(path, 'r', encoding='utf-8') as f:
-            content = json.loads(await f.read())
-
-        # Determine text field
-        doc_type = content.get('type')
-        if doc_type in ('email', 'attachment'):
-            text = content.get('chunk_text')
-        elif doc_type == 'thread':
-            text = content.get('summary_text')
-        else:
-            text = None
+    if content.get('bulk_sender'):
+        return None
+    doc_type = content.get('type')
+    if doc_type in ('email', 'attachment'):
+        return content.get('chunk_text')
+    if doc_type == 'thread':
+        return content.get('summary_text')
+    return None
+
+async def embed_file(path: str, executor: AsyncExecutor, embedder: Embedder | None = None, cache: EmbeddingCache | None = None):
+    """
+    Read JSON, generate embedding for chunk_text or summary_text (from the embedding
+    cache when it's there), and write back.
+    """
+    # Read document
+    async with aiofiles.open(path, 'r', encoding='utf-8') as f:
+        content = json.loads(await f.read())
+
+    # Determine text field
+    text = embedding_text(content)
+    if not text:
+        return False  # skip
+
+    # Call the embedder (API rate limits / retries handled by the executor)
+    embedder = embedder or get_embedder()
+    vector = cache.get(embedder.name, text) if cache is not None else None
+    if vector is None:
+        vector = (await embedder.aembed([text], executor, tokens=estimate_tokens(text)))[0]
+        if cache is not None:
+            cache.put(embedder.name, text, vector)
+
+    # Attach embedding and write back
+    content['embedding'] = list(vector)
+    content['embedding_model'] = embedder.name
+    async with aiofiles.open(path, 'w', encoding='utf-8') as f:
+        await f.write(json.dumps(content, ensure_ascii=False, indent=2))
 
-        if not text:
-            return False  # skip
+    return True
 
-        # Call embeddings API with retry
-        resp = await call_embeddings(client, text)
-        vector = resp.data[0].embedding
+def embedding_inputs(paths):
+    """Lazily reads the documents and yields (path, text, n_tokens) for those with text to embed."""
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = embedding_text(json.load(f))
+        if text:
+            yield (path, *prepare_input(text))
 
-        # Attach embedding and write back
-        content['embedding'] = vector
+async def embed_batch_files(batch, executor: AsyncExecutor, embedder: Embedder | None = None, cache: EmbeddingCache | None = None):
+    """
+    Embeds a packed batch of documents with one request (cached texts excluded) and
+    writes each vector back into its JSON. Returns (documents embedded, {path: error}).
+    """
+    embedder = embedder or get_embedder()
+    vectors, errors = await embed_batch(batch, executor, embedder, cache)
+    for path, vector in vectors.items():
+        async with aiofiles.open(path, 'r', encoding='utf-8') as f:
+            content = json.loads(await f.read())
+        content['embedding'] = list(vector)
+        content['embedding_model'] = embedder.name
         async with aiofiles.open(path, 'w', encoding='utf-8') as f:
             await f.write(json.dumps(content, ensure_ascii=False, indent=2))
+    return len(vectors), errors
 
-    return True
+async def async_embed_paths(paths, total: int | None = None, batched: bool = EMBEDDINGS_BATCHED,
+                            executor: AsyncExecutor | None = None, embedder: Embedder | None = None, use_cache: bool = True):
+    """
+    Embeds the given JSON documents through the shared executor's sliding window:
+    one request per document, or (`batched`) token-aware packed requests of many.
+    Texts already in the embedding cache don't reach the embedder.
+    """
+    executor = executor or get_executor("embeddings")
+    embedder = embedder or get_embedder()
+    cache = get_embedding_cache() if use_cache else None
+    if not batched:
+        async for path, _, error in executor.map(lambda p: embed_file(p, executor, embedder, cache), paths, total=total, label="embedded", progress_step=PROGRESS_STEP):
+            if error is not None:
+                print(f"❌ Error embedding {path}: {error}")
+        if cache is not None:
+            cache.report()
+            cache.flush()
+        return
+
+    embedded = failed = n_batches = 0
+    batches = pack_batches(embedding_inputs(paths))
+    async for batch, result, error in executor.map(lambda b: embed_batch_files(b, executor, embedder, cache), batches, label="batches", progress_step=BATCH_PROGRESS_STEP):
+        n_batches += 1
+        errors = {path: error for path, _, _ in batch} if error is not None else result[1]
+        embedded += result[0] if error is None else 0
+        failed += len(errors)
+        for path, e in errors.items():
+            print(f"❌ Error embedding {path}: {e}")
+    print(f"[INFO] Embedded {embedded}/{total or embedded + failed} documents in {n_batches} batches, {failed} failed")
+    if cache is not None:
+        cache.report()
+        cache.flush()
 
 async def async_embed_locations(locations: list[str], doc_limit: int | None):
-    client = AsyncOpenAI(api_key=SECRET_KEY)
-    sem = asyncio.Semaphore(MAX_CONCURRENT)
-
     for location in locations:
         print(f"Embedding files in '{location}'…")
         files = [f for f in os.listdir(location) if f.endswith('.json')]
@@ -69,26 +126,8 @@ async def async_embed_locations(locations: list[str], doc_limit: int | None):
         limit = doc_limit if doc_limit is not None else total
         items = files[:limit]
 
-        completed = 0
-        # process in batches to avoid huge task lists
-        for i in range(0, len(items), BATCH_SIZE):
-            batch = items[i:i + BATCH_SIZE]
-            tasks = [
-                asyncio.create_task(embed_file(
-                    os.path.join(location, fn), client, sem
-                ))
-                for fn in batch
-            ]
-
-            for coro in asyncio.as_completed(tasks):
-                result = False
-                try:
-                    result = await coro
-                except Exception as e:
-                    print(f"❌ Error embedding {location}: {e}")
-                completed += 1
-                if completed % PROGRESS_STEP == 0 or completed == limit:
-                    print(f"  → {completed}/{limit} embedded")
+        # sliding window over the files; progress is reported by the executor
+        await async_embed_paths((os.path.join(location, fn) for fn in items), total=len(items))
 
     print("All embeddings were generated.")
 
@@ -3,134 +3,150 @@ from src.tools.safe_step import *
 from src.tools.chunking import chunk_text
 from src.tools.attachemnt_classifier import AttachmentClassifier
 from src.tools.parsing import parse_scannable_pdfs, parse_image_pdf, parse_images, parse_tabular, parse_word_docs, save_txt_files
-from src.tools.thread_summaries import build_thread_docs, build_thread_map, normalize_id
+from src.tools.parse_cache import ParseCache
+from src.tools.attachment_watchdog import AttachmentWatchdog
+from src.tools.thread_summaries import group_threads, plan_thread_refresh, prune_thread_docs, iter_thread_docs, build_thread_map
+from src.tools.corpus_index import build_corpus_index
+from src.tools.thread_assignments import save_thread_map, load_thread_map
+from src.tools.attachment_index import load_attachment_index, attachment_key, split_attachment_filename
+from src.tools.near_duplicates import NearDuplicates, find_near_duplicates
+from src.tools.thread_dedup import RedundancyStats, remove_redundant_text
+from src.tools.sender_suppression import SenderSuppression, build_sender_suppression
 from src.tools.async_thread_summaries import *
 import json
-from collections import defaultdict
 from openai import OpenAI
 
 
 @safe_step
-def process_attachments(save_rel_img=True, parse_rel_img=True, parse_scan_pdf=True, parse_non_scan_pdf=True, parse_word=True, parse_tab=True, parse_txt=True):
+def process_attachments(save_rel_img=True, parse_rel_img=True, parse_scan_pdf=True, parse_non_scan_pdf=True, parse_word=True, parse_tab=True, parse_txt=True, use_cache=True, use_watchdog=True, suppression=None):
     classifier = AttachmentClassifier(attachments_dir, SUPPORTED_EXTENSIONS)
+    if suppression:                                             # no OCR / parsing for bulk-sender mail
+        bulk_keys = {attachment_key(mid) for mid in suppression.messages}
+        kept = [f for f in classifier.files if (split_attachment_filename(f) or (None,))[0] not in bulk_keys]
+        print(f"[INFO] {len(classifier.files) - len(kept)} bulk-sender attachments skipped")
+        classifier.files = kept
+    cache = ParseCache() if use_cache else None              # sha256(payload) + parser version → extracted text
+    watchdog = AttachmentWatchdog() if use_watchdog else None  # timeout / memory cap / quarantine per attachment
+    try:
+        if cache is not None:
+            cache.purge_stale()                                     # results of parsers whose version was bumped
+        attachment_index = load_attachment_index()                  # message_id → parsed attachment texts, filled as we parse
+
+        # -----CATEGORIZING---------------------------------
+        print("Segmenting attachments...")
+        categories = classifier.get_types()                         # Segments all attachments into categories (e.g. images, pdf, tabular)
+        print("Categorizing PDFs...")
+        pdf_categories = classifier.get_scannable_pdfs(watchdog=watchdog)     # Segments all PDFs into scannable or not_scannable
+        print("Categorizing Images...")
+        img_categories = classifier.get_relevant_images(watchdog=watchdog)    # Segments all images into relevant (with text) and not_relevent (logos, not text, small resoluton, etc.)
+
+        # -----CAT. REPORTS---------------------------------
+        for i in categories:
+            print(f"Count of {i}: {len(categories[i])}")
+        print()
+        for i in pdf_categories:
+            print(f"Count of {i}: {len(pdf_categories[i])}")    
+        print()
+        for i in img_categories:
+            print(f"Count of {i}: {len(img_categories[i])}")
 
-    # -----CATEGORIZING---------------------------------
-    print("Segmenting attachments...")
-    categories = classifier.get_types()                         # Segments all attachments into categories (e.g. images, pdf, tabular)
-    print("Categorizing PDFs...")
-    pdf_categories = classifier.get_scannable_pdfs()            # Segments all PDFs into scannable or not_scannable
-    print("Categorizing Images...")
-    img_categories = classifier.get_relevant_images()           # Segments all images into relevant (with text) and not_relevent (logos, not text, small resoluton, etc.)
-
-    # -----CAT. REPORTS---------------------------------
-    for i in categories:
-        print(f"Count of {i}: {len(categories[i])}")
-    print()
-    for i in pdf_categories:
-        print(f"Count of {i}: {len(pdf_categories[i])}")    
-    print()
-    for i in img_categories:
-        print(f"Count of {i}: {len(img_categories[i])}")
-
-    os.makedirs(parsed_attachments_dir, exist_ok=True)
-
-    # -----SAVING RELEVANT IMAGES---------------------------------
-    if save_rel_img:
-        print("Saving relevant images...")
-        if not classifier.save_relevant_images():
-            print("Error saving relevant images...")
-    
-    # # -----PARSING RELEVANT IMAGES---------------------------------
-    if parse_rel_img:
-        print("Parsing relevant images...")
-        parse_images(img_categories["relevant"], parsed_attachments_dir)
-
-    # # -----PARSING SCANNABLE PDFs---------------------------------
-    if parse_scan_pdf:
-        print("Parsing scannable PDFs...")
-        parse_scannable_pdfs(pdf_categories["scannable"], parsed_attachments_dir)
-
-    # # -----PARSING NON-SCANNABLE PDFs---------------------------------
-    if parse_non_scan_pdf:
-        print("Parsing non-scannable PDFs...")
-        parse_image_pdf(pdf_categories["non_scannable"], parsed_attachments_dir)
-
-    # -----PARSING TABULAR DATA---------------------------------
-    if parse_tab:
-        print("Parsing tabular data...")
-        parse_tabular(categories["tabular"], parsed_attachments_dir)
-
-    # -----PARSING WORD DOCUMNETS---------------------------------
-    if parse_word:
-        print("Parsing word documents...")
-        parse_word_docs(categories["word_doc"], parsed_attachments_dir)
-
-    # -----SAVING TXT DOCUMNETS---------------------------------
-    if parse_txt:
-        print("Parsing text documents...")
-        save_txt_files(categories["text"], parsed_attachments_dir)
-
-
-@safe_step
-def annotate_threads(emails_dir: str, thread_map: dict[str, str]) -> None:
-    """
-    Reads each email JSON in emails_dir, looks up its thread_id
-    in thread_map, and writes it back into the file.
-    """
-    for fn in os.listdir(emails_dir):
-        if not fn.endswith(".json"):
-            continue
-
-        path = os.path.join(emails_dir, fn)
-        with open(path, "r+", encoding="utf-8") as f:
-            content = json.load(f)
-
-            # normalize exactly as in build_thread_map
-            msg_id = (content.get("message_id") or "").strip("<>").lower()
-            content["thread_id"] = thread_map.get(msg_id)
+        os.makedirs(parsed_attachments_dir, exist_ok=True)
 
-            # overwrite with new thread_id
-            f.seek(0)
-            f.truncate()
-            json.dump(content, f, ensure_ascii=False, indent=2)
+        # -----SAVING RELEVANT IMAGES---------------------------------
+        if save_rel_img:
+            print("Saving relevant images...")
+            if not classifier.save_relevant_images():
+                print("Error saving relevant images...")
+    
+        # # -----PARSING RELEVANT IMAGES---------------------------------
+        if parse_rel_img:
+            print("Parsing relevant images...")
+            parse_images(img_categories["relevant"], parsed_attachments_dir, cache=cache, watchdog=watchdog, attachment_index=attachment_index)
+
+        # # -----PARSING SCANNABLE PDFs---------------------------------
+        if parse_scan_pdf:
+            print("Parsing scannable PDFs...")
+            parse_scannable_pdfs(pdf_categories["scannable"], parsed_attachments_dir, cache=cache, watchdog=watchdog, attachment_index=attachment_index)
+
+        # # -----PARSING NON-SCANNABLE PDFs---------------------------------
+        if parse_non_scan_pdf:
+            print("Parsing non-scannable PDFs...")
+            parse_image_pdf(pdf_categories["non_scannable"], parsed_attachments_dir, cache=cache, watchdog=watchdog, attachment_index=attachment_index)
+
+        # -----PARSING TABULAR DATA---------------------------------
+        if parse_tab:
+            print("Parsing tabular data...")
+            parse_tabular(categories["tabular"], parsed_attachments_dir, cache=cache, watchdog=watchdog, attachment_index=attachment_index)
+
+        # -----PARSING WORD DOCUMNETS---------------------------------
+        if parse_word:
+            print("Parsing word documents...")
+            parse_word_docs(categories["word_doc"], parsed_attachments_dir, cache=cache, watchdog=watchdog, attachment_index=attachment_index)
+
+        # -----SAVING TXT DOCUMNETS---------------------------------
+        if parse_txt:
+            print("Parsing text documents...")
+            save_txt_files(categories["text"], parsed_attachments_dir, cache=cache, watchdog=watchdog, attachment_index=attachment_index)
+
+        attachment_index.save()
+        print(f"[INFO] Attachment index: {len(attachment_index)} parsed attachments")
+    finally:
+        # -----CACHE REPORT---------------------------------
+        if cache:
+            cache.report()
+            cache.close()
+
+        # -----QUARANTINE REPORT---------------------------------
+        if watchdog:
+            watchdog.report()
+            watchdog.close()
 
 
 @safe_step
-def merge_emails_and_attachments():
+def merge_emails_and_attachments(index, thread_map):
     """
-    For each email JSON in `emails_dir`, find all .txt files in `parsed_attachments_dir`
-    whose filename embeds that email's message_id (_id_<message_id>_id_*.txt),
-    read their text, append under separators, and write a merged JSON to `email_attachment_dir`.
+    For each email in the corpus index, look up its parsed .txt attachments in the
+    attachment index, read their text, append under separators, join its thread_id from `thread_map`,
+    and write a merged JSON to `email_attachment_dir`. Near-duplicates are not written
+    (their representative carries the pointer list in `duplicate_message_ids`); replies
+    keep only the text not repeated from their in_reply_to parent. Suppressed bulk-sender
+    mail is not written either, downgraded bulk mail is written body-only.
     """
     os.makedirs(email_attachment_dir, exist_ok=True)
 
-    # Build map: message_id_normalized → [parsed txt attachment paths]
-    attach_map: dict[str, list[str]] = defaultdict(list)
-    for fn in os.listdir(parsed_attachments_dir):
-        if not fn.endswith(".txt"):
-            continue
-        parts = fn.split("_id_")
-        if len(parts) < 3:
-            continue
-        raw_msg_id = parts[1]
-        msg_id = normalize_id(raw_msg_id)
-        attach_map[msg_id].append(os.path.join(parsed_attachments_dir, fn))
+    attachment_index = load_attachment_index()
+    near_duplicates = NearDuplicates.load() if NEAR_DUP_ENABLED else NearDuplicates()
+    suppression = SenderSuppression.load() if SENDER_SUPPRESSION_ENABLED else SenderSuppression()
+    skipped = 0
+    suppressed = 0
+    by_id = {r["message_id"]: r for r in index}
+    dedup_stats = RedundancyStats()
 
     # Process each email
-    email_files = [f for f in os.listdir(emails_dir) if f.endswith(".json")]
-    for idx, fn in enumerate(email_files, start=1):
-        email_path = os.path.join(emails_dir, fn)
-        with open(email_path, "r", encoding="utf-8") as f:
-            email = json.load(f)
+    for idx, rec in enumerate(index, start=1):
+        msg_id = rec["message_id"]
+        out_path = os.path.join(email_attachment_dir, rec["file"])
+        if near_duplicates.is_duplicate(msg_id):
+            if os.path.exists(out_path):
+                os.remove(out_path)                             # drop copies merged by earlier runs
+            skipped += 1
+            continue
+        if suppression.is_suppressed(msg_id):
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            suppressed += 1
+            continue
 
-        # normalize the message_id the same way
-        msg_id = normalize_id(email.get("message_id", ""))
+        email = index.read_email(rec)
 
-        # Start with the original body
+        # Start with the original body, minus what it repeats from its parent
         merged_body = email.get("body", "")
+        parent = by_id.get(rec["parent"])
+        if THREAD_DEDUP_ENABLED and parent is not None and parent["body_len"]:
+            merged_body = remove_redundant_text(merged_body, index.read_email(parent).get("body", ""), stats=dedup_stats)
 
-        # Append every parsed‐attachment text for this message
-        for att_path in attach_map.get(msg_id, []):
+        # Append every parsed‐attachment text for this message (bulk mail stays body-only)
+        for att_path in ([] if suppression.is_bulk(msg_id) else attachment_index.paths(msg_id)):
             try:
                 with open(att_path, "r", encoding="utf-8") as af:
                     att_text = af.read()
@@ -145,17 +161,26 @@ def merge_emails_and_attachments():
         merged = {
             **{k: v for k, v in email.items() if k != "body"},
             "body": merged_body,
+            "thread_id": thread_map.get(msg_id),
             "doc_id": f"e_{msg_id}"
         }
+        if near_duplicates.duplicates(msg_id):
+            merged["duplicate_message_ids"] = near_duplicates.duplicates(msg_id)
+        if suppression.is_bulk(msg_id):
+            merged["bulk_sender"] = True
 
-        out_path = os.path.join(email_attachment_dir, fn)
         with open(out_path, "w", encoding="utf-8") as outf:
             json.dump(merged, outf, ensure_ascii=False, indent=2)
 
         if idx % 100 == 0:
-            print(f"   → Merged {idx}/{len(email_files)} emails")
-
-    print(f"Done: merged {len(email_files)} emails → {email_attachment_dir}")
+            print(f"   → Merged {idx}/{len(index)} emails")
+
+    print(f"Done: merged {len(index) - skipped - suppressed} emails → {email_attachment_dir}")
+    if skipped:
+        print(f"[INFO] {skipped} near-duplicate emails not merged (index documents saved)")
+    if suppressed:
+        print(f"[INFO] {suppressed} suppressed bulk-sender emails not merged (index documents saved)")
+    dedup_stats.report("Reply dedup")
     
 
 # @safe_step
@@ -248,34 +273,67 @@ def merge_emails_and_attachments():
 
 
 def main(get_attachments=True, get_threads=True, sum_threads=True, join_emails_attachemnts=True, get_email_chunks=False, get_att_chunks=False):
+    # ---ONE-PASS METADATA SCAN----------------------------
+
+    if get_attachments or get_threads or join_emails_attachemnts:
+        print("Indexing email metadata...")
+        index = build_corpus_index(emails_dir)
+        print()
+
+    # ---BULK-SENDER SUPPRESSION----------------------------
+
+    suppression = None
+    if SENDER_SUPPRESSION_ENABLED and (get_attachments or get_threads or join_emails_attachemnts):
+        print("Computing sender statistics...")
+        suppression = build_sender_suppression(index)
+        suppression.save()                               # sidecar read by merging / batch / progressive stages
+        print()
+
     # ---READING ATTACHMENTS------------------------------
 
     if get_attachments:
         print("Processing attachments:")
-        process_attachments()
+        process_attachments(suppression=suppression)
+        print()
+
+    # ---NEAR-DUPLICATE DETECTION----------------------------
+
+    near_duplicates = None
+    if NEAR_DUP_ENABLED and (get_threads or join_emails_attachemnts):
+        print("Detecting near-duplicate emails...")
+        near_duplicates = find_near_duplicates(index)
+        near_duplicates.save()                           # sidecar read by merging / indexing stages
         print()
 
     # ---ADDING THREAD_IDs--------------------------------
 
     if get_threads:
         print("Identifying email threads...\n")
-        thread_map = build_thread_map(emails_dir)
-        annotate_threads(emails_dir, thread_map)
+        thread_map = build_thread_map(index)
+        save_thread_map(thread_map)                      # sidecar artifact, email files stay untouched
         print()
 
         # ---CREATING THREAD SUMMARIES------------------------
 
         if sum_threads:
-            print("Building thread documents...")
-            thread_docs = build_thread_docs(emails_dir, parsed_attachments_dir, thread_map)
+            print("Grouping thread documents...")
+            attachment_index = load_attachment_index()
+            groups = group_threads(index, thread_map)
+            prune_thread_docs(thread_documents_dir, groups)     # thread_ids that no longer exist
+            plan = plan_thread_refresh(groups, attachment_index, thread_documents_dir, near_duplicates=near_duplicates, suppression=suppression)    # only new / changed, non-duplicate, non-bulk threads
+            dedup_stats = RedundancyStats()
+            thread_docs = iter_thread_docs(groups, index, attachment_index, plan, dedup_stats)    # lazy: one thread's texts at a time
             print("Asynchronously summarizing threads...")
-            asyncio.run(async_assemble_and_summarize(thread_docs, thread_documents_dir))           
+            asyncio.run(async_assemble_and_summarize(thread_docs, thread_documents_dir, total=len(plan)))
+            dedup_stats.report()
             print()
 
     # ---MERGING EMAIL + ATTACHMENT BODIES-----------------------------------------
     if join_emails_attachemnts:
         print("Joining email bodies and attachments...")
-        merge_emails_and_attachments()
+        if not get_threads:
+            thread_map = load_thread_map()                   # thread_ids of the latest threading run
+        merge_emails_and_attachments(index, thread_map)
         print()
 
 
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import asyncio
+import itertools
+import numpy as np
+from src.tools.safe_step import safe_step
+from src.tools.async_executor import AsyncExecutor, get_executor
+from src.tools.embedding_batcher import prepare_input, pack_batches, embed_batch
+from src.tools.embedders import Embedder, get_embedder
+from src.tools.embedding_cache import get_embedding_cache
+from src.tools.vector_compression import get_compressor
+from src.tools.vector_log import VectorLog, vector_log_path
+from src.services.data_embedding import embedding_text
+from src.services.opensearch_indexing import create_os_client, create_os_index, delete_stale_docs, prepare_doc, bulk_index
+from config import *
+
+DONE = None                                                     # end-of-stream marker on the queues
+
+
+def has_current_embedding(doc, embedder):
+    """True if `doc` carries a vector of `embedder` (same model name and dimension)."""
+    vector = doc.get("embedding")
+    return bool(vector) and doc.get("embedding_model") == embedder.name and len(vector) == embedder.dimension
+
+
+def stream_items(paths, embedder: Embedder | None = None):
+    """
+    Reads each document once and yields (path, text, n_tokens, doc). Documents that
+    already carry an embedding of `embedder`, or have no text to embed, get text None
+    and 0 tokens: they ride along in the batches and are indexed as they are. Vectors
+    of another model or dimension (or of an unrecorded model) are dropped and re-embedded.
+    """
+    embedder = embedder or get_embedder()
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+        except Exception as e:
+            print(f"[WARNING] Skipping {path!r}: {e}")
+            continue
+        if doc.get("embedding") and not has_current_embedding(doc, embedder):
+            doc.pop("embedding")
+            doc.pop("embedding_model", None)
+        text = embedding_text(doc)
+        if not text or doc.get("embedding"):
+            yield path, None, 0, doc
+        else:
+            yield (path, *prepare_input(text), doc)
+
+
+class EmbedIndexStream():
+    """
+    Fused embed-and-index stage: documents flow read → batch embed → bulk index through
+    bounded queues, so each file is read once and never rewritten, and bulk requests
+    overlap with embedding latency.
+      - reader: packs documents into token-aware batches (file reads in a worker thread)
+      - embedders: `workers` batches in flight, one request each under the shared
+        executor's rate budget; cached texts don't reach the API
+      - indexer: bulk-indexes `index_batch` documents at a time in a worker thread
+    Vectors go into the index and the index's VectorLog (the side artifact), not back
+    into the documents; vectors the documents already carry are logged as well, so a
+    rewritten log still covers the whole index.
+    """
+    def __init__(self, os_client, index_name, executor: AsyncExecutor | None = None, embedder: Embedder | None = None,
+                 use_cache=True, log: VectorLog | None = None, workers=STREAM_EMBED_WORKERS, index_batch=STREAM_INDEX_BATCH):
+        self.os_client = os_client
+        self.index_name = index_name
+        self.executor = executor or get_executor("embeddings")
+        self.embedder = embedder or get_embedder()
+        self.cache = get_embedding_cache() if use_cache else None
+        self.log = log
+        self.workers = workers
+        self.index_batch = index_batch
+        self.batches = asyncio.Queue(maxsize=STREAM_QUEUE_BATCHES)
+        self.docs = asyncio.Queue(maxsize=STREAM_QUEUE_DOCS)
+        self.stats = {"read": 0, "embedded": 0, "failed": 0, "indexed": 0, "index_errors": 0}
+
+    # ---STAGES---------------------------------
+    async def read(self, paths):
+        batches = pack_batches(stream_items(paths, self.embedder))
+        while (batch := await asyncio.to_thread(next, batches, DONE)) is not DONE:
+            self.stats["read"] += len(batch)
+            await self.batches.put(batch)
+        for _ in range(self.workers):
+            await self.batches.put(DONE)
+
+    async def embed(self):
+        while (batch := await self.batches.get()) is not DONE:
+            inputs = [(path, text, n) for path, text, n, _ in batch if text]
+            try:
+                vectors, errors = await embed_batch(inputs, self.executor, self.embedder, self.cache) if inputs else ({}, {})
+            except Exception as e:
+                vectors, errors = {}, {path: e for path, _, _ in inputs}
+
+            for path, text, _, doc in batch:
+                if path in vectors:
+                    doc["embedding"] = list(vectors[path])
+                    doc["embedding_model"] = self.embedder.name
+                    self.stats["embedded"] += 1
+                if doc.get("embedding"):
+                    if self.log is not None:
+                        self.log.append(doc.get("doc_id", os.path.basename(path)), self.embedder.name, doc["embedding"])
+                elif text:
+                    self.stats["failed"] += 1                   # indexed without a vector, re-embedded on the next run
+                    print(f"❌ Error embedding {path}: {errors.get(path)}")
+                await self.docs.put({
+                    "_index":  self.index_name,
+                    "_id":     doc.get("doc_id", os.path.basename(path)),
+                    "_source": prepare_doc(doc)
+                })
+
+    async def index(self, total=None):
+        actions = []
+        while True:
+            action = await self.docs.get()
+            if action is not DONE:
+                actions.append(action)
+            if actions and (len(actions) >= self.index_batch or action is DONE):
+                success, errors = await asyncio.to_thread(bulk_index, self.os_client, actions, self.index_batch, False)
+                self.stats["indexed"] += success
+                self.stats["index_errors"] += errors
+                actions = []
+                self.report(total)
+            if action is DONE:
+                return
+
+    def report(self, total=None):
+        s = self.stats
+        print(
+            f"→ [stream] {s['indexed']}/{total or '?'} indexed | embedded {s['embedded']}, failed {s['failed']} "
+            f"| queued batches {self.batches.qsize()}, docs {self.docs.qsize()} | index errors {s['index_errors']}",
+            flush=True
+        )
+
+    # ---PIPELINE---------------------------------
+    async def run(self, paths, total=None):
+        get_compressor()                                        # load / fit the vector compression before documents flow
+        started = time.monotonic()
+
+        async def embed_all():
+            await asyncio.gather(*(self.embed() for _ in range(self.workers)))
+            await self.docs.put(DONE)
+
+        tasks = [asyncio.create_task(c) for c in (self.read(paths), embed_all(), self.index(total))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        await asyncio.to_thread(self.os_client.indices.refresh, index=self.index_name)
+        if self.cache is not None:
+            self.cache.flush()
+        s = self.stats
+        print(f"[INFO] {self.index_name}: {s['indexed']}/{s['read']} documents indexed, {s['embedded']} embedded, "
+              f"{s['failed']} failed, in {time.monotonic() - started:.1f}s")
+        return self.stats
+
+
+async def embed_and_index_paths(paths, os_client, index_name, total=None, log=None, **kwargs):
+    """Streams the given JSON documents through an EmbedIndexStream into `index_name`."""
+    return await EmbedIndexStream(os_client, index_name, log=log, **kwargs).run(paths, total)
+
+
+async def embed_sample(locations, limit=VECTOR_FIT_SAMPLE, executor: AsyncExecutor | None = None, embedder: Embedder | None = None):
+    """
+    Embeds up to `limit` documents of `locations` and returns their vectors, to fit the
+    vector compression on before the first index is created. Vectors go into the
+    embedding cache, so the stream doesn't request them again.
+    """
+    executor = executor or get_executor("embeddings")
+    embedder = embedder or get_embedder()
+    cache = get_embedding_cache()
+    paths = (os.path.join(location, fn) for location, _ in locations
+             for fn in sorted(os.listdir(location)) if fn.endswith(".json"))
+    inputs = itertools.islice(((path, text, n) for path, text, n, _ in stream_items(paths, embedder) if text), limit)
+
+    vectors = []
+    async for _, result, error in executor.map(lambda b: embed_batch(b, executor, embedder, cache), pack_batches(inputs), label="sample batches"):
+        if error is None:
+            vectors.extend(result[0].values())
+    if cache is not None:
+        cache.flush()
+    return np.asarray(vectors, dtype=np.float32)
+
+
+async def async_embed_and_index(locations, os_client, doc_limit=None):
+    # a full pass rewrites each index's vector log, a partial one appends to it
+    logs = {name: VectorLog(vector_log_path(name), append=doc_limit is not None) for name in dict.fromkeys(n for _, n in locations)}
+    try:
+        for location, index_name in locations:
+            print(f"Embedding and indexing files in '{location}' into {index_name!r}…")
+            files = sorted(f for f in os.listdir(location) if f.endswith(".json"))[:doc_limit]
+            if not files:
+                print("  (no JSON files found)")
+                continue
+            paths = (os.path.join(location, fn) for fn in files)
+            await embed_and_index_paths(paths, os_client, index_name, total=len(files), log=logs[index_name])
+    finally:
+        for log in logs.values():
+            log.close()
+
+    cache = get_embedding_cache()
+    if cache is not None:
+        cache.report()
+
+
+@safe_step
+def main(embed_chunks=False, doc_limit=None):
+    """
+    Replaces data_embedding.main + opensearch_indexing.main with one streaming pass:
+    thread documents (and, with `embed_chunks`, email / attachment chunks) are
+    embedded and bulk-indexed without rewriting the JSON files.
+    """
+    locations = [(thread_documents_dir, THREADS_INDEX)]
+    if embed_chunks:
+        locations += [(email_chunks_dir, EMAILS_INDEX), (attachment_chunks_dir, EMAILS_INDEX)]
+    else:
+        print("[INFO] Skipping email & attachment embeddings for speed")
+
+    os_client = create_os_client(OPENSEARCH_ENDPOINT, MASTER_USER, MASTER_PASSWORD)
+    get_compressor(sample=lambda: asyncio.run(embed_sample(locations)))    # first compressed run: fit before the mapping is created
+    for index_name in dict.fromkeys(name for _, name in locations):
+        create_os_index(os_client, index_name)
+    delete_stale_docs(os_client, THREADS_INDEX)                 # thread documents pruned since the last run
+
+    asyncio.run(async_embed_and_index(locations, os_client, doc_limit))
+
+
+if __name__ == "__main__":
+    main()
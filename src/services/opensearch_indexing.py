@@ -6,6 +6,7 @@ import time
 from requests_aws4auth import AWS4Auth
 from openai import OpenAI
 from src.tools.safe_step import *
+from src.tools.vector_compression import get_compressor, full_vector_mapping
 from config import *
 
 
@@ -50,6 +51,7 @@ def wipe_os_index(client, INDEX_NAME):
 @safe_step
 def create_os_index(client, INDEX_NAME):
     try:
+        compressor = get_compressor()                           # knn_vector dimension / quantization
         if not client.indices.exists(INDEX_NAME):
             print(f"[INFO] creating index {INDEX_NAME!r}\n")
             mapping = {
@@ -64,7 +66,8 @@ def create_os_index(client, INDEX_NAME):
                         "doc_id":       {"type": "keyword"},
                         "thread_id":    {"type": "keyword"},
                         "message_id":   {"type": "keyword"},
-                        "embedding":    {"type": "knn_vector", "dimension": 1536},
+                        "embedding":    compressor.mapping(),
+                        "embedding_model": {"type": "keyword"},
                         "type":         {"type": "keyword"},
                         "date":         {"type": "date"},
                         "subject":      {"type": "text"},
@@ -82,12 +85,29 @@ def create_os_index(client, INDEX_NAME):
                     }
                 }
             }
+            if compressor.enabled:
+                mapping["mappings"]["properties"]["embedding_full"] = full_vector_mapping()
             client.indices.create(index=INDEX_NAME, body=mapping)
             print(f"[INFO] {INDEX_NAME} created.")
+        else:
+            props = client.indices.get_mapping(index=INDEX_NAME)[INDEX_NAME]["mappings"].get("properties", {})
+            existing, wanted = props.get("embedding", {}), compressor.mapping()
+            if existing and (existing.get("dimension"), existing.get("data_type", "float")) != (wanted["dimension"], wanted.get("data_type", "float")):
+                print(f"[WARNING] {INDEX_NAME} holds {existing.get('dimension')}-d {existing.get('data_type', 'float')} vectors, "
+                      f"configured are {wanted['dimension']}-d {wanted.get('data_type', 'float')}: wipe and re-index it")
     except Exception as e:
         print(f"[ERROR] Creating index failed due to: {e}")
 
 
+def prepare_doc(doc):
+    """Drops empty dates and swaps the embedding for its compressed index form (VECTOR_PCA_DIM / VECTOR_QUANTIZATION)."""
+    if not doc.get("date"):
+        doc.pop("date", None)
+    if doc.get("embedding"):
+        doc.update(get_compressor().doc_fields(doc["embedding"]))
+    return doc
+
+
 @safe_step
 def actions_generator(DIRS_TO_INDEX, doc_limit=None):
     """
@@ -104,10 +124,8 @@ def actions_generator(DIRS_TO_INDEX, doc_limit=None):
             path = os.path.join(directory, filename)
             try:
                 with open(path, "r", encoding="utf-8") as f:
-                    doc = json.load(f)
+                    doc = prepare_doc(json.load(f))
 
-                if not doc.get("date"):
-                    doc.pop("date", None)
                 yield {
                     "_index":  INDEX_NAME,
                     "_id":     doc.get("doc_id", filename),
@@ -122,34 +140,39 @@ def actions_generator(DIRS_TO_INDEX, doc_limit=None):
 # Reports on data before indexing it
 @safe_step
 def stream_summary(DIRS_TO_INDEX):
-    total = 0
+    """
+    Lists each directory once and returns { directory: [json files] },
+    so stream_doc_to_os can reuse the listing instead of scanning again.
+    """
+    files_by_dir = {}
     for i in DIRS_TO_INDEX:
-        size = len(os.listdir(i))
-        print(f"   -> {size} docs in {i}")
-        total += size
+        files_by_dir[i] = [f for f in os.listdir(i) if f.endswith(".json")]
+        print(f"   -> {len(files_by_dir[i])} docs in {i}")
+    total = sum(len(f) for f in files_by_dir.values())
     print()
     print(f"[INFO] {total} documents ready to index.")
-    return total
+    return files_by_dir
 
 
 @safe_step
-def _load_all_actions(dirs, doc_limit=None):
+def _load_all_actions(dirs, doc_limit=None, files_by_dir=None):
     """
     Build a flat list of bulk‐index actions for all JSONs under dirs.
     """
     print("Bulding a flat list of paths to index...")
     actions = []
+    files_by_dir = files_by_dir or {}
     for directory in dirs:
-        files = [f for f in os.listdir(directory) if f.endswith(".json")]
+        files = files_by_dir.get(directory)
+        if files is None:
+            files = [f for f in os.listdir(directory) if f.endswith(".json")]
         if doc_limit:
             files = files[:doc_limit]
         for fn in files:
             path = os.path.join(directory, fn)
             try:
                 with open(path, "r", encoding="utf-8") as f:
-                    doc = json.load(f)
-                if not doc.get("date"):
-                    doc.pop("date", None)
+                    doc = prepare_doc(json.load(f))
                 actions.append({
                     "_index": INDEX_NAME,
                     "_id":    doc.get("doc_id", fn),
@@ -159,23 +182,20 @@ def _load_all_actions(dirs, doc_limit=None):
                 print(f"[WARNING] Skipping {path!r}: {e}")
     return actions
 
-@safe_step
-def stream_doc_to_os(client, doc_limit=None, batch_size=1000):
+def bulk_index(client, actions, batch_size=1000, verbose=True):
     """
-    Streams documents in batches, retries on 429 or connection errors,
-    and resumes from the last successful batch, printing progress.
+    Sends `actions` in batches, retries on 429 or connection errors and
+    resumes from the last successful batch, printing progress (`verbose`).
+    Returns (success, errors).
     """
-    all_actions = _load_all_actions(DIRS_TO_INDEX, doc_limit)
-    total = len(all_actions)
-    print(f"Preparing to index {total} documents in batches of {batch_size}")
-
+    total = len(actions)
     success = 0
     errors = 0
     offset = 0
     backoff = 1
 
     while offset < total:
-        batch = all_actions[offset : offset + batch_size]
+        batch = actions[offset : offset + batch_size]
         try:
             succ_batch, err_batch = helpers.bulk(
                 client,
@@ -187,8 +207,9 @@ def stream_doc_to_os(client, doc_limit=None, batch_size=1000):
             errors  += err_batch
             offset += len(batch)
             backoff = 1
-            pct = round(success / total * 100, 1)
-            print(f"[OK]   Indexed {offset}/{total} → {pct}% (errors: {errors})")
+            if verbose:
+                pct = round(success / total * 100, 1)
+                print(f"[OK]   Indexed {offset}/{total} → {pct}% (errors: {errors})")
         except TransportError as e:
             if hasattr(e, "status_code") and e.status_code == 429:
                 print(f"[429] Too Many Requests at offset {offset}, backing off {backoff}s")
@@ -205,12 +226,66 @@ def stream_doc_to_os(client, doc_limit=None, batch_size=1000):
             time.sleep(backoff)
             backoff = min(backoff * 2, 60)
 
+    return success, errors
+
+
+def delete_stale_docs(client, index_name, path=stale_thread_docs_path):
+    """
+    Deletes the doc_ids listed in `path` (thread documents removed by prune_thread_docs)
+    from `index_name` and clears the list. Returns the number of documents deleted.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r", encoding="utf-8") as f:
+        doc_ids = json.load(f)
+    actions = [{"_op_type": "delete", "_index": index_name, "_id": doc_id} for doc_id in doc_ids]
+    deleted, _ = helpers.bulk(client, actions, raise_on_error=False, stats_only=True)   # ids never indexed fail harmlessly
+    os.remove(path)
+    print(f"[INFO] Deleted {deleted} stale documents from {index_name!r}")
+    return deleted
+
+
+@safe_step
+def stream_doc_to_os(client, doc_limit=None, batch_size=1000, files_by_dir=None):
+    """
+    Streams documents in batches, retries on 429 or connection errors,
+    and resumes from the last successful batch, printing progress.
+    """
+    all_actions = _load_all_actions(DIRS_TO_INDEX, doc_limit, files_by_dir)
+    total = len(all_actions)
+    print(f"Preparing to index {total} documents in batches of {batch_size}")
+
+    success, errors = bulk_index(client, all_actions, batch_size)
+
     print(f"[DONE] Indexed {success}/{total} docs with {errors} errors.")
     print("Refreshing index…")
     client.indices.refresh(index=INDEX_NAME)
     print("Index refreshed.")
 
 
+@safe_step
+def index_paths(client, paths, index_name, batch_size=1000):
+    """
+    Bulk-indexes just the given JSON documents into `index_name` (upserting by
+    doc_id) and refreshes it, so they become searchable right away.
+    """
+    actions = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = prepare_doc(json.load(f))
+            actions.append({
+                "_index": index_name,
+                "_id":    doc.get("doc_id", os.path.basename(path)),
+                "_source": doc
+            })
+        except Exception as e:
+            print(f"[WARNING] Skipping {path!r}: {e}")
+
+    success, errors = bulk_index(client, actions, batch_size)
+    client.indices.refresh(index=index_name)
+    print(f"[INFO] Indexed {success}/{len(actions)} docs into {index_name!r} with {errors} errors.")
+    return success
 
 def main():
     #---AUTHENTICATE TO OPENSEARCH
@@ -219,10 +294,12 @@ def main():
     #---PREPARE FOR INDEXING
     wipe_os_index(client, INDEX_NAME)
     create_os_index(client, INDEX_NAME)
-    stream_summary(DIRS_TO_INDEX)
+    if os.path.exists(stale_thread_docs_path):
+        os.remove(stale_thread_docs_path)                       # the wiped index holds none of them
+    files_by_dir = stream_summary(DIRS_TO_INDEX)
 
     #---STREAM DATA TO OPENSEARCH
-    stream_doc_to_os(client)
+    stream_doc_to_os(client, files_by_dir=files_by_dir)
 
     #---REPORT ON COMPLETION
     inspect_os_index(client, INDEX_NAME)
@@ -0,0 +1,123 @@
+import os
+import time
+import asyncio
+from collections import defaultdict
+from config import *
+from src.tools.corpus_index import build_corpus_index, CorpusIndex
+from src.tools.thread_summaries import build_thread_map, group_threads, plan_thread_refresh, prune_thread_docs, iter_thread_docs, parse_iso
+from src.tools.thread_assignments import save_thread_map
+from src.tools.attachment_index import load_attachment_index
+from src.tools.near_duplicates import find_near_duplicates
+from src.tools.sender_suppression import build_sender_suppression
+from src.tools.async_thread_summaries import async_assemble_and_summarize
+from src.tools.vector_log import VectorLog, vector_log_path
+from src.services.data_processing import merge_emails_and_attachments
+from src.services.opensearch_indexing import create_os_client, create_os_index, delete_stale_docs, index_paths
+from src.services.embed_and_index import embed_and_index_paths
+
+
+def recency_slices(groups, thread_ids, granularity=PROGRESSIVE_SLICE):
+    """
+    Buckets `thread_ids` by the month (or year / day) of their last message and
+    returns [(label, [thread_ids])] newest first, threads inside a slice newest first too.
+    """
+    fmt = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}[granularity]
+    last = {tid: max(parse_iso(r["date"]) for r in groups[tid]) for tid in thread_ids}
+
+    slices = defaultdict(list)
+    for tid in sorted(thread_ids, key=lambda t: last[t], reverse=True):
+        label = last[tid].strftime(fmt) if last[tid].year > 1 else "undated"
+        slices[label].append(tid)
+    return list(slices.items())                                 # dicts keep insertion order: newest first
+
+
+async def ingest_slices(slices, groups, index, thread_map, attachment_index, plan, os_client):
+    """
+    Per slice: summarize → merge its emails, then stream its thread documents through
+    the fused embed-and-index stage and bulk-index its emails. Embedding and indexing
+    of a slice run while the next slice is already being summarized.
+    """
+    started = time.monotonic()
+    indexing = None
+    log = VectorLog(vector_log_path(THREADS_INDEX))
+
+    async def index_slice(label, thread_paths, email_paths, n_threads):
+        await embed_and_index_paths(thread_paths, os_client, THREADS_INDEX, total=len(thread_paths), log=log)
+        await asyncio.to_thread(index_paths, os_client, email_paths, EMAILS_INDEX)
+        print(f"[INFO] Slice {label}: {n_threads} threads searchable after {time.monotonic() - started:.0f}s")
+
+    try:
+        for n, (label, tids) in enumerate(slices, start=1):
+            print(f"\n---SLICE {label} ({n}/{len(slices)}): {len(tids)} threads---")
+
+            # ---SUMMARIZING------------------------------
+            slice_plan = {tid: plan[tid] for tid in tids}
+            threads = iter_thread_docs(groups, index, attachment_index, slice_plan)
+            await async_assemble_and_summarize(threads, thread_documents_dir, total=len(tids))
+
+            thread_paths = [os.path.join(thread_documents_dir, f"{tid}.json") for tid in tids]
+            thread_paths = [p for p in thread_paths if os.path.exists(p)]
+
+            # ---MERGING EMAILS------------------------------
+            records = [r for tid in tids for r in groups[tid]]
+            await asyncio.to_thread(merge_emails_and_attachments, CorpusIndex(index.emails_dir, records), thread_map)   # off the event loop: the previous slice keeps indexing
+            email_paths = [os.path.join(email_attachment_dir, r["file"]) for r in records]
+            email_paths = [p for p in email_paths if os.path.exists(p)]          # near-duplicates aren't merged
+
+            # ---EMBEDDING + INDEXING------------------------------
+            if indexing is not None:
+                await indexing                                  # keep slices searchable in order
+            indexing = asyncio.create_task(index_slice(label, thread_paths, email_paths, len(tids)))
+
+        if indexing is not None:
+            await indexing
+    finally:
+        if indexing is not None and not indexing.done():
+            indexing.cancel()                                   # a failed slice: stop its indexing before closing the log
+        log.close()
+
+
+def main(granularity=PROGRESSIVE_SLICE):
+    """
+    Recency-first ingestion: new / changed threads are processed in slices by the
+    date of their last message, newest first, and each slice is indexed as soon as
+    it's done, so recent mail is searchable while older mail backfills.
+    """
+    # ---ONE-PASS METADATA SCAN----------------------------
+    print("Indexing email metadata...")
+    index = build_corpus_index(emails_dir)
+
+    # ---THREADING------------------------------
+    print("Identifying email threads...")
+    thread_map = build_thread_map(index)
+    save_thread_map(thread_map)
+    attachment_index = load_attachment_index()
+    groups = group_threads(index, thread_map)
+    near_duplicates = None
+    if NEAR_DUP_ENABLED:
+        near_duplicates = find_near_duplicates(index)
+        near_duplicates.save()
+    suppression = None
+    if SENDER_SUPPRESSION_ENABLED:
+        suppression = build_sender_suppression(index)
+        suppression.save()
+    prune_thread_docs(thread_documents_dir, groups)
+    plan = plan_thread_refresh(groups, attachment_index, thread_documents_dir, near_duplicates=near_duplicates, suppression=suppression)
+
+    slices = recency_slices(groups, list(plan), granularity)
+    print(f"[INFO] {len(plan)} threads to ingest in {len(slices)} slices (newest: {slices[0][0] if slices else '-'})")
+    if not slices:
+        return
+
+    # ---OPENSEARCH------------------------------
+    os_client = create_os_client(OPENSEARCH_ENDPOINT, MASTER_USER, MASTER_PASSWORD)
+    create_os_index(os_client, THREADS_INDEX)
+    create_os_index(os_client, EMAILS_INDEX)
+    delete_stale_docs(os_client, THREADS_INDEX)
+
+    asyncio.run(ingest_slices(slices, groups, index, thread_map, attachment_index, plan, os_client))
+    print("\nDone: all slices ingested.")
+
+
+if __name__ == "__main__":
+    main()
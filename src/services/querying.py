@@ -5,17 +5,20 @@ import time
 from typing import List, Union, Dict, Any
 from opensearchpy import OpenSearch, RequestsHttpConnection, helpers
 from opensearchpy.exceptions import TransportError, ConnectionError as OSCxnError
-from tenacity import retry, stop_after_attempt, wait_exponential
 from requests_aws4auth import AWS4Auth
-from openai import OpenAI, OpenAIError, AsyncOpenAI
+from openai import OpenAI
 from typing import List, Tuple
-import tiktoken
 import re
 import uuid
 from datetime import datetime
 from random import random
 import asyncio
 import threading
+from src.tools.async_executor import get_executor, estimate_tokens
+from src.tools.embedding_cache import get_embedding_cache
+from src.tools.embedders import OpenAIEmbedder, get_embedder
+from src.tools.vector_compression import VectorCompressor, get_compressor, rescore, full_vector_mapping
+from src.tools.tokenizer import count_tokens, count_tokens_batch
 from config import *
 logger = logging.getLogger(__name__)
 
@@ -43,7 +46,6 @@ os_client = create_os_client()
 def knn_search(
     query_text,
     retrieved_ids=None,
-    llm_client=llm_client,
     os_client=os_client,
     size=5,
     retries=5,
@@ -51,20 +53,25 @@ def knn_search(
 ):
     retrieved_ids = retrieved_ids or []
 
-    # 1) Embed the query
-    try:
-        q_vec = llm_client.embeddings.create(
-            model=EMBEDDINGS_MODEL,
-            input=query_text
-        ).data[0].embedding
-    except OpenAIError as e:
-        logging.error(f"[knn_search] Embedding failed: {e}")
-        return [], [], []
-
-    # 2) Build a single k-NN + filter query
+    # 1) Embed the query (repeated queries come from the embedding cache)
+    embedder = get_embedder()
+    cache = get_embedding_cache()
+    q_vec = cache.get(embedder.name, query_text) if cache is not None else None
+    if q_vec is None:
+        try:
+            q_vec = embedder.embed([query_text])[0]
+        except Exception as e:
+            logging.error(f"[knn_search] Embedding failed: {e}")
+            return [], [], []
+        if cache is not None:
+            cache.put(embedder.name, query_text, q_vec)
+    q_vec = list(q_vec)
+
+    # 2) Build a single k-NN + filter query (compressed indexes return oversampled candidates)
+    compressor = get_compressor()
     knn_body = {
         "timeout": "60s",
-        "size": size,
+        "size": compressor.candidates(size),
         "query": {
             "bool": {
                 # filter out non-thread types and already-retrieved IDs
@@ -76,8 +83,8 @@ def knn_search(
                 "must": {
                     "knn": {
                         "embedding": {
-                            "vector": q_vec,
-                            "k": size,
+                            "vector": compressor.query_vector(q_vec),
+                            "k": compressor.candidates(size),
                             "method_parameters": {"ef_search": size * 10}
                         }
                     }
@@ -96,6 +103,8 @@ def knn_search(
                 request_timeout=60
             )
             hits = resp.get("hits", {}).get("hits", [])
+            if compressor.enabled:
+                hits = rescore(q_vec, hits, size)
             ids = [h["_id"] for h in hits]
             return hits, ids, q_vec
 
@@ -214,18 +223,18 @@ def num_tokens_from_messages(messages, model: str=QUERY_MODEL) -> int:
     Returns the total number of tokens that will be sent to the Chat API,
     counting both the message content *and* the per-message framing tokens.
     """
-    encoding = tiktoken.encoding_for_model(model)
     # From OpenAI’s guidance:
     tokens_per_message = 4      # every message adds <im_start>, role, <im_end>
     tokens_per_name    = -1     # if you use the name field instead of role
     total_tokens = 0
 
+    # all contents counted in one multi-threaded batch (repeated ones are cached)
+    values = [val for m in messages for val in m.values()]
+    total_tokens += sum(count_tokens_batch(values, encoding=model))
     for m in messages:
         total_tokens += tokens_per_message
-        for key, val in m.items():
-            total_tokens += len(encoding.encode(val))
-            if key == "name":
-                total_tokens += tokens_per_name
+        if "name" in m:
+            total_tokens += tokens_per_name
 
     total_tokens += 2  # priming tokens for the assistant’s reply
     return total_tokens
@@ -247,7 +256,8 @@ class Memory:
         self.llm = llm_client
         self.os = os_client
         self.memory_model = memory_model or MEMORY_MODEL
-        self.embeddings_model = embeddings_model or EMBEDDINGS_MODEL
+        self.embedder = OpenAIEmbedder(embeddings_model) if embeddings_model else get_embedder()
+        self._compressor = None
 
         self.turns = 0
         self.short_term: List[str] = []
@@ -258,11 +268,6 @@ class Memory:
         self.mid_term_turns = mid_term_turns
         self.long_term_index = f"memory_{datetime.utcnow():%Y%m%d_%H%M%S}"
 
-        try:
-            self.tokenizer = tiktoken.encoding_for_model(self.memory_model)
-        except Exception:
-            self.tokenizer = None
-
     def __repr__(self):
         return self.mid_term or ""
 
@@ -273,9 +278,7 @@ class Memory:
         self.turns += 1
 
     def count_tokens(self, text: str) -> int:
-        if not self.tokenizer:
-            return len(text.split())
-        return len(self.tokenizer.encode(text))
+        return count_tokens(text, encoding=self.memory_model)
 
     def _extract_short(self, text: str) -> str:
         try:
@@ -343,10 +346,11 @@ class Memory:
 
     def short_term_memory(self, new_turn: str) -> List[str]:
         self.short_term.append(new_turn)
-        total = sum(self.count_tokens(t) for t in self.short_term)
+        counts = [self.count_tokens(t) for t in self.short_term]      # earlier turns come from the count cache
+        total = sum(counts)
         while total > self.short_term_tokens and self.short_term:
             self.short_term.pop(0)
-            total = sum(self.count_tokens(t) for t in self.short_term)
+            total -= counts.pop(0)
         return self.short_term
 
     def mid_term_memory(self) -> str:
@@ -355,13 +359,25 @@ class Memory:
             self.mid_term = self.extract_facts(joined, mode="mid")
         return self.mid_term
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
-    async def _embed_text(self, client: AsyncOpenAI, text: str) -> List[float]:
-        resp = await client.embeddings.create(
-            model=self.embeddings_model,
-            input=text
-        )
-        return resp.data[0].embedding
+    async def _embed_text(self, text: str) -> List[float]:
+        # recurring facts come from the embedding cache
+        cache = get_embedding_cache()
+        vec = cache.get(self.embedder.name, text) if cache is not None else None
+        if vec is not None:
+            return list(vec)
+        # shared embeddings executor: rate budget, 429 back-off and retries
+        vec = (await self.embedder.aembed([text], get_executor("embeddings"), tokens=estimate_tokens(text)))[0]
+        if cache is not None:
+            cache.put(self.embedder.name, text, vec)
+        return vec
+
+    @property
+    def compressor(self) -> VectorCompressor:
+        # the corpus-fitted compression only applies to vectors of the same embedder
+        if self._compressor is None:
+            compressor = get_compressor()
+            self._compressor = compressor if compressor.dimension == self.embedder.dimension else VectorCompressor(self.embedder.dimension)
+        return self._compressor
 
     async def long_term_memory(self) -> List[Dict[str,Any]]:
         if self.turns % self.mid_term_turns != 0:
@@ -373,55 +389,52 @@ class Memory:
 
         # ←―――――――――  HERE is where we create the index with the proper KNN mapping
         if not self.os.indices.exists(index=self.long_term_index):
+            properties = {"embedding": self.compressor.mapping()}
+            if self.compressor.enabled:
+                properties["embedding_full"] = full_vector_mapping()
             mapping = {
                 "settings": {"index.knn": True},
-                "mappings": {
-                    "properties": {
-                        "embedding": {
-                            "type": "knn_vector",
-                            "dimension": 1536
-                        }
-                    }
-                }
+                "mappings": {"properties": properties}
             }
             self.os.indices.create(index=self.long_term_index, body=mapping)
 
-        emb_client = AsyncOpenAI(api_key=SECRET_KEY)
-        sem = asyncio.Semaphore(10)
-        tasks = [
-            asyncio.create_task(self._process_and_index_fact(fact, emb_client, sem))
-            for fact in facts
-        ]
-        await asyncio.gather(*tasks)
+        async for _ in get_executor("embeddings").map(
+            lambda fact: self._process_and_index_fact(fact), facts, total=len(facts), label="facts indexed"
+        ):
+            pass
         return self.long_term
 
-    async def _process_and_index_fact(self, fact: Dict[str,Any], client: AsyncOpenAI, sem: asyncio.Semaphore):
-        async with sem:
-            text = json.dumps(fact, ensure_ascii=False)
-            try:
-                vec = await self._embed_text(client, text)
-                fact_doc = {**fact, "embedding": vec}
-                doc_id = uuid.uuid4().hex
-                self.os.index(
-                    index=self.long_term_index,
-                    id=doc_id,
-                    body=fact_doc,
-                    request_timeout=60
-                )
-            except Exception:
-                logger.exception("Failed to embed/index fact")
+    async def _process_and_index_fact(self, fact: Dict[str,Any]):
+        text = json.dumps(fact, ensure_ascii=False)
+        try:
+            vec = await self._embed_text(text)
+            fact_doc = {**fact, **self.compressor.doc_fields(vec)}
+            doc_id = uuid.uuid4().hex
+            self.os.index(
+                index=self.long_term_index,
+                id=doc_id,
+                body=fact_doc,
+                request_timeout=60
+            )
+        except Exception:
+            logger.exception("Failed to embed/index fact")
 
     def retrieve_long_term_memory(self, query_emb: List[float], k: int = 5) -> List[Dict[str,Any]]:
         try:
             if not self.os.indices.exists(index=self.long_term_index):
                 return []
-            body = {"size": k, "query": {"knn": {"embedding": {"vector": query_emb, "k": k}}}}
+            n = self.compressor.candidates(k)
+            body = {"size": n, "query": {"knn": {"embedding": {"vector": self.compressor.query_vector(query_emb), "k": n}}}}
             resp = self.os.search(index=self.long_term_index, body=body, request_timeout=30)
-            
+            hits = resp["hits"]["hits"]
+            if self.compressor.enabled:
+                hits = rescore(query_emb, hits, k)
+
             results = []
-            for hit in resp["hits"]["hits"]:
+            for hit in hits:
                 doc = hit["_source"].copy()
                 doc.pop("embedding", None)
+                doc.pop("embedding_full", None)
                 results.append(doc)
 
             return results
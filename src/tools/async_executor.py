@@ -0,0 +1,255 @@
+import time
+import asyncio
+import threading
+import weakref
+from email.utils import parsedate_to_datetime
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError
+from config import *
+
+
+# ---SHARED CLIENTS---------------------------------
+
+_clients = weakref.WeakKeyDictionary()
+
+def get_async_openai():
+    """
+    One AsyncOpenAI client per event loop, shared by every stage running on it.
+    The client's own retries are off: 429s and transient errors surface to the
+    executor, which owns backoff and rate adaptation.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(api_key=SECRET_KEY, max_retries=0)
+        _clients[loop] = client
+    return client
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 chars per token) for rate budgeting."""
+    return len(text or "") // 4 + 1
+
+
+# ---RATE LIMITING---------------------------------
+
+class TokenBucket():
+    """
+    Continuous-refill bucket holding up to `per_minute` units. `rate_factor` (0–1]
+    scales the refill rate down while the API is pushing back with 429s. The lock
+    lets event loops on different threads draw from the same bucket.
+    """
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate_factor = 1.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        rate = self.capacity / 60.0 * self.rate_factor
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(float(amount), self.capacity)                      # oversized requests wait for a full bucket
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / (self.capacity / 60.0 * self.rate_factor)
+            await asyncio.sleep(wait)
+
+
+def is_rate_limited(e):
+    return getattr(e, "status_code", None) == 429
+
+def is_transient(e):
+    status = getattr(e, "status_code", None)
+    return isinstance(e, (APIConnectionError, APITimeoutError, asyncio.TimeoutError)) or (status is not None and status >= 500)
+
+def retry_after_seconds(e, default=RATE_LIMIT_COOLDOWN_S):
+    """Reads `retry-after-ms` / `retry-after` (seconds or HTTP date) from an API error's response."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return default
+
+
+# ---EXECUTOR---------------------------------
+
+class AsyncExecutor():
+    """
+    Shared async runner for API-bound stages:
+      - `map` keeps a continuous sliding window of `max_concurrent` tasks in flight,
+        pulling the next item as soon as any task finishes (no batch barriers)
+      - `call` budgets every API request against requests/min and tokens/min buckets
+      - on a 429 all new calls pause for `Retry-After` and the refill rate is cut;
+        it recovers gradually with each successful call
+      - `report` prints throughput, in-flight requests and queue depth
+    Counters and buckets are guarded by locks, so one executor can be shared by
+    event loops running on different threads (e.g. background memory indexing).
+    """
+    def __init__(self, name, max_concurrent=LLM_MAX_CONCURRENT, rpm=LLM_RPM, tpm=LLM_TPM,
+                 max_retries=LLM_MAX_RETRIES, progress_step=None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.progress_step = progress_step or verbosity
+        self.paused_until = 0.0
+
+        self.started = time.monotonic()
+        self.completed = 0
+        self.failed = 0
+        self.tokens_used = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.lock = threading.Lock()
+
+    # --- throttling ---
+    def _count(self, **deltas):
+        with self.lock:
+            for field, delta in deltas.items():
+                setattr(self, field, getattr(self, field) + delta)
+
+    def _slow_down(self, delay):
+        with self.lock:
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        for bucket in (self.requests, self.tokens):
+            with bucket.lock:
+                bucket.rate_factor = max(0.1, bucket.rate_factor * 0.5)
+
+    def _speed_up(self):
+        for bucket in (self.requests, self.tokens):
+            with bucket.lock:
+                bucket.rate_factor = min(1.0, bucket.rate_factor * 1.05)
+
+    async def call(self, request, tokens=1):
+        """
+        Awaits `request()` (a zero-argument coroutine factory) once the rate budget
+        allows, retrying 429s and transient errors with backoff.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._count(waiting=1)
+            try:
+                while time.monotonic() < self.paused_until:
+                    await asyncio.sleep(self.paused_until - time.monotonic())
+                await self.requests.acquire(1)
+                await self.tokens.acquire(tokens)
+            finally:
+                self._count(waiting=-1)
+
+            self._count(in_flight=1)
+            try:
+                result = await request()
+            except Exception as e:
+                if attempt == self.max_retries or not (is_rate_limited(e) or is_transient(e)):
+                    raise
+                if is_rate_limited(e):
+                    self._slow_down(retry_after_seconds(e))
+                else:
+                    await asyncio.sleep(min(60, 2 ** attempt))
+                continue
+            finally:
+                self._count(in_flight=-1)
+
+            self._count(tokens_used=tokens)
+            self._speed_up()
+            return result
+
+    async def map(self, fn, items, total=None, label="items", progress_step=None):
+        """
+        Runs `fn(item)` over `items` (consumed lazily) with at most `max_concurrent`
+        tasks alive, yielding (item, result, error) as each one finishes. Progress is
+        reported every `progress_step` items (default: the executor's).
+        """
+        progress_step = progress_step or self.progress_step
+        with self.lock:
+            if not self.in_flight and not self.waiting:                 # idle: start a fresh throughput window
+                self.started = time.monotonic()
+                self.completed = self.failed = self.tokens_used = 0
+
+        items = iter(items)
+        pending = {}
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < self.max_concurrent:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[asyncio.create_task(fn(item))] = item
+
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                error = task.exception()
+                self._count(completed=int(error is None), failed=int(error is not None))
+                yield item, (task.result() if error is None else None), error
+
+                finished = self.completed + self.failed
+                if finished % progress_step == 0 or finished == total:
+                    self.report(total, label)
+
+    # --- reporting ---
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "req_per_s": round(self.completed / elapsed, 2),
+            "tokens_per_min": round(self.tokens_used / elapsed * 60),
+            "in_flight": self.in_flight,
+            "queued": self.waiting,
+            "rate_limited": self.rate_limited,
+            "rate_factor": round(self.requests.rate_factor, 2)
+        }
+
+    def report(self, total=None, label="items"):
+        s = self.stats()
+        print(
+            f"→ [{self.name}] {s['completed'] + s['failed']}/{total or '?'} {label} "
+            f"| {s['req_per_s']} req/s, {s['tokens_per_min']} tok/min "
+            f"| in flight {s['in_flight']}, queued {s['queued']} "
+            f"| 429s {s['rate_limited']} (rate x{s['rate_factor']}) | failed {s['failed']}",
+            flush=True
+        )
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def get_executor(name):
+    """
+    Process-wide executor per API ("chat", "embeddings"), so concurrent stages share
+    one rate budget, including stages whose event loop runs on another thread.
+    """
+    with _executors_lock:
+        if name not in _executors:
+            limits = {
+                "chat":       dict(rpm=LLM_RPM, tpm=LLM_TPM),
+                "embeddings": dict(rpm=EMBEDDINGS_RPM, tpm=EMBEDDINGS_TPM),
+            }.get(name, {})
+            _executors[name] = AsyncExecutor(name, **limits)
+        return _executors[name]
@@ -1,93 +1,191 @@
 from src.tools.thread_summaries import *
+from src.tools.corpus_index import build_corpus_index
+from src.tools.attachment_index import load_attachment_index
+from src.tools.llm_cache import LLMCache, completion_key
+from src.tools.near_duplicates import NearDuplicates
+from src.tools.sender_suppression import SenderSuppression
+from src.tools.async_executor import AsyncExecutor, get_executor, get_async_openai, estimate_tokens
+from src.tools.tokenizer import encode, decode, truncate, exceeds_tokens
 import os
 import json
 import asyncio
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Tuple
 
 from openai import AsyncOpenAI
 import aiofiles  # pip install aiofiles :contentReference[oaicite:7]{index=7}
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_exponential
-)  # pip install tenacity :contentReference[oaicite:8]{index=8}
-import tiktoken  # pip install tiktoken :contentReference[oaicite:9]{index=9}
 
 # --- Configuration ---
-MAX_CONCURRENT        = 20        # tune to your RPS/quota
-BATCH_SIZE            = MAX_CONCURRENT * 2
 PROGRESS_STEP         = 50
 MAX_TOKENS_PER_PROMPT = 3000
+MAX_SUMMARY_TOKENS    = 300       # completion budget reserved per request in the TPM bucket
+SUMMARY_TEMPERATURE   = 0.2
 
-# --- Helper: Token-aware truncation ---
-tokenizer = tiktoken.get_encoding("cl100k_base")  # GPT-4 encoding :contentReference[oaicite:10]{index=10}
-
-def truncate_to_tokens(text: str, max_tokens: int) -> str:
-    """Trim text to at most `max_tokens`, preserving token boundaries."""
-    tokens = tokenizer.encode(text)
-    if len(tokens) <= max_tokens:
-        return text
-    truncated = tokenizer.decode(tokens[:max_tokens])
-    return truncated
-
-# --- Helper: Retry on transient failures ---
-@retry(
-    stop=stop_after_attempt(5),
-    wait=wait_exponential(min=1, max=60)
+SUMMARY_PROMPT        = "Write a concise, but detailed 2–3 sentence summary of this email thread."
+DELTA_SUMMARY_PROMPT  = (
+    "You are given the current summary of an email thread and the messages added since. "
+    "Write a concise, but detailed 2–3 sentence summary of the whole thread, updated with the new messages."
 )
+CHUNK_SUMMARY_PROMPT  = (
+    "Summarize this part of a longer email thread in 3–5 sentences. "
+    "Keep names, dates, numbers and decisions."
+)
+REDUCE_SUMMARY_PROMPT = (
+    "You are given summaries of consecutive parts of one email thread, in chronological order. "
+    "Write a concise, but detailed 2–3 sentence summary of the whole thread."
+)
+
+# --- Helper: one summary request (retries / rate limits are handled by the executor) ---
 async def call_chat_completion(
     client: AsyncOpenAI,
     messages: list[Dict]
 ) -> Dict:
-    """Call OpenAI ChatCompletion with exponential backoff."""
+    """Call OpenAI ChatCompletion."""
     return await client.chat.completions.create(
         model=SUMMARY_MODEL,
         messages=messages,
-        temperature=0.2
+        temperature=SUMMARY_TEMPERATURE
     )
 
-# --- Per-thread summarization task ---
-async def summarize_and_write(
-    thread_id: str,
-    data: Dict,
-    out_dir: str,
-    client: AsyncOpenAI,
-    sem: asyncio.Semaphore
-) -> None:
-    """Fetch summary for one thread and write JSON to disk."""
-    async with sem:
-        # build prompt and truncate by tokens
-        full_text = "\n\n".join(data["texts"])
-        prompt    = truncate_to_tokens(full_text, MAX_TOKENS_PER_PROMPT)
-
-        # request summary
-        messages = [
-            {"role": "system",
-             "content": "Write a concise, but detailed 2–3 sentence summary of this email thread."},
-            {"role": "user", "content": prompt}
-        ]
-        resp = await call_chat_completion(client, messages)
-        summary = resp.choices[0].message.content.strip()
+def split_into_chunks(texts: list[str], max_tokens: int) -> list[str]:
+    """
+    Packs consecutive texts (messages / attachments, in order) into chunks of at
+    most `max_tokens`; a single text longer than that is cut on token boundaries.
+    """
+    chunks, current, used = [], [], 0
+    for text in texts:
+        tokens = encode(text)
+        pieces = [tokens[i:i + max_tokens] for i in range(0, len(tokens), max_tokens)] or [[]]
+        for piece in pieces:
+            if current and used + len(piece) > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, used = [], 0
+            current.append(text if len(pieces) == 1 else decode(piece))
+            used += len(piece)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+# --- Prompt / document builders (shared with the batch mode) ---
+def build_summary_messages(data: Dict) -> list[Dict]:
+    """System + user messages for one thread; delta threads get the previous summary plus only their new messages."""
+    full_text = "\n\n".join(data["texts"])
+
+    if data.get("mode") == "delta":
+        # thread only gained messages: update the previous summary with just those
+        prompt = truncate(
+            f"Current summary:\n{data['previous_summary']}\n\nNew messages:\n{full_text}",
+            MAX_TOKENS_PER_PROMPT
+        )
+        system_prompt = DELTA_SUMMARY_PROMPT
+    else:
+        prompt = truncate(full_text, MAX_TOKENS_PER_PROMPT)
+        system_prompt = SUMMARY_PROMPT
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def messages_cache_key(messages: list[Dict]) -> str:
+    return completion_key(SUMMARY_MODEL, messages[0]["content"], messages[1]["content"], SUMMARY_TEMPERATURE)
 
-    # assemble document
-    first_date   = min(data["dates"]).isoformat()
-    last_date    = max(data["dates"]).isoformat()
-    subject      = next(iter(data["subjects"]))
-    participants = list(data["participants"])
-    message_ids  = data["message_ids"]
 
-    thread_doc = {
+def build_thread_doc(thread_id: str, data: Dict, summary: str | None) -> Dict:
+    return {
         "type":         "thread",
         "thread_id":    thread_id,
-        "subject":      subject,
-        "participants": participants,
-        "first_date":   first_date,
-        "last_date":    last_date,
-        "message_ids":  message_ids,
+        "subject":      next(iter(data["subjects"])),
+        "participants": list(data["participants"]),
+        "first_date":   min(data["dates"]).isoformat(),
+        "last_date":    max(data["dates"]).isoformat(),
+        "message_ids":  data["message_ids"],
         "summary_text": summary,
+        "fingerprint":  data.get("fingerprint"),
+        "attachment_hashes": data.get("attachment_hashes", []),
         "doc_id":       f"t_{thread_id}"
     }
 
+
+# --- Cached, rate-limited completion ---
+async def complete(messages: list[Dict], executor: AsyncExecutor, cache: LLMCache | None = None) -> str:
+    """Returns the completion for `messages`, from `cache` if this exact prompt was summarized before."""
+    key = messages_cache_key(messages)
+    summary = cache.get(key) if cache is not None else None
+    if summary is None:
+        client = get_async_openai()
+        resp = await executor.call(
+            lambda: call_chat_completion(client, messages),
+            tokens=estimate_tokens(messages[0]["content"] + messages[1]["content"]) + MAX_SUMMARY_TOKENS
+        )
+        summary = resp.choices[0].message.content.strip()
+        if cache is not None:
+            cache.put(key, SUMMARY_MODEL, SUMMARY_TEMPERATURE, summary)
+    return summary
+
+
+# --- Map-reduce summarization for threads longer than one prompt ---
+async def map_reduce_summary(
+    texts: list[str],
+    executor: AsyncExecutor,
+    cache: LLMCache | None = None,
+    previous_summary: str | None = None
+) -> str:
+    """
+    Map: every chunk of MAP_CHUNK_TOKENS is summarized concurrently through the executor.
+    Reduce: the chunk summaries are combined (in further concurrent rounds while they
+    still exceed one prompt), so the whole thread is covered at roughly one request
+    latency per level. After MAX_REDUCE_ROUNDS, or once a round no longer reduces the
+    number of partial summaries, what's left is truncated into the final prompt. Delta
+    threads pass their `previous_summary` into the reduce step.
+    """
+    async def summarize_chunks(chunks):
+        return await asyncio.gather(*(
+            complete([{"role": "system", "content": CHUNK_SUMMARY_PROMPT},
+                      {"role": "user", "content": chunk}], executor, cache)
+            for chunk in chunks
+        ))
+
+    partials = await summarize_chunks(split_into_chunks(texts, MAP_CHUNK_TOKENS))
+    for _ in range(MAX_REDUCE_ROUNDS):
+        if len(partials) <= 1 or not exceeds_tokens("\n\n".join(partials), MAX_TOKENS_PER_PROMPT):
+            break
+        chunks = split_into_chunks(partials, MAP_CHUNK_TOKENS)
+        if len(chunks) >= len(partials):
+            break                                               # partials as long as a chunk: no progress, truncate below
+        partials = await summarize_chunks(chunks)
+
+    parts = "\n\n".join(f"Part {i}: {p}" for i, p in enumerate(partials, start=1))
+    if previous_summary:
+        system_prompt, prompt = DELTA_SUMMARY_PROMPT, f"Current summary:\n{previous_summary}\n\nNew messages (summarized):\n{parts}"
+    else:
+        system_prompt, prompt = REDUCE_SUMMARY_PROMPT, parts
+
+    return await complete([
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": truncate(prompt, MAX_TOKENS_PER_PROMPT)}
+    ], executor, cache)
+
+
+# --- Per-thread summarization task ---
+async def summarize_and_write(
+    thread_id: str,
+    data: Dict,
+    out_dir: str,
+    executor: AsyncExecutor,
+    cache: LLMCache | None = None
+) -> None:
+    """
+    Fetch summary for one thread and write JSON to disk. Threads that don't fit one
+    prompt are summarized map-reduce (with MAP_REDUCE_SUMMARIES) instead of truncated.
+    """
+    if MAP_REDUCE_SUMMARIES and exceeds_tokens("\n\n".join(data["texts"]), MAX_TOKENS_PER_PROMPT):
+        summary = await map_reduce_summary(data["texts"], executor, cache, data.get("previous_summary"))
+    else:
+        summary = await complete(build_summary_messages(data), executor, cache)
+
+    thread_doc = build_thread_doc(thread_id, data, summary)
+
     # async write via aiofiles
     out_path = os.path.join(out_dir, f"{thread_id}.json")
     async with aiofiles.open(out_path, "w", encoding="utf-8") as f:
@@ -95,53 +193,56 @@ async def summarize_and_write(
 
 # --- Orchestrator ---
 async def async_assemble_and_summarize(
-    threads: Dict[str, Dict],
-    out_dir: str
+    threads: Iterable[Tuple[str, Dict]],
+    out_dir: str,
+    total: int | None = None,
+    use_cache: bool = True
 ) -> None:
+    """
+    Summarizes (thread_id, data) pairs as they are pulled from `threads`, which
+    may be a lazy generator: the shared chat executor keeps a sliding window of
+    requests in flight, so only that many assembled threads are held at once.
+    With `use_cache`, completions are looked up in / stored to the LLM cache.
+    """
     os.makedirs(out_dir, exist_ok=True)
-    client = AsyncOpenAI(api_key=SECRET_KEY)
-    sem    = asyncio.Semaphore(MAX_CONCURRENT)
-
-    items = list(threads.items())
-    total = len(items)
-    completed = 0
-
-    # process in batches to limit memory & rate spikes 
-    for i in range(0, total, BATCH_SIZE):
-        batch = items[i : i + BATCH_SIZE]
-        tasks = [
-            asyncio.create_task(
-                summarize_and_write(tid, data, out_dir, client, sem)
-            )
-            for tid, data in batch
-        ]
-
-        # report progress as tasks complete
-        for coro in asyncio.as_completed(tasks):
-            try:
-                await coro
-            except Exception as e:
-                print(f"❌ Error summarizing thread {e}")
-            completed += 1
-            if completed % PROGRESS_STEP == 0 or completed == total:
-                print(f"→ Summarized {completed}/{total} threads")
+    executor = get_executor("chat")
+    cache    = LLMCache() if use_cache else None
+
+    async def summarize(item):
+        tid, data = item
+        await summarize_and_write(tid, data, out_dir, executor, cache)
+
+    # progress (throughput, in flight, queue depth) is reported by the executor
+    try:
+        async for (tid, _), _, error in executor.map(summarize, threads, total=total, label="threads summarized", progress_step=PROGRESS_STEP):
+            if error is not None:
+                print(f"❌ Error summarizing thread {tid}: {error}")
+    finally:
+        if cache is not None:
+            cache.report()
+            cache.close()
 
 # --- Entry point ---
 def main():
+    print("Indexing email metadata…\n")
+    index        = build_corpus_index(emails_dir)
     print("Building thread maps…\n")
-    thread_map   = build_thread_map(emails_dir)
-    print("Assembling thread documents…\n")
-    threads      = build_thread_docs(
-        emails_dir,
-        parsed_attachments_dir,
-        thread_map
-    )
+    thread_map   = build_thread_map(index)
+    print("Grouping thread documents…\n")
+    attachment_index = load_attachment_index()
+    groups       = group_threads(index, thread_map)
+    near_dups    = NearDuplicates.load() if NEAR_DUP_ENABLED else None
+    suppression  = SenderSuppression.load() if SENDER_SUPPRESSION_ENABLED else None
+    prune_thread_docs(thread_documents_dir, groups)
+    plan         = plan_thread_refresh(groups, attachment_index, thread_documents_dir, near_duplicates=near_dups, suppression=suppression)
+    threads      = iter_thread_docs(groups, index, attachment_index, plan)
 
     print("Starting async summarization…\n")
     asyncio.run(
         async_assemble_and_summarize(
             threads,
-            thread_documents_dir
+            thread_documents_dir,
+            total=len(plan)
         )
     )
 
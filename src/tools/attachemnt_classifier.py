@@ -1,9 +1,9 @@
 import os
+from functools import partial
 from config import *
 from src.tools.safe_step import *
-from PyPDF2 import PdfReader                                    # Reading PDFs
+from src.tools.pdf_backends import get_pdf_backend             # Reading PDFs (shared with the parser)
 import warnings                                                 # PDF warnings
-from PyPDF2.errors import PdfReadWarning                        # PDF warnings
 warnings.filterwarnings("ignore")          
 from pdf2image import convert_from_path                         # PDF warnings
 import pytesseract                                              # Optical text recognition
@@ -12,6 +12,29 @@ from PIL import Image                                           # Image handling
 import pandas as pd                                             # Tabular data handling
 
 
+def pdf_probe_text(path, max_pages=2):
+    """Digital text of a PDF's first pages, to tell scannable PDFs from scans."""
+    return "".join(get_pdf_backend().page_texts(path, max_pages=max_pages))
+
+
+def image_relevance(path, min_width=300.0, min_height=200.0, min_words=10):
+    """"relevant" if an image is large enough, not square (logos, icons) and holds enough OCR words."""
+    pytesseract.pytesseract.tesseract_cmd = tesseract_path  # Path to Tesseract executable
+    with Image.open(path) as img:
+        width, height = img.size
+    if width < min_width or height < min_height:
+        return "not_relevant"
+    if 0.9 < height / width < 1.1:
+        return "not_relevant"
+    words = len(pytesseract.image_to_string(path).strip().split())
+    return "relevant" if words >= min_words else "not_relevant"
+
+
+def probe(watchdog, parser, path, probe_fn):
+    """Runs a classification probe under `watchdog` (timeout / memory cap / quarantine) when one is given."""
+    return probe_fn(path) if watchdog is None else watchdog.run(parser, path, probe_fn)
+
+
 class AttachmentClassifier():
     def __init__(self, path, supported_formats, document_limit=None):
         self.path = path
@@ -59,9 +82,12 @@ class AttachmentClassifier():
     
 
     @safe_step
-    def get_scannable_pdfs(self, min_char=10, document_limit=None, print_text=False):
-        warnings.filterwarnings("ignore", category=PdfReadWarning)                      # Turning off the warnings
-
+    def get_scannable_pdfs(self, min_char=10, document_limit=None, print_text=False, watchdog=None):
+        """
+        Segments PDFs into scannable (digital text) and non_scannable by probing their
+        first pages, under `watchdog` when given: PDFs that hang or blow up are
+        quarantined and counted as broken.
+        """
         pdf_attachments = {
             "scannable": [],
             "non_scannable": [],
@@ -77,21 +103,16 @@ class AttachmentClassifier():
         try:
             for filename in all_files[:document_limit]:
                 file_path = os.path.join(self.path, filename)
-                try:
-                    with open(file_path, "rb") as f:
-                                                            # Error handling added to the inner loops since some PDFs were "broken"
-                            reader = PdfReader(f)
-                            text = ""
-                            for page in reader.pages[:2]:
-                                text += page.extract_text() or ""
-
-                            if print_text:
-                                print(f"\n{file_path}\n{text}\n")
-
-                            if len(text.strip()) >= min_char:                           # PDF Contained Digital text
-                                pdf_attachments["scannable"].append(file_path)
-                            else:
-                                pdf_attachments["non_scannable"].append(file_path)      # PDF did NOT Contained Digital text --> Will be scanned by Tesseract later
+                try:                                                # Error handling added to the inner loops since some PDFs were "broken"
+                    text = probe(watchdog, "pdf_probe", file_path, pdf_probe_text)
+
+                    if print_text:
+                        print(f"\n{file_path}\n{text}\n")
+
+                    if len(text.strip()) >= min_char:                           # PDF Contained Digital text
+                        pdf_attachments["scannable"].append(file_path)
+                    else:
+                        pdf_attachments["non_scannable"].append(file_path)      # PDF did NOT Contained Digital text --> Will be scanned by Tesseract later
                 except Exception as e:
                     pdf_attachments["broken"].append(file_path)
                     print(f"Failed to indentify PDF {file_path} \nbecause {e}")
@@ -104,12 +125,13 @@ class AttachmentClassifier():
 
 
     @safe_step
-    def get_relevant_images(self, min_file_size = 20, min_width=300.0, min_height=200.0, min_words=10, document_limit=None):
+    def get_relevant_images(self, min_file_size = 20, min_width=300.0, min_height=200.0, min_words=10, document_limit=None, watchdog=None):
         """
         Applies policies to identify, whether PNG/JPS/JPEG attachements
         contain any relevant text to parse. Otherwise removes them.
+        Images are opened and OCR-probed under `watchdog` when given.
         """
-        pytesseract.pytesseract.tesseract_cmd = tesseract_path  # Path to Tesseract executable
+        relevance = partial(image_relevance, min_width=min_width, min_height=min_height, min_words=min_words)
 
         self.images = {
             "relevant": [],
@@ -133,28 +155,8 @@ class AttachmentClassifier():
                     self.images["not_relevant"].append(file_path)
                     continue
 
-                with Image.open(file_path) as img:
-
-                    # Check size
-                    width, height = img.size
-                    if width < min_width or height < min_height:
-                        self.images["not_relevant"].append(file_path)
-                        continue
-
-                    # Check aspect ratio
-                    a_ratio = height / width
-                    if 0.9 < a_ratio < 1.1:
-                        self.images["not_relevant"].append(file_path)
-                        continue
-
-                    # Check if file has enough text
-                    text = pytesseract.image_to_string(file_path)
-                    words = len(text.strip().split())
-                    if words < min_words:
-                        self.images["not_relevant"].append(file_path)
-                        continue
-
-                self.images["relevant"].append(file_path)
+                # Check size, aspect ratio and amount of text
+                self.images[probe(watchdog, "image_probe", file_path, relevance)].append(file_path)
 
             except Exception as e:
                 self.images["failed"].append(file_path)
@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+from config import *
+from src.tools.thread_summaries import normalize_id
+
+
+def attachment_key(message_id):
+    """
+    Lookup key for a message_id. Attachment filenames carry the message_id with
+    ":" replaced by "_" (see parse_message_to_dict), so the key does the same.
+    """
+    return normalize_id(message_id or "").replace(":", "_")
+
+
+def split_attachment_filename(filename):
+    """Splits _id_{message_id}_id_{original_name} into (key, original_name), or None."""
+    parts = filename.split(id_marker)
+    if len(parts) < 3:
+        return None
+    return attachment_key(parts[1]), id_marker.join(parts[2:])
+
+
+class AttachmentIndex():
+    """
+    Persisted map of normalized message_id → parsed attachment texts, filled in as
+    attachments are parsed and queried by every stage that needs a message's
+    attachments (instead of each one listing `parsed_attachments_dir`).
+    """
+    def __init__(self, path=attachment_index_path, entries=None):
+        self.path = path
+        self.entries = entries or {}                            # key → { txt filename: {"path", "name", "sha256"} }
+
+    def __len__(self):
+        return sum(len(v) for v in self.entries.values())
+
+    def add(self, txt_path, text=None):
+        """Registers one parsed attachment .txt; `text` (if known) is hashed for change detection."""
+        filename = os.path.basename(txt_path)
+        split = split_attachment_filename(filename)
+        if split is None:
+            return False
+        key, original_name = split
+
+        if text is None:
+            with open(txt_path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        self.entries.setdefault(key, {})[filename] = {
+            "path": txt_path,
+            "name": original_name,
+            "sha256": hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+        }
+        return True
+
+    def get(self, message_id):
+        """Returns the entries of every parsed attachment of `message_id`, sorted by filename."""
+        files = self.entries.get(attachment_key(message_id), {})
+        return [files[fn] for fn in sorted(files)]
+
+    def paths(self, message_id):
+        return [e["path"] for e in self.get(message_id)]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+
+    @classmethod
+    def rebuild(cls, parsed_dir=parsed_attachments_dir, path=attachment_index_path):
+        """One scan of `parsed_dir`, for trees parsed before the index existed."""
+        index = cls(path)
+        for fn in os.listdir(parsed_dir):
+            if fn.endswith(".txt"):
+                index.add(os.path.join(parsed_dir, fn))
+        print(f"[INFO] Rebuilt attachment index: {len(index)} attachments")
+        return index
+
+
+def load_attachment_index(parsed_dir=parsed_attachments_dir, path=attachment_index_path):
+    """Loads the persisted index, rebuilding (and saving) it from `parsed_dir` if it doesn't exist yet."""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return AttachmentIndex(path, json.load(f))
+    if not os.path.isdir(parsed_dir):
+        return AttachmentIndex(path)
+    index = AttachmentIndex.rebuild(parsed_dir, path)
+    index.save()
+    return index
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import shutil
+import signal
+import multiprocessing as mp
+from config import *
+
+try:
+    import resource                                             # POSIX only, used for the memory cap
+except ImportError:
+    resource = None
+
+
+class AttachmentQuarantined(Exception):
+    """Raised when an attachment was killed by the watchdog and moved to quarantine."""
+
+
+def _worker_loop(conn, memory_limit_mb):
+    """
+    Runs inside the supervised child process: receives (extract_fn, path) jobs,
+    runs them and sends back ("ok", text) / ("memory", msg) / ("error", msg).
+    """
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()                                            # own process group, so tesseract/poppler children die with us
+    if memory_limit_mb and resource is not None:
+        limit = int(memory_limit_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        extract_fn, path = job
+        try:
+            conn.send(("ok", extract_fn(path)))
+        except MemoryError as e:
+            conn.send(("memory", repr(e)))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+
+
+class AttachmentWatchdog():
+    """
+    Runs each attachment extraction in a long-lived child process with a wall-clock
+    timeout and an optional memory cap. A hung or runaway parse gets its worker killed
+    (and respawned), the file is moved to `quarantine_dir` and recorded in the
+    quarantine report, and the batch moves on to the next attachment.
+    """
+    def __init__(
+        self,
+        timeout=ATTACHMENT_TIMEOUT_S,
+        memory_limit_mb=ATTACHMENT_MEMORY_LIMIT_MB,
+        quarantine_dir=quarantine_dir,
+        report_path=quarantine_report_path,
+        move_files=True
+    ):
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.quarantine_dir = quarantine_dir
+        self.report_path = report_path
+        self.move_files = move_files
+        self.quarantined = []
+        self.process = None
+        self.conn = None
+
+        if memory_limit_mb and resource is None:
+            print("[WARNING] Memory cap is not supported on this platform; only the timeout applies.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self):
+        parent_conn, child_conn = mp.Pipe()
+        self.process = mp.Process(target=_worker_loop, args=(child_conn, self.memory_limit_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def _kill(self):
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            try:
+                if hasattr(os, "killpg"):
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                else:
+                    self.process.kill()
+            except (ProcessLookupError, PermissionError):
+                self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def _quarantine(self, parser, path, reason, elapsed):
+        record = {
+            "path": path,
+            "parser": parser,
+            "reason": reason,
+            "elapsed_s": round(elapsed, 2),
+            "timestamp": time.time()
+        }
+        if self.move_files and os.path.exists(path):
+            os.makedirs(self.quarantine_dir, exist_ok=True)
+            record["quarantined_to"] = shutil.move(path, os.path.join(self.quarantine_dir, os.path.basename(path)))
+
+        os.makedirs(os.path.dirname(self.report_path), exist_ok=True)
+        with open(self.report_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.quarantined.append(record)
+        raise AttachmentQuarantined(f"{os.path.basename(path)} quarantined ({reason})")
+
+    def run(self, parser, path, extract_fn):
+        """Returns extract_fn(path) computed in the supervised worker."""
+        if self.process is None or not self.process.is_alive():
+            self._start()
+
+        start = time.perf_counter()
+        self.conn.send((extract_fn, path))
+
+        if not self.conn.poll(self.timeout):
+            self._kill()
+            self._quarantine(parser, path, f"timeout after {self.timeout}s", time.perf_counter() - start)
+
+        try:
+            status, payload = self.conn.recv()
+        except EOFError:                                        # worker died (e.g. OOM-killed by the OS)
+            self._kill()
+            self._quarantine(parser, path, "worker crashed", time.perf_counter() - start)
+
+        if status == "ok":
+            return payload
+        if status == "memory":
+            self._kill()                                        # address space may be fragmented, start fresh
+            self._quarantine(parser, path, f"memory cap of {self.memory_limit_mb} MB exceeded", time.perf_counter() - start)
+        raise RuntimeError(payload)
+
+    def report(self):
+        print(f"[INFO] Watchdog quarantined {len(self.quarantined)} attachments.")
+        for record in self.quarantined:
+            print(f"   -> {os.path.basename(record['path'])} ({record['parser']}): {record['reason']}")
+        if self.quarantined:
+            print(f"   Full report: {self.report_path}")
+
+    def close(self):
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=5)
+            except (BrokenPipeError, OSError):
+                pass
+        self._kill()
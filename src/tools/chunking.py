@@ -1,17 +1,16 @@
 from config import *
-import tiktoken
+from src.tools.tokenizer import encode, decode
 
 def chunk_text(text, encoder = ENCODER_NAME, token_window=MAX_TOKENS, overlap=OVERLAP):
     """
     Splits raw text into chunks of X tokens with Y tokens overlap.
     """
-    encoder = tiktoken.get_encoding(encoder)
-    tokens = encoder.encode(text)
+    tokens = encode(text, encoding=encoder)
     chunks = []
     start = 0
     while start < len(tokens):
         end = min(start + token_window, len(tokens))
         chunk_tok = tokens[start:end]
-        chunks.append(encoder.decode(chunk_tok))
+        chunks.append(decode(chunk_tok, encoding=encoder))
         start += token_window - overlap
     return chunks
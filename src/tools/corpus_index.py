@@ -0,0 +1,103 @@
+import os
+import json
+from config import *
+from src.tools.thread_summaries import normalize_id
+from src.tools.sender_suppression import sender_address, boilerplate_share
+
+
+class CorpusIndex():
+    """
+    Metadata of every email JSON in `emails_dir`, built in a single scan:
+    message_id, parent, references, date, subject, participants, sender, file, body length
+    and the bulk-mail signals (List-Unsubscribe, boilerplate share) used by sender suppression.
+    Stages consume the index and only open an email file when they need its body.
+    Persisted as JSONL; rebuilding re-reads only files whose size/mtime changed.
+    """
+    def __init__(self, emails_dir, records=None):
+        self.emails_dir = emails_dir
+        self.records = records or []                            # one dict per email file
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @staticmethod
+    def _record(fn, stat, e):
+        return {
+            "file":         fn,
+            "mtime":        stat.st_mtime,
+            "size":         stat.st_size,
+            "message_id":   normalize_id(e.get("message_id", "") or ""),
+            "parent":       normalize_id(e.get("in_reply_to", "") or "") or None,
+            "references":   [normalize_id(r) for r in e.get("references", []) or []],
+            "date":         e.get("date"),
+            "subject":      e.get("subject", ""),
+            "participants": e.get("participants", []),
+            "body_len":     len(e.get("body", "") or ""),
+            "sender":       sender_address(e),
+            "list_unsubscribe": bool(e.get("list_unsubscribe")),
+            "boilerplate_share": round(boilerplate_share(e.get("body", "") or ""), 3),
+        }
+
+    @classmethod
+    def build(cls, emails_dir, previous=None):
+        """Scans `emails_dir` once, reusing records from `previous` for unchanged files."""
+        known = {r["file"]: r for r in previous.records} if previous else {}
+        records = []
+        reused = 0
+
+        with os.scandir(emails_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                stat = entry.stat()
+                old = known.get(entry.name)
+                if old and "sender" in old and old["mtime"] == stat.st_mtime and old["size"] == stat.st_size:
+                    records.append(old)
+                    reused += 1
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        records.append(cls._record(entry.name, stat, json.load(f)))
+                except (OSError, ValueError) as e:
+                    print(f"[WARNING] Skipping {entry.name!r} in corpus index: {e}")
+
+                if len(records) % (verbosity * 10) == 0:
+                    print(f"   -> Indexed {len(records)} emails", flush=True)
+
+        records.sort(key=lambda r: r["file"])
+        print(f"[INFO] Corpus index: {len(records)} emails ({reused} unchanged since last scan)")
+        return cls(emails_dir, records)
+
+    def save(self, path=corpus_index_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for r in self.records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, emails_dir, path=corpus_index_path):
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(emails_dir, [json.loads(line) for line in f if line.strip()])
+
+    def path_of(self, record):
+        return os.path.join(self.emails_dir, record["file"])
+
+    def read_email(self, record):
+        """Loads the full email JSON (incl. body) behind an index record."""
+        with open(self.path_of(record), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def build_corpus_index(emails_dir=emails_dir, index_path=corpus_index_path, incremental=True):
+    """Loads the persisted index (if any), refreshes it with one scan of `emails_dir` and saves it."""
+    previous = CorpusIndex.load(emails_dir, index_path) if incremental else None
+    index = CorpusIndex.build(emails_dir, previous)
+    index.save(index_path)
+    return index
@@ -0,0 +1,163 @@
+import os
+import re
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from openai import OpenAI
+from config import *
+from src.tools.async_executor import get_async_openai, estimate_tokens
+
+OPENAI_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+WORD = re.compile(r"\w+")
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+class Embedder():
+    """
+    Interface of every embedding backend:
+      name       → model identifier, also the embedding cache key
+      dimension  → vector length, used for the knn_vector mappings
+      embed      → list of texts → list of vectors, in input order
+      aembed     → async embed; API backends go through the executor's rate budget
+    """
+    name = None
+    dimension = None
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+    async def aembed(self, texts, executor=None, tokens=None):
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class OpenAIEmbedder(Embedder):
+    """
+    OpenAI embeddings endpoint; `client` overrides the shared AsyncOpenAI client (e.g.
+    a simulated API). text-embedding-3 models can return shortened vectors (`dimensions`).
+    """
+    def __init__(self, model=EMBEDDINGS_MODEL, client=None, dimensions=EMBEDDING_DIMENSIONS):
+        if dimensions and not model.startswith("text-embedding-3"):
+            print(f"[WARNING] {model} can't shorten its embeddings, using its native dimension")
+            dimensions = None
+        self.model = model
+        self.params = {"dimensions": dimensions} if dimensions else {}
+        self.name = f"{model}@{dimensions}" if dimensions else model
+        self.dimension = dimensions or OPENAI_DIMENSIONS.get(model, 1536)
+        self.client = client
+        self.sync_client = None
+
+    def embed(self, texts):
+        if self.sync_client is None:
+            self.sync_client = OpenAI(api_key=SECRET_KEY)
+        resp = self.sync_client.embeddings.create(model=self.model, input=texts, **self.params)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    async def aembed(self, texts, executor=None, tokens=None):
+        client = self.client or get_async_openai()
+        request = lambda: client.embeddings.create(model=self.model, input=texts, **self.params)
+        if executor is None:
+            resp = await request()
+        else:
+            resp = await executor.call(request, tokens=tokens or sum(estimate_tokens(t) for t in texts))
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+
+class LocalEmbedder(Embedder):
+    """
+    Sentence-embedding model on the CPU, loaded from a local path: an ONNX export
+    (model.onnx + tokenizer.json, mean-pooled) or a sentence-transformers folder.
+    Texts are embedded in batches of `batch_size` spread over `workers` threads,
+    each using `threads / workers` intra-op threads. Vectors are L2-normalized.
+    """
+    def __init__(self, path=LOCAL_EMBEDDING_MODEL_PATH, batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+                 threads=LOCAL_EMBEDDING_THREADS, workers=LOCAL_EMBEDDING_WORKERS, max_tokens=LOCAL_EMBEDDING_MAX_TOKENS):
+        self.name = f"local:{os.path.basename(os.path.normpath(path))}"
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.lock = threading.Lock()                            # one embed() at a time, it already uses every core
+        intra_threads = max(1, threads // self.workers)
+
+        onnx_path = path if path.endswith(".onnx") else os.path.join(path, "model.onnx")
+        if os.path.exists(onnx_path):
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = intra_threads
+            self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+            self.input_names = {i.name for i in self.session.get_inputs()}
+            self.tokenizer = Tokenizer.from_file(os.path.join(os.path.dirname(onnx_path), "tokenizer.json"))
+            self.tokenizer.enable_truncation(max_tokens)
+            self.tokenizer.enable_padding()
+            self._encode = self._encode_onnx
+        else:
+            import torch
+            from sentence_transformers import SentenceTransformer
+            torch.set_num_threads(intra_threads)
+            self.model = SentenceTransformer(path, device="cpu")
+            self.model.max_seq_length = max_tokens
+            self._encode = self._encode_sentence_transformers
+
+        self.dimension = len(self._encode(["dimension probe"])[0])
+
+    def _encode_onnx(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feeds)[0]                       # (batch, tokens, dimension)
+        pooled = (hidden * mask[..., None]).sum(axis=1) / np.clip(mask.sum(axis=1, keepdims=True), 1, None)
+        return _normalize(pooled.astype(np.float32))
+
+    def _encode_sentence_transformers(self, texts):
+        return self.model.encode(texts, batch_size=len(texts), normalize_embeddings=True, convert_to_numpy=True)
+
+    def embed(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with self.lock, ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return [v for vectors in pool.map(self._encode, batches) for v in vectors.tolist()]
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic feature-hashing embedder (signed word unigrams + bigrams), no model
+    and no network: identical texts always get identical vectors. Meant for tests
+    and offline runs, not for retrieval quality.
+    """
+    def __init__(self, dimension=HASHING_EMBEDDING_DIM):
+        self.name = f"hashing-{dimension}"
+        self.dimension = dimension
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = WORD.findall((text or "").lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, h % self.dimension] += 1.0 if h >> 63 else -1.0
+        return _normalize(vectors).tolist()
+
+
+_embedder = None
+
+def get_embedder():
+    """Process-wide embedder selected by EMBEDDER ("openai", "local" or "hashing")."""
+    global _embedder
+    if _embedder is None:
+        _embedder = {
+            "openai":  OpenAIEmbedder,
+            "local":   LocalEmbedder,
+            "hashing": HashingEmbedder,
+        }[EMBEDDER]()
+    return _embedder
@@ -0,0 +1,79 @@
+import asyncio
+from config import *
+from src.tools.async_executor import is_rate_limited
+from src.tools.embedders import get_embedder
+from src.tools.tokenizer import encode, decode
+
+
+def prepare_input(text, max_tokens=EMBEDDINGS_MAX_INPUT_TOKENS):
+    """Returns (text, n_tokens), truncating texts longer than the embedding model accepts."""
+    tokens = encode(text, max_tokens + 1, encoding=EMBEDDINGS_MODEL)
+    if len(tokens) > max_tokens:
+        return decode(tokens[:max_tokens], encoding=EMBEDDINGS_MODEL), max_tokens
+    return text, len(tokens)
+
+
+def pack_batches(items, max_inputs=EMBEDDINGS_BATCH_INPUTS, max_tokens=EMBEDDINGS_BATCH_TOKENS):
+    """
+    Greedily packs (key, text, n_tokens) items, in order, into requests of at most
+    `max_inputs` inputs and `max_tokens` tokens. Lazy: each batch is yielded once full.
+    """
+    batch, batch_tokens = [], 0
+    for item in items:
+        if batch and (len(batch) >= max_inputs or batch_tokens + item[2] > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += item[2]
+    if batch:
+        yield batch
+
+
+async def embed_batch(batch, executor, embedder=None, cache=None):
+    """
+    Embeds one packed batch in a single request (one `embedder.aembed` call) and maps
+    the vectors back to their keys; texts found in the embedding `cache` are served
+    from it and left out of the request. Returns ({key: vector}, {key: error}).
+    """
+    embedder = embedder or get_embedder()
+    vectors = {}
+    if cache is not None:
+        misses = []
+        for item in batch:
+            vector = cache.get(embedder.name, item[1])
+            if vector is None:
+                misses.append(item)
+            else:
+                vectors[item[0]] = vector
+        batch = misses
+    if not batch:
+        return vectors, {}
+
+    embedded, errors = await _request_batch(batch, executor, embedder, cache)
+    return {**vectors, **embedded}, errors
+
+
+async def _request_batch(batch, executor, embedder, cache):
+    """
+    A request that still fails after the executor's retries is split in halves and
+    each half retried, down to single inputs, so only the offending items fail.
+    """
+    texts = [text for _, text, _ in batch]
+    try:
+        embedded = await embedder.aembed(texts, executor, tokens=sum(n for _, _, n in batch))
+    except Exception as e:
+        if len(batch) == 1 or is_rate_limited(e):
+            return {}, {key: e for key, _, _ in batch}
+        half = len(batch) // 2
+        (v1, e1), (v2, e2) = await asyncio.gather(
+            _request_batch(batch[:half], executor, embedder, cache),
+            _request_batch(batch[half:], executor, embedder, cache)
+        )
+        return {**v1, **v2}, {**e1, **e2}
+
+    vectors = {}
+    for (key, text, _), vector in zip(batch, embedded):
+        vectors[key] = vector
+        if cache is not None:
+            cache.put(embedder.name, text, vector)
+    return vectors, {}
@@ -0,0 +1,113 @@
+import atexit
+import hashlib
+import threading
+import time
+from array import array
+from config import *
+from src.tools.sqlite_cache import SQLiteCache
+
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(SQLiteCache):
+    """
+    On-disk SQLite cache of embedding vectors keyed by (model, sha256(text)), stored
+    and returned as float32 arrays. Least-recently-used entries are evicted once the
+    cache exceeds `max_entries` or `max_mb`. Shared by ingestion and querying, so
+    unchanged texts, repeated queries and recurring memory facts never hit the API twice.
+    """
+    label = "Embedding cache"
+
+    def __init__(self, path=embedding_cache_path, max_entries=EMBEDDING_CACHE_MAX_ENTRIES, max_mb=EMBEDDING_CACHE_MAX_MB):
+        super().__init__(path, check_same_thread=False)         # one connection, shared by the query threads
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.pending = 0                                        # uncommitted writes (puts + LRU touches)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model       TEXT NOT NULL,
+                sha256      TEXT NOT NULL,
+                vector      BLOB NOT NULL,
+                last_used   REAL NOT NULL,
+                PRIMARY KEY (model, sha256)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used)")
+        self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get(self, model, text):
+        key = (model, text_sha256(text))
+        with self.lock:
+            row = self.conn.execute("SELECT vector FROM embeddings WHERE model = ? AND sha256 = ?", key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE embeddings SET last_used = ? WHERE model = ? AND sha256 = ?", (time.time(), *key))
+            self._written()
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector
+
+    def put(self, model, text, vector):
+        blob = array("f", vector).tobytes()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                (model, text_sha256(text), blob, time.time())
+            )
+            self._written()
+
+    def _written(self, every=EMBEDDING_CACHE_COMMIT_EVERY):
+        self.pending += 1
+        if self.pending >= every:
+            self._evict()
+            self.conn.commit()
+            self.pending = 0
+
+    def _evict(self):
+        """Deletes least-recently-used entries until both limits hold again (with 10% headroom)."""
+        count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return 0
+        keep_n, keep_bytes = int(self.max_entries * 0.9), int(self.max_bytes * 0.9)
+        victims = []
+        for model, sha, n_bytes in self.conn.execute("SELECT model, sha256, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            if count <= keep_n and size <= keep_bytes:
+                break
+            victims.append((model, sha))
+            count -= 1
+            size -= n_bytes
+        self.conn.executemany("DELETE FROM embeddings WHERE model = ? AND sha256 = ?", victims)
+        print(f"[INFO] Embedding cache: evicted {len(victims)} least-recently-used vectors")
+        return len(victims)
+
+    def flush(self):
+        with self.lock:
+            self._evict()
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+_cache = None
+
+def get_embedding_cache():
+    """Process-wide cache (None with EMBEDDING_CACHE_ENABLED off), shared by every stage and query."""
+    global _cache
+    if _cache is None and EMBEDDING_CACHE_ENABLED:
+        _cache = EmbeddingCache()
+        atexit.register(_cache.close)                           # commit pending writes on exit
+    return _cache
@@ -0,0 +1,87 @@
+import os
+import json
+import hashlib
+import time
+from config import *
+from src.tools.sqlite_cache import SQLiteCache
+
+
+def completion_key(model, system_prompt, prompt, temperature):
+    """sha256 over everything that determines a completion: model, system prompt, (truncated) prompt, temperature."""
+    payload = json.dumps([model, system_prompt, prompt, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache(SQLiteCache):
+    """
+    On-disk SQLite cache of chat completions keyed by `completion_key`. Reruns,
+    crash recovery and byte-identical prompts (e.g. auto-generated threads) are
+    answered locally instead of calling the API. Entries can be exported to and
+    imported from JSONL to share a cache between machines.
+    """
+    label = "LLM cache"
+
+    def __init__(self, path=llm_cache_path):
+        super().__init__(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key         TEXT PRIMARY KEY,
+                model       TEXT NOT NULL,
+                temperature REAL NOT NULL,
+                completion  TEXT NOT NULL,
+                created_at  REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def get(self, key):
+        row = self.conn.execute("SELECT completion FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, model, temperature, completion):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+            (key, model, temperature, completion, time.time())
+        )
+        self.conn.commit()
+
+    def export_jsonl(self, path):
+        """Writes every entry as one JSON line; returns the number exported."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for key, model, temperature, completion, created_at in self.conn.execute("SELECT * FROM completions"):
+                f.write(json.dumps({
+                    "key": key,
+                    "model": model,
+                    "temperature": temperature,
+                    "completion": completion,
+                    "created_at": created_at
+                }, ensure_ascii=False) + "\n")
+                count += 1
+        print(f"[INFO] Exported {count} cached completions → {path}")
+        return count
+
+    def import_jsonl(self, path, overwrite=False):
+        """Loads entries exported by `export_jsonl`; existing keys are kept unless `overwrite`."""
+        verb = "REPLACE" if overwrite else "IGNORE"
+        before = len(self)
+        with open(path, "r", encoding="utf-8") as f:
+            rows = (json.loads(line) for line in f if line.strip())
+            self.conn.executemany(
+                f"INSERT OR {verb} INTO completions VALUES (?, ?, ?, ?, ?)",
+                ((r["key"], r["model"], r["temperature"], r["completion"], r.get("created_at", time.time())) for r in rows)
+            )
+        self.conn.commit()
+        added = len(self) - before
+        print(f"[INFO] Imported {added} new cached completions from {path}")
+        return added
@@ -10,7 +10,7 @@ from email.utils import make_msgid
 def parse_message_to_dict(raw_str, attachments_dir, n_char=None):
     """
     Parse a raw RFC 822 message string into a dict with:
-      * from, to, cc, date, subject, message_id, in_reply_to, references, body, attachments
+      * from, to, cc, date, subject, message_id, in_reply_to, references, list_unsubscribe, body, attachments
     Truncate 'body' to n_char if desired. Assumes UTF-8 fallback for unknown charsets.
     Pull all attachments into a separate file and save their paths.
     """
@@ -48,6 +48,7 @@ def parse_message_to_dict(raw_str, attachments_dir, n_char=None):
         "message_id": clean_msg_id,
         "in_reply_to": clean_in_reply,
         "references": clean_references,
+        "list_unsubscribe": (email_message.get("List-Unsubscribe", "") or "").strip(),     # mailing lists / bulk senders
         "attachments": [],
         "links": {}
     }
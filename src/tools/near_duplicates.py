@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import hashlib
+from collections import defaultdict
+import numpy as np
+from config import *
+from src.tools.thread_union_find import UnionFind
+from src.tools.thread_summaries import parse_iso
+
+MERSENNE_PRIME = (1 << 31) - 1                                  # a, b, x < 2^31: a*x + b fits in uint64
+WORD = re.compile(r"\w+")
+
+
+def shingles(text, k=NEAR_DUP_SHINGLE_SIZE):
+    """
+    Word k-shingles of a cleaned body, hashed to 32 bits. Numbers are folded to 0
+    so copies that only differ in dates / counts / ids still share their shingles.
+    """
+    words = WORD.findall(re.sub(r"\d+", "0", (text or "").lower()))
+    if len(words) < k:
+        words = words + [""] * (k - len(words)) if words else []
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + k]).encode("utf-8"), digest_size=4).digest(), "little")
+        for i in range(len(words) - k + 1)
+    }
+
+
+class MinHasher():
+    """
+    `num_perm` universal hash functions (a*x + b mod p), applied to a shingle set at
+    once with numpy. Shingles are reduced mod p first so the products never wrap.
+    """
+    def __init__(self, num_perm=NEAR_DUP_NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        x = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)) % np.uint64(MERSENNE_PRIME)
+        hashed = (np.outer(x, self.a) + self.b) % np.uint64(MERSENNE_PRIME)
+        return hashed.min(axis=0).astype(np.uint32)
+
+
+class NearDuplicates():
+    """
+    Clusters of near-duplicate emails: each cluster keeps one representative (its
+    earliest message) with a pointer list of the duplicates it stands for.
+    Persisted as a JSON sidecar; stages ask `is_duplicate` to skip the copies.
+    """
+    def __init__(self, clusters=None, path=near_duplicates_path):
+        self.path = path
+        self.clusters = clusters or {}                              # representative → [duplicate message_ids]
+        self.duplicate_of = {d: rep for rep, dups in self.clusters.items() for d in dups}
+
+    def __len__(self):
+        return len(self.duplicate_of)
+
+    def is_duplicate(self, message_id):
+        return message_id in self.duplicate_of
+
+    def duplicates(self, message_id):
+        return self.clusters.get(message_id, [])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.clusters, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+
+    @classmethod
+    def load(cls, path=near_duplicates_path):
+        """Loads the last detection run; empty (nothing is a duplicate) if there is none."""
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), path)
+
+
+def find_near_duplicates(index, threshold=NEAR_DUP_THRESHOLD, num_perm=NEAR_DUP_NUM_PERM,
+                         bands=NEAR_DUP_BANDS, min_words=NEAR_DUP_MIN_WORDS):
+    """
+    MinHash + LSH over the cleaned bodies of the corpus index:
+      1) one MinHash signature per body with at least `min_words` words
+      2) signatures are cut into `bands` bands; bodies sharing any band bucket are candidates
+      3) candidates whose estimated Jaccard similarity ≥ `threshold` are unioned into clusters
+    Returns NearDuplicates, each cluster represented by its earliest message.
+    """
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm)
+    signatures, dates = {}, {}
+    buckets = defaultdict(list)
+
+    # PASS 1: signatures + LSH buckets
+    for i, rec in enumerate(index, start=1):
+        mid = rec["message_id"]
+        if not mid or rec["body_len"] == 0:
+            continue
+        body = index.read_email(rec).get("body", "")
+        shingle_set = shingles(body)
+        if len(body.split()) < min_words or not shingle_set:
+            continue
+        sig = hasher.signature(shingle_set)
+        signatures[mid], dates[mid] = sig, parse_iso(rec["date"])
+        for band in range(bands):
+            buckets[(band, sig[band * rows:(band + 1) * rows].tobytes())].append(mid)
+        if i % (verbosity * 10) == 0:
+            print(f"   -> MinHashed {i}/{len(index)} emails", flush=True)
+
+    # PASS 2: verify candidates, union the near-duplicates. Each bucket member is
+    # compared with one member per cluster already seen in the bucket (not all pairs),
+    # so a bucket of 10k newsletter copies costs ~10k comparisons.
+    uf = UnionFind()
+    for mid in signatures:
+        uf.add(mid)
+    for mids in buckets.values():
+        if len(mids) < 2:
+            continue
+        seen = []
+        for mid in mids:
+            for other in seen:
+                if uf.find(mid) == uf.find(other):
+                    break
+                if np.mean(signatures[mid] == signatures[other]) >= threshold:
+                    uf.union(mid, other)
+                    break
+            else:
+                seen.append(mid)
+
+    # PASS 3: clusters with the earliest message as representative
+    members = defaultdict(list)
+    for mid in signatures:
+        members[uf.find(mid)].append(mid)
+    clusters = {}
+    for mids in members.values():
+        if len(mids) > 1:
+            mids.sort(key=lambda m: (dates[m], m))
+            clusters[mids[0]] = mids[1:]
+
+    result = NearDuplicates(clusters)
+    print(f"[INFO] Near-duplicates: {len(result)} emails fold into {len(clusters)} representatives "
+          f"({len(signatures)} bodies MinHashed, threshold {threshold})")
+    return result
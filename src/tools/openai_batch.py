@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import uuid
+from openai import OpenAI
+from config import *
+
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+RETRYABLE_CODES = {"rate_limit_exceeded", "server_error", "batch_expired", "missing"}   # "missing": no result recorded
+
+
+# ---REQUEST FILES---------------------------------
+
+def batch_request(custom_id, url, body):
+    """One line of a Batch API input file."""
+    return {"custom_id": custom_id, "method": "POST", "url": url, "body": body}
+
+
+def write_request_files(requests, out_dir, prefix, max_requests=BATCH_MAX_REQUESTS):
+    """
+    Streams `requests` (dicts from `batch_request`) into JSONL files of at most
+    `max_requests` lines each, as the Batch API caps requests per input file.
+    Returns the written paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths, f, count = [], None, 0
+    for req in requests:
+        if f is None or count == max_requests:
+            if f:
+                f.close()
+            paths.append(os.path.join(out_dir, f"{prefix}_{len(paths):03d}.jsonl"))
+            f = open(paths[-1], "w", encoding="utf-8")
+            count = 0
+        f.write(json.dumps(req, ensure_ascii=False) + "\n")
+        count += 1
+    if f:
+        f.close()
+    return paths
+
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# ---CLIENTS---------------------------------
+
+class OpenAIBatchClient():
+    """Thin wrapper over the OpenAI Files + Batches endpoints."""
+    def __init__(self, client=None):
+        self.client = client or OpenAI(api_key=SECRET_KEY)
+
+    def upload(self, path):
+        with open(path, "rb") as f:
+            return self.client.files.create(file=f, purpose="batch").id
+
+    def create(self, input_file_id, endpoint):
+        return self.client.batches.create(
+            input_file_id=input_file_id,
+            endpoint=endpoint,
+            completion_window=BATCH_COMPLETION_WINDOW
+        ).id
+
+    def retrieve(self, batch_id):
+        b = self.client.batches.retrieve(batch_id)
+        return {"status": b.status, "output_file_id": b.output_file_id, "error_file_id": b.error_file_id}
+
+    def download(self, file_id):
+        return self.client.files.content(file_id).text
+
+
+class LocalBatchClient():
+    """
+    Offline stand-in for OpenAIBatchClient. Serves pre-recorded result lines
+    (Batch API output format) from every *.jsonl file in `results_dir`, matched
+    to submitted requests by custom_id; requests without a recorded result come
+    back in the error file. Batches complete immediately.
+    """
+    def __init__(self, results_dir):
+        self.recorded = {}
+        for fn in sorted(os.listdir(results_dir)):
+            if fn.endswith(".jsonl"):
+                for line in read_jsonl(os.path.join(results_dir, fn)):
+                    self.recorded[line["custom_id"]] = line
+        self.files = {}
+        self.batches = {}
+
+    def upload(self, path):
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.files[file_id] = path
+        return file_id
+
+    def create(self, input_file_id, endpoint):
+        output, errors = [], []
+        for req in read_jsonl(self.files[input_file_id]):
+            line = self.recorded.get(req["custom_id"])
+            if line is None:
+                errors.append({"custom_id": req["custom_id"], "response": None,
+                               "error": {"code": "not_recorded", "message": "no recorded result"}})
+            else:
+                output.append(line)
+
+        batch_id = f"batch-{uuid.uuid4().hex[:12]}"
+        out_id, err_id = f"{batch_id}-out", f"{batch_id}-err"
+        self.files[out_id] = "".join(json.dumps(l) + "\n" for l in output)
+        self.files[err_id] = "".join(json.dumps(l) + "\n" for l in errors)
+        self.batches[batch_id] = {"status": "completed", "output_file_id": out_id if output else None, "error_file_id": err_id if errors else None}
+        return batch_id
+
+    def retrieve(self, batch_id):
+        return self.batches[batch_id]
+
+    def download(self, file_id):
+        return self.files[file_id]
+
+
+# ---RUNNING---------------------------------
+
+def wait_for_batch(client, batch_id, poll_s=BATCH_POLL_S):
+    """Polls until the batch reaches a terminal status; returns its final state."""
+    last = None
+    while True:
+        state = client.retrieve(batch_id)
+        if state["status"] != last:
+            print(f"   -> Batch {batch_id}: {state['status']}", flush=True)
+            last = state["status"]
+        if state["status"] in TERMINAL_STATUSES:
+            return state
+        time.sleep(poll_s)
+
+
+def parse_results(client, state):
+    """
+    Splits a finished batch into ({custom_id: response body}, {custom_id: error}).
+    A line counts as a success only with status_code 200 and no error.
+    """
+    ok, failed = {}, {}
+    for key in ("output_file_id", "error_file_id"):
+        if not state.get(key):
+            continue
+        for line in client.download(state[key]).splitlines():
+            if not line.strip():
+                continue
+            r = json.loads(line)
+            response = r.get("response") or {}
+            if r.get("error") is None and response.get("status_code") == 200:
+                ok[r["custom_id"]] = response["body"]
+            else:
+                failed[r["custom_id"]] = r.get("error") or {"status_code": response.get("status_code"), "body": response.get("body")}
+    return ok, failed
+
+
+def is_retryable(error):
+    """
+    Rate limits, server errors and expired / unrecorded results are retried. Failed
+    responses are classified on their status_code, request errors on their `code`;
+    anything else (invalid requests, other 4xx) is permanent.
+    """
+    status = error.get("status_code")
+    if status is not None:
+        return status == 429 or status >= 500
+    return error.get("code") in RETRYABLE_CODES
+
+
+def run_batch_job(client, request_paths, endpoint, work_dir, max_retries=BATCH_MAX_RETRIES, poll_s=BATCH_POLL_S):
+    """
+    Submits every request file, waits for the batches and collects the results.
+    Retryable failures are written to a retry file and resubmitted up to
+    `max_retries` times. Returns ({custom_id: body}, {custom_id: last error}).
+    """
+    results, errors = {}, {}
+    pending = list(request_paths)
+
+    for attempt in range(max_retries + 1):
+        retry_requests = []
+        submitted = [(path, client.create(client.upload(path), endpoint)) for path in pending]   # all files run in parallel
+        for path, batch_id in submitted:
+            state = wait_for_batch(client, batch_id, poll_s)
+            ok, failed = parse_results(client, state)
+            results.update(ok)
+
+            for req in read_jsonl(path):
+                cid = req["custom_id"]
+                if cid in ok:
+                    errors.pop(cid, None)
+                    continue
+                errors[cid] = failed.get(cid) or {"code": "missing", "message": f"batch {state['status']} without a result"}
+                if is_retryable(errors[cid]):
+                    retry_requests.append(req)
+
+        print(f"[INFO] Batch round {attempt + 1}: {len(results)} succeeded, {len(errors)} failed ({len(retry_requests)} retryable)")
+        if not retry_requests or attempt == max_retries:
+            break
+        pending = write_request_files(retry_requests, work_dir, f"retry{attempt + 1}")
+
+    if errors:
+        print(f"[WARNING] {len(errors)} batch requests failed (up to {max_retries} retries)")
+    return results, errors
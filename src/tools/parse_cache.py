@@ -0,0 +1,111 @@
+import json
+import hashlib
+import time
+from config import *
+from src.tools.sqlite_cache import SQLiteCache
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Streams a file through sha256 and returns the hex digest."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache(SQLiteCache):
+    """
+    On-disk SQLite cache mapping sha256(attachment payload) + parser name + parser
+    version to the extracted text. Bumping a parser's version in PARSER_VERSIONS
+    makes all its old entries miss; `purge_stale` deletes them on the next run.
+    """
+    label = "Parse cache"
+
+    def __init__(self, path=parse_cache_path, parser_versions=None):
+        super().__init__(path)
+        self.parser_versions = parser_versions or PARSER_VERSIONS
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS parse_results (
+                sha256      TEXT NOT NULL,
+                parser      TEXT NOT NULL,
+                version     INTEGER NOT NULL,
+                text        TEXT NOT NULL,
+                created_at  REAL NOT NULL,
+                PRIMARY KEY (sha256, parser, version)
+            )
+            """
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+
+    def version(self, parser):
+        # "scannable_pdf:pymupdf" shares the version of "scannable_pdf"
+        return self.parser_versions.get(parser.split(":")[0], 1)
+
+    def get(self, sha256, parser):
+        row = self.conn.execute(
+            "SELECT text FROM parse_results WHERE sha256 = ? AND parser = ? AND version = ?",
+            (sha256, parser, self.version(parser))
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, sha256, parser, text):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO parse_results VALUES (?, ?, ?, ?, ?)",
+            (sha256, parser, self.version(parser), text, time.time())
+        )
+        self.conn.commit()
+
+    def purge_stale(self):
+        """
+        Deletes every entry whose parser version no longer matches PARSER_VERSIONS,
+        resolving "parser:variant" names by their prefix like `version` does. Only scans
+        the table when the versions changed since the last purge.
+        """
+        versions = json.dumps(self.parser_versions, sort_keys=True)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'parser_versions'").fetchone()
+        if row is not None and row[0] == versions:
+            return 0
+        stale = [
+            (parser, version)
+            for parser, version in self.conn.execute("SELECT DISTINCT parser, version FROM parse_results").fetchall()
+            if version != self.version(parser)
+        ]
+        removed = 0
+        for parser, version in stale:
+            cur = self.conn.execute("DELETE FROM parse_results WHERE parser = ? AND version = ?", (parser, version))
+            removed += cur.rowcount
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('parser_versions', ?)", (versions,))
+        self.conn.commit()
+        if removed:
+            print(f"[INFO] {self.label}: purged {removed} results of outdated parser versions")
+        return removed
+
+
+def cached_extract(cache, parser, path, extract_fn, watchdog=None):
+    """
+    Returns the text extracted from `path` by `extract_fn`, consulting `cache`
+    first. Cache misses run under `watchdog` when one is given.
+    """
+    def extract():
+        if watchdog is None:
+            return extract_fn(path)
+        return watchdog.run(parser, path, extract_fn)
+
+    if cache is None:
+        return extract()
+
+    sha256 = file_sha256(path)
+    text = cache.get(sha256, parser)
+    if text is not None:
+        return text
+
+    text = extract()
+    cache.put(sha256, parser, text)
+    return text
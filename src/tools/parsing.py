@@ -1,17 +1,53 @@
 import os
-import json
 from config import *
-from PyPDF2 import PdfReader
-import warnings                                                 # PDF warnings
-from PyPDF2.errors import PdfReadWarning                        # PDF warnings
-warnings.filterwarnings("ignore", category=PdfReadWarning)          
 from pdf2image import convert_from_path                         # PDF warnings
 import pytesseract                                              # Optical text recognition
 from PIL import Image                                           # Image handling (e.g. opening images, metadata extraction)
-import pandas as pd                                             # Tabular data handling
 from docx import Document
+from src.tools.parse_cache import cached_extract
+from src.tools.tabular_parsing import render_tabular
+from src.tools.pdf_backends import get_pdf_backend
 
-def parse_scannable_pdfs(list_of_paths, text_output_dir, document_limit=None):
+
+# -----PER-FILE EXTRACTORS---------------------------------
+
+def extract_scannable_pdf(pdf_path):
+    return get_pdf_backend().extract_text(pdf_path)
+
+
+def extract_image_pdf(pdf_path):
+    pytesseract.pytesseract.tesseract_cmd = tesseract_path
+    images = convert_from_path(pdf_path, poppler_path=poppler_path)           # Convert PDF to images using Poppler
+    text = ""
+    for img in images:
+        text += pytesseract.image_to_string(img)
+    return text
+
+
+def extract_image(img_path):
+    with Image.open(img_path) as img:
+        return pytesseract.image_to_string(img)
+
+
+def extract_tabular(tbl_path):
+    # Streams the table and renders a size-capped summary (see TABULAR_RENDER_MODE)
+    return render_tabular(tbl_path)
+
+
+def extract_word_doc(docx_path):
+    document = Document(docx_path)
+    paragraphs = [p.text for p in document.paragraphs if p.text.strip()]
+    return "\n".join(paragraphs)
+
+
+def extract_text_file(txt_path):
+    with open(txt_path, "r", encoding="utf-8") as src:
+        return src.read()
+
+
+# -----BATCH PARSERS---------------------------------
+
+def parse_scannable_pdfs(list_of_paths, text_output_dir, document_limit=None, cache=None, watchdog=None, attachment_index=None):
     os.makedirs(text_output_dir, exist_ok=True)
 
     if not document_limit:
@@ -23,19 +59,15 @@ def parse_scannable_pdfs(list_of_paths, text_output_dir, document_limit=None):
             base_name = os.path.splitext(os.path.basename(pdf_path))[0]
             output_path = os.path.join(text_output_dir, base_name + ".txt")
 
-            # read and extract text
-            reader = PdfReader(pdf_path)
-            text_chunks = []
-            for page in reader.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    text_chunks.append(extracted)
-
-            full_text = "\n".join(text_chunks)
+            # read and extract text (or reuse the cached result)
+            parser = f"scannable_pdf:{get_pdf_backend().name}"      # backends extract slightly different text
+            full_text = cached_extract(cache, parser, pdf_path, extract_scannable_pdf, watchdog)
 
             # write the extracted digital text to .txt file
             with open(output_path, "w", encoding="utf-8") as f:
                 f.write(full_text)
+            if attachment_index is not None:
+                attachment_index.add(output_path, full_text)
             
         except Exception as e:
             print(f"Error parsing scannable PDF: {pdf_path} \nbecause {e}")
@@ -45,9 +77,7 @@ def parse_scannable_pdfs(list_of_paths, text_output_dir, document_limit=None):
     print("Done!\n")
 
 
-def parse_image_pdf(list_of_paths, text_output_dir, document_limit=None):
-
-    pytesseract.pytesseract.tesseract_cmd = tesseract_path
+def parse_image_pdf(list_of_paths, text_output_dir, document_limit=None, cache=None, watchdog=None, attachment_index=None):
     os.makedirs(text_output_dir, exist_ok=True)
 
     if not document_limit:
@@ -59,15 +89,14 @@ def parse_image_pdf(list_of_paths, text_output_dir, document_limit=None):
             filename = os.path.splitext(os.path.basename(pdf_path))[0] + ".txt"
             output_path = os.path.join(text_output_dir, filename)
 
-            # Convert PDF to images using Poppler
-            images = convert_from_path(pdf_path, poppler_path=poppler_path)
-            text = ""
-            for img in images:
-                text += pytesseract.image_to_string(img)
+            # OCR every page (or reuse the cached result)
+            text = cached_extract(cache, "image_pdf", pdf_path, extract_image_pdf, watchdog)
 
             # Write the full OCR text to output .txt file
             with open(output_path, "w", encoding="utf-8") as f:
                 f.write(text)
+            if attachment_index is not None:
+                attachment_index.add(output_path, text)
 
             if idx % verbosity == 0:
                 print(f"Parsed {idx+1}/{len(list_of_paths)} non-scannable PDFs", flush=True)
@@ -78,7 +107,7 @@ def parse_image_pdf(list_of_paths, text_output_dir, document_limit=None):
     print("Done!\n")
 
 
-def parse_images(list_of_paths, text_output_dir, document_limit=None):
+def parse_images(list_of_paths, text_output_dir, document_limit=None, cache=None, watchdog=None, attachment_index=None):
     os.makedirs(text_output_dir, exist_ok=True)
 
     if not document_limit:
@@ -90,14 +119,14 @@ def parse_images(list_of_paths, text_output_dir, document_limit=None):
             filename = os.path.splitext(os.path.basename(img_path))[0] + ".txt"
             output_path = os.path.join(text_output_dir, filename)
 
-            # Convert image using tesseract
-            text = ""
-            with Image.open(img_path) as img:
-                text += pytesseract.image_to_string(img)
+            # Convert image using tesseract (or reuse the cached result)
+            text = cached_extract(cache, "image", img_path, extract_image, watchdog)
 
             # Write the full OCR text to output .txt file
             with open(output_path, "w", encoding="utf-8") as f:
                 f.write(text)
+            if attachment_index is not None:
+                attachment_index.add(output_path, text)
 
             if idx % verbosity == 0:
                 print(f"Parsed {idx+1}/{len(list_of_paths)} images", flush=True)
@@ -108,8 +137,7 @@ def parse_images(list_of_paths, text_output_dir, document_limit=None):
     print("Done!\n")
 
 
-def parse_tabular(list_of_paths, text_output_dir, document_limit=None):
-    warnings.filterwarnings("ignore", category=UserWarning)
+def parse_tabular(list_of_paths, text_output_dir, document_limit=None, cache=None, watchdog=None, attachment_index=None):
     os.makedirs(text_output_dir, exist_ok=True)
 
     if not document_limit:
@@ -117,33 +145,18 @@ def parse_tabular(list_of_paths, text_output_dir, document_limit=None):
 
     for idx, tbl_path in enumerate(list_of_paths[:document_limit]):
         try:
-            # Get the extension
-            ext = os.path.splitext(tbl_path)[1][1:].lower()
-
             # Create output filename based on table name
             filename = os.path.splitext(os.path.basename(tbl_path))[0] + ".txt"
             output_path = os.path.join(text_output_dir, filename)
 
-            # Convert tables to markdown texts
-            # For CSV
-            if ext == "csv":
-                df = pd.read_csv(tbl_path, on_bad_lines="skip")
-                md = df.to_markdown(index=False)
-
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(md)
-
-            # For Excel
-            elif ext in ["xls", "xlsx", "xlsm"]:
-                excel = pd.ExcelFile(tbl_path)
-                text = {}
+            # Convert tables to markdown texts (or reuse the cached result rendered with the same settings)
+            parser = f"tabular:{TABULAR_RENDER_MODE}:{TABULAR_HEAD_ROWS}:{TABULAR_TAIL_ROWS}:{TABULAR_MAX_CELL_CHARS}"
+            text = cached_extract(cache, parser, tbl_path, extract_tabular, watchdog)
 
-                for sheet in excel.sheet_names:
-                    df = excel.parse(sheet)
-                    text[f"sheet_{sheet}"] = df.to_markdown(index=False)
-
-                with open(output_path, "w", encoding="utf-8") as f:
-                    json.dump(text, f, indent=2)
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            if attachment_index is not None:
+                attachment_index.add(output_path, text)
 
         except Exception as e:
             print(f"Error parsing tabular file: {tbl_path} \nbecause {e}")    
@@ -154,7 +167,7 @@ def parse_tabular(list_of_paths, text_output_dir, document_limit=None):
     print("Done!\n")
 
 
-def parse_word_docs(list_of_paths, text_output_dir, document_limit=None):
+def parse_word_docs(list_of_paths, text_output_dir, document_limit=None, cache=None, watchdog=None, attachment_index=None):
     os.makedirs(text_output_dir, exist_ok=True)
 
     if not document_limit:
@@ -166,14 +179,14 @@ def parse_word_docs(list_of_paths, text_output_dir, document_limit=None):
             filename   = os.path.splitext(os.path.basename(docx_path))[0]
             output_path = os.path.join(text_output_dir, filename + ".txt")
 
-            # read and extract text
-            document = Document(docx_path)
-            paragraphs = [p.text for p in document.paragraphs if p.text.strip()]
-            full_text  = "\n".join(paragraphs)
+            # read and extract text (or reuse the cached result)
+            full_text = cached_extract(cache, "word_doc", docx_path, extract_word_doc, watchdog)
 
             # write the extracted text to .txt file
             with open(output_path, "w", encoding="utf-8") as f:
                 f.write(full_text)
+            if attachment_index is not None:
+                attachment_index.add(output_path, full_text)
 
             if idx % verbosity == 0:
                 print(f"   -> Parsed {idx+1}/{len(list_of_paths)} Word docs", flush=True)
@@ -184,7 +197,7 @@ def parse_word_docs(list_of_paths, text_output_dir, document_limit=None):
     print("Done!\n")
 
 
-def save_txt_files(list_of_paths, text_output_dir, document_limit=None):
+def save_txt_files(list_of_paths, text_output_dir, document_limit=None, cache=None, watchdog=None, attachment_index=None):
     os.makedirs(text_output_dir, exist_ok=True)
     
     if not document_limit:
@@ -201,11 +214,12 @@ def save_txt_files(list_of_paths, text_output_dir, document_limit=None):
                 print(f"Skipping non-text file {txt_path}")
                 continue
 
-            with open(txt_path, "r", encoding="utf-8") as src:
-                content = src.read()
+            content = cached_extract(cache, "text", txt_path, extract_text_file, watchdog)
 
             with open(output_path, "w", encoding="utf-8") as dst:
                 dst.write(content)
+            if attachment_index is not None:
+                attachment_index.add(output_path, content)
 
             if idx % verbosity == 0:
                 print(f"   -> Copied {idx+1}/{len(list_of_paths)} txt files", flush=True)
@@ -0,0 +1,80 @@
+import functools
+import warnings                                                 # PDF warnings
+from config import *
+
+
+class PdfBackend():
+    """Interface every PDF text-extraction backend implements."""
+    name = "base"
+
+    def page_count(self, path):
+        raise NotImplementedError
+
+    def page_texts(self, path, max_pages=None):
+        """Returns the digital text of each page (up to `max_pages`), "" for pages without text."""
+        raise NotImplementedError
+
+    def extract_text(self, path, max_pages=None):
+        return "\n".join(t for t in self.page_texts(path, max_pages) if t)
+
+
+class PyPDF2Backend(PdfBackend):
+    name = "pypdf2"
+
+    def __init__(self):
+        from PyPDF2 import PdfReader
+        from PyPDF2.errors import PdfReadWarning
+        warnings.filterwarnings("ignore", category=PdfReadWarning)
+        self._reader = PdfReader
+
+    def page_count(self, path):
+        return len(self._reader(path).pages)
+
+    def page_texts(self, path, max_pages=None):
+        reader = self._reader(path)
+        pages = reader.pages if max_pages is None else reader.pages[:max_pages]
+        return [page.extract_text() or "" for page in pages]
+
+
+class PyMuPDFBackend(PdfBackend):
+    """MuPDF (C library) backend, typically an order of magnitude faster than PyPDF2."""
+    name = "pymupdf"
+
+    def __init__(self):
+        try:
+            import pymupdf                                      # pip install PyMuPDF
+        except ImportError:
+            import fitz as pymupdf                              # PyMuPDF < 1.24 only ships the `fitz` name
+        self._pymupdf = pymupdf
+
+    def page_count(self, path):
+        with self._pymupdf.open(path) as doc:
+            return doc.page_count
+
+    def page_texts(self, path, max_pages=None):
+        with self._pymupdf.open(path) as doc:
+            last = doc.page_count if max_pages is None else min(max_pages, doc.page_count)
+            return [doc[i].get_text("text") or "" for i in range(last)]
+
+
+PDF_BACKENDS = {
+    PyPDF2Backend.name: PyPDF2Backend,
+    PyMuPDFBackend.name: PyMuPDFBackend,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_pdf_backend(name=PDF_BACKEND):
+    """
+    Returns the (shared) backend instance for `name`, falling back to PyPDF2
+    when the requested library isn't installed.
+    """
+    if name not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend {name!r}, choose from {list(PDF_BACKENDS)}")
+    try:
+        return PDF_BACKENDS[name]()
+    except ImportError as e:
+        if name == PyPDF2Backend.name:
+            raise
+        print(f"[WARNING] PDF backend {name!r} unavailable ({e}), falling back to {PyPDF2Backend.name!r}")
+        return PyPDF2Backend()
@@ -3,6 +3,8 @@ from openai import OpenAI
 import os
 import json
 from opensearchpy import OpenSearch, RequestsHttpConnection, helpers
+from src.tools.embedders import get_embedder
+from src.tools.vector_compression import get_compressor, rescore
 
 # -------- Create OS and OpenAI clients --------
 
@@ -30,15 +32,12 @@ def knn_search(query_text, size=5):
     the full JSON document.
     """
     os_client = create_os_client(OPENSEARCH_ENDPOINT)
-    llm_client = create_llm_client()
 
-    q_vec = llm_client.embeddings.create(
-        model="text-embedding-ada-002",
-        input=query_text
-    ).data[0].embedding
+    q_vec = get_embedder().embed([query_text])[0]
+    compressor = get_compressor()
 
     body = {
-        "size": size,
+        "size": compressor.candidates(size),
         "query": {
             "bool": {
                 "filter": [
@@ -48,8 +47,8 @@ def knn_search(query_text, size=5):
                     {
                         "knn": {
                             "embedding": {
-                                "vector": q_vec,
-                                "k": size
+                                "vector": compressor.query_vector(q_vec),
+                                "k": compressor.candidates(size)
                             }
                         }
                     }
@@ -57,7 +56,8 @@ def knn_search(query_text, size=5):
             }
         }
     }
-    return os_client.search(index=INDEX_NAME, body=body)["hits"]["hits"]
+    hits = os_client.search(index=INDEX_NAME, body=body)["hits"]["hits"]
+    return rescore(q_vec, hits, size) if compressor.enabled else hits
 
 
 def reconstruct_thread(INDEX_NAME, thread_id, max_chunks=1000):
@@ -0,0 +1,147 @@
+import os
+import re
+import json
+from collections import defaultdict
+from email.utils import parseaddr
+from config import *
+
+SUPPRESS = "suppress"                                           # skipped by every costly stage, not indexed
+DOWNGRADE = "downgrade"                                         # no OCR / summary / embedding, indexed body-only
+
+
+def sender_address(email):
+    """Lower-cased address of the From header (first participant as fallback)."""
+    addr = parseaddr(email.get("from") or "")[1]
+    if not addr and email.get("participants"):
+        addr = parseaddr(email["participants"][0])[1]
+    return addr.strip().lower()
+
+
+def boilerplate_share(body):
+    """Share of `body` from the first BOILERPLATE phrase (unsubscribe / legal / app footers) to its end."""
+    if not body:
+        return 0.0
+    lower = body.lower()
+    hits = [i for i in (lower.find(k) for k in BOILERPLATE) if i != -1]
+    return (len(body) - min(hits)) / len(body) if hits else 0.0
+
+
+def sender_stats(index):
+    """
+    Per-sender statistics from the corpus index (no email files are opened):
+    volume, bytes, share of messages another participant replied to, share with
+    a List-Unsubscribe header and the average boilerplate share of their bodies.
+    """
+    repliers = defaultdict(set)                                 # message_id → senders of its replies
+    for rec in index:
+        if rec.get("parent"):
+            repliers[rec["parent"]].add(rec.get("sender", ""))
+
+    stats = defaultdict(lambda: {"messages": 0, "bytes": 0, "replied": 0, "list_unsubscribe": 0, "boilerplate": 0.0})
+    for rec in index:
+        sender = rec.get("sender", "")
+        if not sender:
+            continue
+        s = stats[sender]
+        s["messages"] += 1
+        s["bytes"] += rec.get("size", 0)
+        s["replied"] += bool(repliers.get(rec["message_id"], set()) - {sender})
+        s["list_unsubscribe"] += bool(rec.get("list_unsubscribe"))
+        s["boilerplate"] += rec.get("boilerplate_share", 0.0)
+
+    for s in stats.values():
+        s["reply_rate"] = s.pop("replied") / s["messages"]
+        s["unsubscribe_share"] = s.pop("list_unsubscribe") / s["messages"]
+        s["boilerplate_share"] = s.pop("boilerplate") / s["messages"]
+    return dict(stats)
+
+
+def classify_sender(sender, s):
+    """
+    SUPPRESS / DOWNGRADE / None for one sender. Only frequent senders that (almost)
+    never get replies qualify; each bulk signal (List-Unsubscribe, boilerplate-heavy
+    bodies, an automated address) counts once: two or more suppress, one downgrades.
+    """
+    domain = "@" + sender.split("@")[-1]
+    if sender in SENDER_ALLOWLIST or domain in SENDER_ALLOWLIST:
+        return None
+    if s["messages"] < BULK_MIN_MESSAGES or s["reply_rate"] > BULK_MAX_REPLY_RATE:
+        return None
+
+    signals = sum([
+        s["unsubscribe_share"] >= BULK_UNSUBSCRIBE_SHARE,
+        s["boilerplate_share"] >= BULK_BOILERPLATE_SHARE,
+        any(re.search(p, sender) for p in BULK_SENDER_PATTERNS),
+    ])
+    if signals >= 2:
+        return SUPPRESS
+    if signals == 1:
+        return DOWNGRADE
+    return None
+
+
+class SenderSuppression():
+    """
+    Bulk / automated senders learned from corpus statistics, with the message_ids
+    they sent. Persisted as a JSON sidecar; costly stages ask `action(message_id)`
+    and skip (SUPPRESS) or cheaply index (DOWNGRADE) that mail.
+    """
+    def __init__(self, senders=None, messages=None, path=sender_suppression_path):
+        self.path = path
+        self.senders = senders or {}                            # sender → stats + action
+        self.messages = messages or {}                          # message_id → action
+
+    def __len__(self):
+        return len(self.messages)
+
+    def action(self, message_id):
+        return self.messages.get(message_id)
+
+    def is_suppressed(self, message_id):
+        return self.messages.get(message_id) == SUPPRESS
+
+    def is_bulk(self, message_id):
+        return message_id in self.messages
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"senders": self.senders, "messages": self.messages}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+
+    @classmethod
+    def load(cls, path=sender_suppression_path):
+        """Loads the last statistics run; empty (nothing is suppressed) if there is none."""
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("senders"), data.get("messages"), path)
+
+    def report(self, top=10):
+        for action in (SUPPRESS, DOWNGRADE):
+            senders = {k: s for k, s in self.senders.items() if s["action"] == action}
+            messages = sum(s["messages"] for s in senders.values())
+            mb = sum(s["bytes"] for s in senders.values()) / 1e6
+            print(f"[INFO] Bulk senders ({action}): {len(senders)} senders, {messages} emails, {mb:.1f} MB")
+            for sender, s in sorted(senders.items(), key=lambda kv: -kv[1]["messages"])[:top]:
+                print(f"   -> {sender}: {s['messages']} emails, reply rate {s['reply_rate']:.0%}, "
+                      f"unsubscribe {s['unsubscribe_share']:.0%}, boilerplate {s['boilerplate_share']:.0%}")
+
+
+def build_sender_suppression(index):
+    """Computes sender statistics over the corpus index and returns the SenderSuppression list."""
+    senders = {}
+    for sender, s in sender_stats(index).items():
+        action = classify_sender(sender, s)
+        if action:
+            senders[sender] = {**s, "action": action}
+
+    messages = {
+        rec["message_id"]: senders[rec["sender"]]["action"]
+        for rec in index
+        if rec["message_id"] and rec.get("sender") in senders
+    }
+    result = SenderSuppression(senders, messages)
+    result.report()
+    return result
@@ -0,0 +1,40 @@
+import os
+import sqlite3
+from config import *
+
+
+class SQLiteCache():
+    """
+    Shared base of the on-disk SQLite caches (parse, LLM, embedding): opens the
+    connection, counts hits / misses and reports them. Subclasses set `label`,
+    create their table and count `hits` / `misses` in their lookups.
+    """
+    label = "Cache"
+
+    def __init__(self, path, check_same_thread=True):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    def report(self):
+        s = self.stats()
+        print(f"[INFO] {self.label}: {s['hits']} hits, {s['misses']} misses (hit rate {s['hit_rate']:.1%})")
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,189 @@
+import os
+import json
+import warnings
+from config import *
+import pandas as pd                                             # Tabular data handling
+
+
+class TableSummary():
+    """
+    Accumulates a table chunk by chunk, keeping only bounded state: schema, row
+    count, per-column stats and the first/last N rows. Memory stays flat no
+    matter how many rows stream through `update`.
+    """
+    def __init__(self, name, head_rows=TABULAR_HEAD_ROWS, tail_rows=TABULAR_TAIL_ROWS, max_distinct=1000):
+        self.name = name
+        self.head_rows = head_rows
+        self.tail_rows = tail_rows
+        self.max_distinct = max_distinct
+        self.row_count = 0
+        self.columns = []
+        self.dtypes = {}
+        self.stats = {}
+        self.head = None
+        self.tail = None
+
+    def update(self, df):
+        if df.empty:
+            return
+        if not self.columns:
+            self.columns = [str(c) for c in df.columns]
+            self.dtypes = {str(c): str(t) for c, t in df.dtypes.items()}
+            self.stats = {c: {"non_null": 0, "distinct": set(), "min": None, "max": None, "sum": 0.0, "numeric": 0} for c in self.columns}
+        df.columns = [str(c) for c in df.columns]
+
+        self.row_count += len(df)
+        if self.head is None or len(self.head) < self.head_rows:
+            self.head = pd.concat([self.head, df]).head(self.head_rows) if self.head is not None else df.head(self.head_rows)
+        self.tail = pd.concat([self.tail, df.tail(self.tail_rows)]).tail(self.tail_rows) if self.tail is not None else df.tail(self.tail_rows)
+
+        for col in self.columns:
+            if col not in df.columns:
+                continue
+            series = df[col].dropna()
+            st = self.stats[col]
+            st["non_null"] += len(series)
+
+            if st["distinct"] is not None:
+                st["distinct"].update(series.astype(str).unique()[:self.max_distinct + 1])
+                if len(st["distinct"]) > self.max_distinct:
+                    st["distinct"] = None                       # stop tracking, report "> max_distinct"
+
+            if pd.api.types.is_datetime64_any_dtype(series):
+                continue
+            numeric = pd.to_numeric(series, errors="coerce").dropna()
+            if not numeric.empty:
+                st["numeric"] += len(numeric)
+                st["sum"] += float(numeric.sum())
+                st["min"] = float(numeric.min()) if st["min"] is None else min(st["min"], float(numeric.min()))
+                st["max"] = float(numeric.max()) if st["max"] is None else max(st["max"], float(numeric.max()))
+
+    def _column_stats(self):
+        rows = []
+        for col in self.columns:
+            st = self.stats[col]
+            distinct = f">{self.max_distinct}" if st["distinct"] is None else len(st["distinct"])
+            row = {
+                "column": col,
+                "dtype": self.dtypes.get(col, ""),
+                "non_null": st["non_null"],
+                "nulls": self.row_count - st["non_null"],
+                "distinct": distinct,
+                "min": "",
+                "max": "",
+                "mean": ""
+            }
+            if st["numeric"] and st["numeric"] == st["non_null"]:   # only report numeric stats for fully numeric columns
+                row.update({"min": st["min"], "max": st["max"], "mean": round(st["sum"] / st["numeric"], 4)})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def render(self, max_cell_chars=TABULAR_MAX_CELL_CHARS):
+        """Returns a compact markdown rendering: stats + first/last rows (or every row for small tables)."""
+        if self.head is None:
+            return f"Table {self.name}: (empty)"
+
+        def clip(df):
+            return df.astype(str).apply(lambda s: s.str.slice(0, max_cell_chars))
+
+        # Small tables fit entirely in the head, render them whole
+        if self.row_count <= self.head_rows:
+            return clip(self.head).to_markdown(index=False)
+
+        parts = [
+            f"Table {self.name}: {self.row_count} rows x {len(self.columns)} columns",
+            "",
+            "Column stats:",
+            self._column_stats().to_markdown(index=False),
+            "",
+            f"First {len(self.head)} rows:",
+            clip(self.head).to_markdown(index=False),
+        ]
+        hidden = self.row_count - len(self.head)
+        if hidden > 0:
+            tail = self.tail.tail(min(self.tail_rows, hidden))
+            parts += [
+                "",
+                f"... {hidden - len(tail)} rows omitted ...",
+                "",
+                f"Last {len(tail)} rows:",
+                clip(tail).to_markdown(index=False),
+            ]
+        return "\n".join(parts)
+
+
+def _rows_to_frames(rows, chunk_rows):
+    """Turns an iterator of row tuples (first row = header) into DataFrame chunks."""
+    header = None
+    buffer = []
+    for row in rows:
+        if header is None:
+            header = [str(c) if c is not None else f"column_{i}" for i, c in enumerate(row)]
+            continue
+        row = tuple(row[:len(header)])
+        buffer.append(row + (None,) * (len(header) - len(row)))     # read-only rows may be ragged
+        if len(buffer) >= chunk_rows:
+            yield pd.DataFrame(buffer, columns=header)
+            buffer = []
+    if buffer:
+        yield pd.DataFrame(buffer, columns=header)
+
+
+def summarize_csv(path, chunk_rows=TABULAR_CHUNK_ROWS):
+    summary = TableSummary(os.path.basename(path))
+    for chunk in pd.read_csv(path, on_bad_lines="skip", chunksize=chunk_rows):
+        summary.update(chunk)
+    return summary
+
+
+def summarize_excel(path, chunk_rows=TABULAR_CHUNK_ROWS):
+    """Returns {sheet_name: TableSummary}, streaming rows for xlsx/xlsm via openpyxl's read-only mode."""
+    ext = os.path.splitext(path)[1][1:].lower()
+    summaries = {}
+
+    if ext in ["xlsx", "xlsm"]:
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                summary = TableSummary(sheet.title)
+                for frame in _rows_to_frames(sheet.iter_rows(values_only=True), chunk_rows):
+                    summary.update(frame)
+                summaries[sheet.title] = summary
+        finally:
+            workbook.close()
+    else:
+        # Legacy .xls has no streaming reader; the format itself caps sheets at 65k rows
+        excel = pd.ExcelFile(path)
+        for sheet in excel.sheet_names:
+            summary = TableSummary(sheet)
+            summary.update(excel.parse(sheet))
+            summaries[sheet] = summary
+
+    return summaries
+
+
+def render_full_table(path):
+    """Previous behaviour: the whole table(s) as markdown, unbounded."""
+    ext = os.path.splitext(path)[1][1:].lower()
+    if ext == "csv":
+        return pd.read_csv(path, on_bad_lines="skip").to_markdown(index=False)
+    excel = pd.ExcelFile(path)
+    return json.dumps({f"sheet_{sheet}": excel.parse(sheet).to_markdown(index=False) for sheet in excel.sheet_names}, indent=2)
+
+
+def render_tabular(path, mode=TABULAR_RENDER_MODE):
+    """Renders a CSV / Excel attachment as text, bounded in size unless mode == "full"."""
+    warnings.filterwarnings("ignore", category=UserWarning)
+    ext = os.path.splitext(path)[1][1:].lower()
+
+    if ext not in ["csv", "xls", "xlsx", "xlsm"]:
+        raise ValueError(f"Unsupported tabular extension: {ext}")
+    if mode == "full":
+        return render_full_table(path)
+
+    if ext == "csv":
+        return summarize_csv(path).render()
+
+    sheets = summarize_excel(path)
+    return json.dumps({f"sheet_{name}": summary.render() for name, summary in sheets.items()}, indent=2)
@@ -0,0 +1,53 @@
+import os
+import json
+import time
+from config import *
+
+LATEST_POINTER = "LATEST"
+
+
+def save_thread_map(thread_map, maps_dir=thread_maps_dir, run_id=None):
+    """
+    Persists { message_id: thread_id } of one threading run as a compact JSON
+    sidecar (thread_map_<run_id>.json) and points LATEST at it.
+    Emails are never rewritten; readers join against this map instead.
+    """
+    os.makedirs(maps_dir, exist_ok=True)
+    run_id = run_id or time.strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(maps_dir, f"thread_map_{run_id}.json")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(thread_map, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+    pointer = os.path.join(maps_dir, LATEST_POINTER)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(run_id)
+    os.replace(pointer + ".tmp", pointer)
+
+    print(f"[INFO] Saved thread map {run_id!r}: {len(thread_map)} messages, {len(set(thread_map.values()))} threads")
+    return run_id
+
+
+def list_thread_map_versions(maps_dir=thread_maps_dir):
+    if not os.path.isdir(maps_dir):
+        return []
+    return sorted(
+        fn[len("thread_map_"):-len(".json")]
+        for fn in os.listdir(maps_dir)
+        if fn.startswith("thread_map_") and fn.endswith(".json")
+    )
+
+
+def load_thread_map(run_id=None, maps_dir=thread_maps_dir):
+    """Loads the thread map of `run_id` (default: the latest run), or {} if none was saved yet."""
+    if run_id is None:
+        pointer = os.path.join(maps_dir, LATEST_POINTER)
+        if not os.path.exists(pointer):
+            return {}
+        with open(pointer, "r", encoding="utf-8") as f:
+            run_id = f.read().strip()
+
+    with open(os.path.join(maps_dir, f"thread_map_{run_id}.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
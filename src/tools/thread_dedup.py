@@ -0,0 +1,109 @@
+import re
+from config import *
+
+END_MARKER = "<END OF MESSAGE>"                                 # appended by strip_quoted_text
+# sentence ends, the end of "… wrote:" lines, line breaks, quote markers and the start of reply / forward headers
+SENTENCE = re.compile(r"(?<=[.!?])\s+|(?<=wrote:)\s+|\s*\n+\s*|\s+>+\s*|\s+(?=(?:From|Sent|To|Cc|Date|Subject):)")
+SEPARATED = re.compile(f"({SENTENCE.pattern})")                  # split keeping the separators
+HEADER = re.compile(r"^(?:From|Sent|To|Cc|Date|Subject):|wrote:$")
+WORD = re.compile(r"\w+")
+
+
+def split_sentences(text):
+    return [s for s in SENTENCE.split(text or "") if s.strip()]
+
+
+def split_with_separators(text):
+    """(separator before it, sentence) pairs; separators of blank pieces carry over to the next sentence."""
+    pieces, separator = [], ""
+    for i, part in enumerate(SEPARATED.split(text or "")):
+        if i % 2:
+            separator += part
+        elif part.strip():
+            pieces.append((separator, part))
+            separator = ""
+    return pieces
+
+
+def _words(text):
+    return WORD.findall(text.lower())
+
+
+def _shingles(words, k):
+    return {tuple(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+class RedundancyStats():
+    """Characters before / after removing text repeated from parent messages."""
+    def __init__(self):
+        self.messages = 0
+        self.chars_before = 0
+        self.chars_after = 0
+
+    def add(self, before, after):
+        self.messages += 1
+        self.chars_before += len(before)
+        self.chars_after += len(after)
+
+    def report(self, label="Thread dedup"):
+        if not self.messages:
+            return
+        saved = self.chars_before - self.chars_after
+        share = saved / self.chars_before if self.chars_before else 0.0
+        print(f"[INFO] {label}: removed {saved} repeated chars from {self.messages} replies ({share:.1%} of their text)")
+
+
+def remove_redundant_text(body, parent_body, threshold=REDUNDANCY_THRESHOLD, k=REDUNDANCY_SHINGLE_SIZE, stats=None):
+    """
+    Keeps only the sentences of `body` that are new relative to its in_reply_to
+    parent. Repeats are often inline or mid-line, so instead of line diffs each
+    sentence is compared with the parent's word k-shingles: a sentence of at least
+    `k` words is dropped when it appears in the parent verbatim, or when ≥ `threshold`
+    of its shingles do (inline quoting, Outlook-style reply headers, forwarded chains).
+    Shorter sentences ("Thanks.") are always kept. Kept sentences are rejoined with a
+    line break where the original text had one between them, a space otherwise.
+    """
+    if not body or not parent_body:
+        return body
+
+    text = body.replace(END_MARKER, "")
+    parent_words = _words(parent_body.replace(END_MARKER, ""))
+    parent_shingles = _shingles(parent_words, k)
+    parent_sentences = {" ".join(_words(s)) for s in split_sentences(parent_body)}
+
+    def repeated(words):
+        if len(words) < k:
+            return False
+        if " ".join(words) in parent_sentences:
+            return True
+        sh = _shingles(words, k)
+        return len(sh & parent_shingles) / len(sh) >= threshold
+
+    pieces = [(separator, sentence.strip().lstrip(">").strip()) for separator, sentence in split_with_separators(text)]
+
+    # walk backwards so a reply header ("From: … Subject: …") goes with the quote it introduces
+    kept = set()
+    quote_follows = False
+    for i in reversed(range(len(pieces))):
+        sentence = pieces[i][1]
+        words = _words(sentence)
+        if not words:
+            continue
+        drop = quote_follows if HEADER.search(sentence) else repeated(words)
+        quote_follows = drop
+        if not drop:
+            kept.add(i)
+
+    result, gap = "", ""
+    for i, (separator, sentence) in enumerate(pieces):
+        gap += separator
+        if i in kept:
+            if result:
+                result += "\n" if "\n" in gap else " "
+            result += sentence
+            gap = ""
+    if END_MARKER in body:
+        result = f"{result}\n{END_MARKER}"
+    if stats is not None:
+        stats.add(body, result)
+    return result
@@ -1,10 +1,13 @@
 
 import os
 import json
+import hashlib
 from collections import defaultdict
 from datetime import datetime, timezone
 from openai import OpenAI
 from config import *
+from src.tools.thread_union_find import assign_threads
+from src.tools.thread_dedup import remove_redundant_text
 
 
 def load_files(email_dir):
@@ -26,159 +29,227 @@ def parse_iso(dt_str):
 
     try:
         # normalize trailing Z → +00:00
-        return datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+        dt = datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+        return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
     except ValueError:
         # CHANGED: on any parse error, also fall back
         return datetime.min.replace(tzinfo=timezone.utc)
 
 
-def build_thread_map(emails_dir: str) -> dict[str, str]:
+def build_thread_map(index, subject_fallback: bool = THREAD_SUBJECT_FALLBACK) -> dict[str, str]:
     """
-    Two-pass mapping:
-      1) Read every message’s in_reply_to and references.
-      2) For each message, walk up the chain to find the ultimate root.
+    Union-find threading over the corpus index:
+      1) Take every message’s parent, references, subject and date from the index.
+      2) Union each message with its parent and all of its references.
+      3) Optionally merge threads on normalized subject within a time window.
     Returns { message_id_normalized: thread_root_id_normalized }.
     """
-    msg_to_parent: dict[str, str | None] = {}
-    msg_references: dict[str, list[str]] = {}
+    records = (
+        (r["message_id"], r["parent"], r["references"], r["subject"], parse_iso(r["date"]))
+        for r in index
+    )
+    return assign_threads(records, subject_fallback=subject_fallback)
 
-    # PASS 1: collect parent & references
-    for fn in os.listdir(emails_dir):
-        if not fn.endswith(".json"):
-            continue
-        path = os.path.join(emails_dir, fn)
-        with open(path, "r", encoding="utf-8") as f:
-            e = json.load(f)
 
-        mid  = normalize_id(e.get("message_id", ""))
-        pid  = normalize_id(e.get("in_reply_to", "")) or None
-        refs = [normalize_id(r) for r in e.get("references", [])]
+def group_threads(index, thread_map: dict[str, str]) -> dict[str, list[dict]]:
+    """
+    Groups the corpus index records (metadata only, no bodies) by thread_id,
+    each group sorted chronologically. Cheap: it only holds references to
+    records that are already in memory.
+    """
+    groups = defaultdict(list)
+    for rec in index:
+        mid = rec["message_id"]
+        groups[thread_map.get(mid, mid)].append(rec)
+    for recs in groups.values():
+        recs.sort(key=lambda r: parse_iso(r["date"]))
+    return groups
 
-        msg_to_parent[mid]  = pid
-        msg_references[mid] = refs
 
-    # PASS 2: find ultimate root per message
-    def find_root(mid: str) -> str:
-        pid = msg_to_parent.get(mid)
-        # if we reply to a known message_id, follow it
-        if pid and pid in msg_to_parent:
-            root = find_root(pid)
-            msg_to_parent[mid] = root  # path‐compress
-            return root
-        # else try the first reference we actually have
-        for r in msg_references.get(mid, []):
-            if r in msg_to_parent:
-                return find_root(r)
-        # no parent & no usable refs → self is root
-        return mid
+def assemble_thread(records: list[dict], index, attachment_index, text_message_ids=None, stats=None) -> dict:
+    """
+    Loads the bodies and attachment texts of one thread's messages. With
+    `text_message_ids`, only those messages' texts are loaded (the metadata of
+    every message is still collected). With THREAD_DEDUP_ENABLED, each reply keeps
+    only the text that isn't repeated from its in_reply_to parent.
+    Returns:
+      { dates: [...],
+        subjects: {...},
+        participants: {...},
+        texts: [...],
+        text_message_ids: [...],     # message each text belongs to
+        message_ids: [...]
+      }
+    """
+    data = {
+        "dates": [], "subjects": set(),
+        "participants": set(), "texts": [],
+        "text_message_ids": [], "message_ids": []
+    }
+    by_id = {r["message_id"]: r for r in records}
+    bodies = {}
+
+    def body_of(rec):
+        mid = rec["message_id"]
+        if mid not in bodies:
+            bodies[mid] = index.read_email(rec).get("body", "") if rec["body_len"] else ""
+        return bodies[mid]
+
+    for rec in records:
+        mid = rec["message_id"]
+        ts  = parse_iso(rec["date"])
+
+        data["message_ids"].append(mid)
+        data["dates"].append(ts)
+        data["subjects"].add(rec["subject"])
+        data["participants"].update(rec["participants"])
+        if text_message_ids is not None and mid not in text_message_ids:
+            continue
+
+        body = body_of(rec)
+        parent = by_id.get(rec["parent"])
+        if THREAD_DEDUP_ENABLED and parent is not None:
+            body = remove_redundant_text(body, body_of(parent), stats=stats)
+        data["texts"].append(f"Message_{mid}: {body}")
+        data["text_message_ids"].append(mid)
 
-    return { mid: find_root(mid) for mid in msg_to_parent }
+        # include any attachment texts
+        for att in attachment_index.paths(mid):
+            with open(att, "r", encoding="utf-8") as af:
+                atxt = af.read()
+            data["dates"].append(ts)
+            data["texts"].append(f"--Attachment_{os.path.basename(att)}: {atxt}")
+            data["text_message_ids"].append(mid)
+    return data
 
 
-def build_attachments_map(parsed_attachments_dir):
+def thread_fingerprint(records: list[dict], attachment_index) -> tuple[str, list[str]]:
     """
-    Maps parsed attachment paths to the messages
-    they were originally sent in via "message_id".
+    Content fingerprint of a thread from metadata only: its message_ids plus the
+    hashes of their parsed attachments. Returns (fingerprint, attachment_hashes).
     """
-    attach_map = defaultdict(list)
-    for filename in os.listdir(parsed_attachments_dir):
-        if not filename.endswith(".txt"):
-            continue
+    mids = sorted(r["message_id"] for r in records)
+    att_hashes = sorted(e["sha256"] for m in mids for e in attachment_index.get(m))
+    digest = hashlib.sha256("\n".join(mids + ["--"] + att_hashes).encode("utf-8"))
+    return digest.hexdigest(), att_hashes
 
-        # filename format: _id_{msg_id}_id_{originalName}.txt
-        parts = filename.split("_id_")
-        msg_id     = parts[1]
-        orig_filename   = parts[2]
 
-        full_path  = os.path.join(parsed_attachments_dir, filename)
-        attach_map[msg_id].append((orig_filename, full_path))
-    
-    return attach_map
+def load_thread_doc(out_dir: str, thread_id: str) -> dict | None:
+    path = os.path.join(out_dir, f"{thread_id}.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
 
-def build_thread_docs(
-    emails_dir: str,
-    parsed_attachments_dir: str,
-    thread_map: dict[str, str]
-) -> dict[str, dict]:
+def remove_thread_docs(out_dir: str, thread_ids, pending_path: str = stale_thread_docs_path) -> list[str]:
     """
-    Groups every email (and its .txt attachments) under its root-thread-id.
-    Returns:
-      { thread_id: {
-           dates: [...],
-           subjects: {...},
-           participants: {...},
-           texts: [...],
-           message_ids: [...]
-         }
-      }
+    Deletes the existing thread documents of `thread_ids` and adds their doc_ids to the
+    `pending_path` sidecar, from which the indexing stages delete them from the index
+    (opensearch_indexing.delete_stale_docs). Returns the thread_ids actually removed.
+    """
+    removed = []
+    for tid in thread_ids:
+        path = os.path.join(out_dir, f"{tid}.json")
+        if os.path.exists(path):
+            os.remove(path)
+            removed.append(tid)
+    if removed:
+        pending = []
+        if os.path.exists(pending_path):
+            with open(pending_path, "r", encoding="utf-8") as f:
+                pending = json.load(f)
+        os.makedirs(os.path.dirname(pending_path), exist_ok=True)
+        with open(pending_path, "w", encoding="utf-8") as f:
+            json.dump(sorted(set(pending) | {f"t_{tid}" for tid in removed}), f)
+    return removed
+
+
+def prune_thread_docs(out_dir: str, keep, pending_path: str = stale_thread_docs_path) -> list[str]:
+    """
+    Removes the thread documents whose thread_id isn't in `keep` (threads renamed after
+    older messages arrived or threads merged). Returns the removed thread_ids.
     """
-    # build attachment lookup: msg_id → list of .txt paths
-    attach_map = defaultdict(list)
-    for fn in os.listdir(parsed_attachments_dir):
-        if not fn.endswith(".txt"):
+    if not os.path.isdir(out_dir):
+        return []
+    stale = [fn[:-len(".json")] for fn in os.listdir(out_dir) if fn.endswith(".json") and fn[:-len(".json")] not in keep]
+    removed = remove_thread_docs(out_dir, stale, pending_path)
+    if removed:
+        print(f"[INFO] Removed {len(removed)} stale thread documents (renamed or merged threads)")
+    return removed
+
+
+def plan_thread_refresh(groups: dict[str, list[dict]], attachment_index, out_dir: str, delta: bool = THREAD_DELTA_SUMMARIES, near_duplicates=None, suppression=None) -> dict[str, dict]:
+    """
+    Compares each thread's fingerprint with the one stored in its existing thread
+    document and returns { thread_id: plan } for the threads that need a summary:
+      mode "full"  → new thread, or content changed in a way delta can't express
+      mode "delta" → the thread only gained messages; re-summarize from the previous
+                     summary_text plus just the new messages
+    Unchanged threads are left out, and so are threads made up only of near-duplicates
+    of messages represented elsewhere (with `near_duplicates`) or only of bulk-sender
+    mail (with `suppression`); earlier documents of those are removed.
+    """
+    plan = {}
+    clean = 0
+    duplicates = []
+    bulk = []
+    for tid, records in groups.items():
+        if near_duplicates and all(near_duplicates.is_duplicate(r["message_id"]) for r in records):
+            duplicates.append(tid)
             continue
-        parts = fn.split("_id_")
-        if len(parts) < 3:
+        if suppression and all(suppression.is_bulk(r["message_id"]) for r in records):
+            bulk.append(tid)
             continue
-        mid = normalize_id(parts[1])
-        attach_map[mid].append(os.path.join(parsed_attachments_dir, fn))
-
-    # helper to parse ISO datetimes
-    def parse_iso(dt_str):
-        if not dt_str:
-            return datetime.min.replace(tzinfo=timezone.utc)
-        try:
-            return datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
-        except ValueError:
-            return datetime.min.replace(tzinfo=timezone.utc)
-
-    # load & group
-    threads = defaultdict(lambda: {
-        "dates": [], "subjects": set(),
-        "participants": set(), "texts": [],
-        "message_ids": []
-    })
-
-    for fn in os.listdir(emails_dir):
-        if not fn.endswith(".json"):
+        fingerprint, att_hashes = thread_fingerprint(records, attachment_index)
+        prev = load_thread_doc(out_dir, tid)
+        if prev and prev.get("fingerprint") == fingerprint:
+            clean += 1
             continue
-        path = os.path.join(emails_dir, fn)
-        with open(path, "r", encoding="utf-8") as f:
-            e = json.load(f)
-
-        mid = normalize_id(e.get("message_id", ""))
-        tid = thread_map.get(mid, mid)
-        ts  = parse_iso(e.get("date"))
 
-        th = threads[tid]
-        th["message_ids"].append(mid)
-        th["dates"].append(ts)
-        th["subjects"].add(e.get("subject", ""))
-        th["participants"].update(e.get("participants", []))
-        th["texts"].append(f"Message_{mid}: {e.get('body','')}")
-
-        # include any attachment texts
-        for att in attach_map.get(mid, []):
-            with open(att, "r", encoding="utf-8") as af:
-                atxt = af.read()
-            th["dates"].append(ts)
-            th["texts"].append(f"--Attachment_{os.path.basename(att)}: {atxt}")
-
-    # sort each thread chronologically and clean up message_ids
-    for tid, data in threads.items():
-        entries = list(zip(
-            data["dates"],
-            data["texts"],
-            data["message_ids"] + [None] * (len(data["texts"]) - len(data["message_ids"]))
-        ))
-        entries.sort(key=lambda x: x[0])
-        dates, texts, mids = zip(*entries)
-        data["dates"]       = list(dates)
-        data["texts"]       = list(texts)
-        data["message_ids"] = [m for m in mids if m]
-
-    return threads
+        entry = {"fingerprint": fingerprint, "attachment_hashes": att_hashes, "mode": "full"}
+        if delta and prev and prev.get("summary_text") and prev.get("fingerprint"):
+            prev_mids = set(prev.get("message_ids", []))
+            mids = {r["message_id"] for r in records}
+            if prev_mids < mids and set(prev.get("attachment_hashes", [])) <= set(att_hashes):
+                entry.update({
+                    "mode": "delta",
+                    "previous_summary": prev["summary_text"],
+                    "new_message_ids": sorted(mids - prev_mids)
+                })
+        plan[tid] = entry
+
+    n_delta = sum(1 for p in plan.values() if p["mode"] == "delta")
+    print(f"[INFO] Threads: {clean} unchanged (skipped), {n_delta} delta, {len(plan) - n_delta} full re-summaries")
+    if duplicates:
+        n = len(duplicates)
+        removed = remove_thread_docs(out_dir, duplicates)      # documents written before the threads became duplicates
+        print(f"[INFO] {n} near-duplicate threads skipped: {n} summarization + {n} embedding calls and {n} index documents saved"
+              + (f", {len(removed)} earlier documents removed" if removed else ""))
+    if bulk:
+        n = len(bulk)
+        removed = remove_thread_docs(out_dir, bulk)            # documents written before the senders were suppressed
+        print(f"[INFO] {n} bulk-sender threads skipped: {n} summarization + {n} embedding calls saved"
+              + (f", {len(removed)} earlier documents removed" if removed else ""))
+    return plan
+
+
+def iter_thread_docs(groups: dict[str, list[dict]], index, attachment_index, plan: dict[str, dict] | None = None, stats=None):
+    """
+    Yields (thread_id, thread_data) one fully assembled thread at a time, so peak
+    memory scales with the largest thread instead of the whole mailbox. With a
+    refresh `plan`, only the planned threads are assembled (delta threads with
+    just their new messages' texts) and the plan entry is merged into the data.
+    """
+    for tid in (plan if plan is not None else groups):
+        entry = plan[tid] if plan is not None else {}
+        only = set(entry["new_message_ids"]) if entry.get("mode") == "delta" else None
+        data = assemble_thread(groups[tid], index, attachment_index, text_message_ids=only, stats=stats)
+        data.update(entry)
+        yield tid, data
 
 
 # def assemble_and_summarize(threads, thread_documents_dir):
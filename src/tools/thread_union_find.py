@@ -0,0 +1,113 @@
+import re
+from collections import defaultdict
+from datetime import timedelta
+from config import *
+
+
+class UnionFind():
+    """Disjoint sets over message_ids with union by rank and iterative path compression."""
+    def __init__(self):
+        self.parent = {}
+        self.rank = {}
+
+    def add(self, x):
+        if x not in self.parent:
+            self.parent[x] = x
+            self.rank[x] = 0
+
+    def find(self, x):
+        # walk up to the root without recursion...
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # ...then point every node on the path straight at it
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        self.add(a)
+        self.add(b)
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if self.rank[ra] < self.rank[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        if self.rank[ra] == self.rank[rb]:
+            self.rank[ra] += 1
+        return ra
+
+
+SUBJECT_PREFIX = re.compile(r"^\s*(?:(?:re|fw|fwd|aw|wg)\s*(?:\[\d+\])?\s*:\s*)+", re.IGNORECASE)
+
+def normalize_subject(subject):
+    """Strips reply/forward prefixes and whitespace noise, as EmailCleaner.normalize_subject does."""
+    subj = (subject or "").replace("\xa0", " ")
+    subj = SUBJECT_PREFIX.sub("", subj)
+    return re.sub(r"\s+", " ", subj).strip().lower()
+
+
+def assign_threads(records, subject_fallback=THREAD_SUBJECT_FALLBACK, window_days=THREAD_SUBJECT_WINDOW_DAYS):
+    """
+    `records` is an iterable of (message_id, in_reply_to, references, subject, date)
+    with normalized ids and datetime dates. Every message is unioned with its parent
+    and all its references (even ones missing from the corpus, so siblings of a lost
+    root still meet). With `subject_fallback`, threads sharing a normalized subject
+    whose time spans are within `window_days` of each other are merged as well.
+
+    Returns { message_id: thread_id }, the thread_id being the earliest message of the thread.
+    """
+    uf = UnionFind()
+    info = {}
+
+    # PASS 1: union on in_reply_to + every reference
+    for mid, pid, refs, subject, date in records:
+        info[mid] = (subject, date)
+        uf.add(mid)
+        if not mid:                                             # id-less messages must not glue threads together
+            continue
+        if pid:
+            uf.union(mid, pid)
+        for r in refs:
+            if r:
+                uf.union(mid, r)
+
+    # PASS 2: collect the known messages of each set
+    members = defaultdict(list)
+    for mid in info:
+        members[uf.find(mid)].append(mid)
+
+    # PASS 3 (optional): JWZ-style merge of sets on subject + time window
+    if subject_fallback:
+        window = timedelta(days=window_days)
+        by_subject = defaultdict(list)
+        for root, mids in members.items():
+            dates = [info[m][1] for m in mids]
+            earliest = min(mids, key=lambda m: (info[m][1], m))
+            subject = normalize_subject(info[earliest][0])
+            if subject:
+                by_subject[subject].append((min(dates), max(dates), root))
+
+        for spans in by_subject.values():
+            spans.sort()
+            current_root, current_last = spans[0][2], spans[0][1]
+            for first, last, root in spans[1:]:
+                if first - current_last <= window:
+                    current_root = uf.union(current_root, root)
+                    current_last = max(current_last, last)
+                else:
+                    current_root, current_last = root, last
+
+        merged = defaultdict(list)
+        for mids in members.values():
+            merged[uf.find(mids[0])].extend(mids)
+        members = merged
+
+    # PASS 4: name each thread after its earliest message
+    thread_map = {}
+    for mids in members.values():
+        thread_id = min(mids, key=lambda m: (info[m][1], m))
+        for mid in mids:
+            thread_map[mid] = thread_id
+    return thread_map
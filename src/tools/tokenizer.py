@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+import tiktoken
+from config import *
+
+PREFIX_CHARS_PER_TOKEN = 4                                      # first guess of the prefix needed for N tokens
+
+_encoders = {}
+_counts = OrderedDict()                                         # (encoding, text) → token count, least recently used first
+_lock = threading.Lock()
+
+
+def get_encoding(name=ENCODER_NAME):
+    """Encoder for an encoding ("cl100k_base") or a model name, loaded once per process; unknown models get ENCODER_NAME."""
+    with _lock:
+        if name not in _encoders:
+            try:
+                _encoders[name] = tiktoken.get_encoding(name)
+            except ValueError:
+                try:
+                    _encoders[name] = tiktoken.encoding_for_model(name)
+                except KeyError:
+                    _encoders[name] = tiktoken.get_encoding(ENCODER_NAME)
+        return _encoders[name]
+
+
+def _cut(text, chars):
+    """
+    Longest prefix of at most `chars` characters ending before a space (shortest longer
+    one if there's none): tiktoken splits words with their leading space, so the prefix's
+    tokens are exactly the first tokens of the whole text.
+    """
+    space = text.rfind(" ", 1, chars)
+    if space <= 0:
+        space = text.find(" ", chars)
+    return text if space <= 0 else text[:space]
+
+
+def encode(text, max_tokens=None, encoding=ENCODER_NAME):
+    """
+    Token ids of `text`; with `max_tokens`, only the first max_tokens, encoding a growing
+    prefix of the text instead of all of it.
+    """
+    encoder = get_encoding(encoding)
+    if max_tokens is None:
+        return encoder.encode(text, disallowed_special=())
+    chars = max(max_tokens, 1) * PREFIX_CHARS_PER_TOKEN
+    while chars < len(text):
+        prefix = _cut(text, chars)
+        tokens = encoder.encode(prefix, disallowed_special=())
+        if len(tokens) >= max_tokens or len(prefix) == len(text):
+            return tokens[:max_tokens]
+        chars = max(chars, len(prefix)) * 2
+    return encoder.encode(text, disallowed_special=())[:max_tokens]
+
+
+def decode(tokens, encoding=ENCODER_NAME):
+    return get_encoding(encoding).decode(tokens)
+
+
+def truncate(text, max_tokens, encoding=ENCODER_NAME):
+    """Trims `text` to at most `max_tokens`, on token boundaries, encoding no more than it keeps."""
+    tokens = encode(text, max_tokens + 1, encoding)
+    return text if len(tokens) <= max_tokens else decode(tokens[:max_tokens], encoding)
+
+
+def exceeds_tokens(text, max_tokens, encoding=ENCODER_NAME):
+    """True if `text` is longer than `max_tokens`, encoding at most max_tokens + 1 of them."""
+    return len(encode(text, max_tokens + 1, encoding)) > max_tokens
+
+
+def _pieces(text, size=TOKENIZER_PIECE_CHARS):
+    """Splits `text` before spaces into pieces of about `size` characters, whose token counts add up to the text's."""
+    pieces = []
+    while len(text) > size:
+        piece = _cut(text, size)
+        pieces.append(piece)
+        text = text[len(piece):]
+    pieces.append(text)
+    return pieces
+
+
+def count_tokens_batch(texts, encoding=ENCODER_NAME):
+    """
+    Token counts of `texts`. Repeated strings come from an LRU cache; the others are
+    encoded with tiktoken's multi-threaded `encode_batch`, long texts split into pieces
+    so a single long prompt is counted in parallel too.
+    """
+    counts, misses = [None] * len(texts), []
+    with _lock:
+        for i, text in enumerate(texts):
+            key = (encoding, text)
+            if key in _counts:
+                _counts.move_to_end(key)
+                counts[i] = _counts[key]
+            else:
+                misses.append(i)
+    if not misses:
+        return counts
+
+    pieces, owners = [], []
+    for i in misses:
+        for piece in _pieces(texts[i]):
+            pieces.append(piece)
+            owners.append(i)
+    encoded = get_encoding(encoding).encode_batch(pieces, num_threads=TOKENIZER_THREADS, disallowed_special=())
+    for i in misses:
+        counts[i] = 0
+    for i, tokens in zip(owners, encoded):
+        counts[i] += len(tokens)
+
+    with _lock:
+        for i in misses:
+            if len(texts[i]) <= TOKEN_COUNT_CACHE_MAX_CHARS:
+                _counts[(encoding, texts[i])] = counts[i]
+        while len(_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return counts
+
+
+def count_tokens(text, encoding=ENCODER_NAME):
+    return count_tokens_batch([text], encoding)[0]
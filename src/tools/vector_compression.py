@@ -0,0 +1,236 @@
+import os
+import json
+import base64
+import numpy as np
+from config import *
+from src.tools.embedders import get_embedder
+
+QUANTIZATIONS = (None, "fp16", "int8")
+
+
+def encode_full(vector):
+    """Full-precision vector → base64 float32 (~4x smaller than JSON floats), stored unindexed for re-scoring."""
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_full(encoded):
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.float32)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def corpus_vectors(dirs=(thread_documents_dir,), limit=VECTOR_FIT_SAMPLE, indexes=(THREADS_INDEX,), model=None, dimension=None):
+    """
+    Up to `limit` embeddings (n, dimension) float32, read from the documents in `dirs`,
+    then from the vector logs the fused embed-and-index stage keeps for `indexes`
+    (documents it indexed don't carry their embedding). With `model` / `dimension`,
+    vectors of another embedder are skipped.
+    """
+    vectors = []
+    for directory in dirs:
+        for fn in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+            if len(vectors) >= limit:
+                break
+            if not fn.endswith(".json"):
+                continue
+            with open(os.path.join(directory, fn), "r", encoding="utf-8") as f:
+                embedding = json.load(f).get("embedding")
+            if embedding and (dimension is None or len(embedding) == dimension):
+                vectors.append(embedding)
+
+    from src.tools.vector_log import iter_vector_log, vector_log_path   # vector_log builds on this module
+    logged = {}                                                 # doc_id → latest logged vector
+    for index_name in indexes:
+        for doc_id, logged_model, vector in iter_vector_log(vector_log_path(index_name)):
+            if len(vectors) + len(logged) >= limit:
+                break
+            if (model is None or logged_model == model) and (dimension is None or len(vector) == dimension):
+                logged[doc_id] = vector
+    vectors.extend(logged.values())
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class VectorCompressor():
+    """
+    Compresses embeddings for the knn index:
+      - optional PCA projection to `pca_dim` components fitted on corpus vectors
+        (re-normalized, so l2 ranking still follows cosine similarity)
+      - optional scalar quantization: "fp16" (faiss SQfp16 encoder, done by OpenSearch)
+        or "int8" (byte vectors, scaled here with a corpus-fitted scale)
+    Documents keep their full-precision vector in `embedding_full` (not indexed), and
+    `rescore` ranks the oversampled candidates of a compressed search exactly.
+    """
+    def __init__(self, dimension, pca_dim=None, quantization=None, mean=None, components=None, scale=None):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+        self.dimension = dimension
+        self.pca_dim = pca_dim
+        self.quantization = quantization
+        self.mean = mean
+        self.components = components                            # (pca_dim, dimension)
+        self.scale = scale                                      # int8: float value → [-127, 127]
+
+    @property
+    def enabled(self):
+        return bool(self.pca_dim or self.quantization)
+
+    @property
+    def needs_fit(self):
+        return bool(self.pca_dim or self.quantization == "int8")
+
+    @property
+    def index_dimension(self):
+        return self.pca_dim or self.dimension
+
+    # ---FITTING---------------------------------
+    @classmethod
+    def fit(cls, vectors, pca_dim=None, quantization=None):
+        """Fits the PCA basis (SVD of the centered sample) and the int8 scale on a sample of corpus vectors."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or not len(vectors):
+            raise ValueError("No embedded documents to fit the vector compression on")
+        compressor = cls(vectors.shape[1], pca_dim, quantization)
+        if pca_dim:
+            if pca_dim > min(vectors.shape):
+                raise ValueError(f"PCA to {pca_dim} dimensions needs at least {pca_dim} corpus vectors, got {len(vectors)}")
+            compressor.mean = vectors.mean(axis=0)
+            _, _, vt = np.linalg.svd(vectors - compressor.mean, full_matrices=False)
+            compressor.components = vt[:pca_dim].astype(np.float32)
+        if quantization == "int8":
+            projected = compressor.project(vectors)
+            compressor.scale = float(127.0 / max(np.percentile(np.abs(projected), 99.9), 1e-6))
+        return compressor
+
+    def save(self, path=vector_compression_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(
+            path,
+            dimension=self.dimension,
+            pca_dim=self.pca_dim or 0,
+            quantization=self.quantization or "",
+            mean=self.mean if self.mean is not None else np.zeros(0),
+            components=self.components if self.components is not None else np.zeros((0, 0)),
+            scale=self.scale or 0.0
+        )
+
+    @classmethod
+    def load(cls, path=vector_compression_path):
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        return cls(
+            int(data["dimension"]),
+            int(data["pca_dim"]) or None,
+            str(data["quantization"]) or None,
+            data["mean"] if data["mean"].size else None,
+            data["components"] if data["components"].size else None,
+            float(data["scale"]) or None
+        )
+
+    # ---COMPRESSION---------------------------------
+    def project(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.pca_dim:
+            vectors = _normalize((vectors - self.mean) @ self.components.T)
+        return vectors
+
+    def compress(self, vectors):
+        """(n, dimension) → (n, index_dimension) index vectors: projected, then int8-scaled if configured."""
+        projected = self.project(vectors)
+        if self.quantization == "int8":
+            return np.clip(np.rint(projected * self.scale), -127, 127).astype(np.int8)
+        return projected
+
+    def mapping(self):
+        """The `knn_vector` mapping of the `embedding` field for this compression."""
+        field = {"type": "knn_vector", "dimension": self.index_dimension}
+        if self.quantization == "fp16":
+            field["method"] = {
+                "name": "hnsw", "engine": "faiss", "space_type": "l2",
+                "parameters": {"encoder": {"name": "sq", "parameters": {"type": "fp16"}}}
+            }
+        elif self.quantization == "int8":
+            field["data_type"] = "byte"
+            field["method"] = {"name": "hnsw", "engine": "lucene", "space_type": "l2"}
+        return field
+
+    def doc_fields(self, vector):
+        """Index fields for one document vector: the compressed `embedding` (+ `embedding_full` when compressing)."""
+        if not self.enabled:
+            return {"embedding": list(vector)}
+        return {
+            "embedding": self.compress([vector])[0].tolist(),
+            "embedding_full": encode_full(vector)
+        }
+
+    def query_vector(self, vector):
+        return self.compress([vector])[0].tolist() if self.enabled else list(vector)
+
+    def candidates(self, k):
+        """How many hits to ask the index for so `rescore` can return k exact ones."""
+        return k * RESCORE_OVERSAMPLE if self.enabled else k
+
+
+def rescore(query_vector, hits, k):
+    """
+    Re-ranks knn hits by exact cosine similarity between the full-precision query and
+    each hit's `embedding_full`, keeps the top k and drops the stored vectors.
+    """
+    scored = [h for h in hits if h["_source"].get("embedding_full")]
+    if scored:
+        full = np.stack([decode_full(h["_source"]["embedding_full"]) for h in scored])
+        scores = _normalize(full) @ _normalize(np.asarray(query_vector, dtype=np.float32))
+        for h, score in zip(scored, scores):
+            h["_score"] = float(score)
+        hits = sorted(scored, key=lambda h: -h["_score"]) + [h for h in hits if not h["_source"].get("embedding_full")]
+    for h in hits:
+        h["_source"].pop("embedding_full", None)
+    return hits[:k]
+
+
+def full_vector_mapping():
+    """Unindexed binary field holding the base64 float32 vector used by `rescore`."""
+    return {"type": "binary"}
+
+
+_compressor = None
+
+def get_compressor(dimension=None, sample=None):
+    """
+    Process-wide compressor for VECTOR_PCA_DIM / VECTOR_QUANTIZATION. Fitted parameters
+    are loaded from `vector_compression_path`, or fitted on the corpus embeddings of the
+    configured embedder (and saved) the first time they're needed. When the corpus holds
+    too few of them yet, `sample()` (if given) returns vectors to fit on instead; without
+    any, vectors are left uncompressed for this run, with a warning.
+    """
+    global _compressor
+    if _compressor is not None:
+        return _compressor
+    embedder = get_embedder()
+    if dimension is None:
+        dimension = embedder.dimension
+
+    compressor = VectorCompressor(dimension, VECTOR_PCA_DIM, VECTOR_QUANTIZATION)
+    if compressor.needs_fit:
+        saved = VectorCompressor.load()
+        if saved and (saved.dimension, saved.pca_dim, saved.quantization) == (dimension, VECTOR_PCA_DIM, VECTOR_QUANTIZATION):
+            compressor = saved
+        else:
+            print(f"[INFO] Fitting vector compression (PCA {VECTOR_PCA_DIM}, {VECTOR_QUANTIZATION}) on corpus embeddings...")
+            needed = max(VECTOR_PCA_DIM or 0, 1)
+            vectors = corpus_vectors(model=embedder.name, dimension=dimension)
+            if len(vectors) < needed and sample is not None:
+                print(f"   -> {len(vectors)} corpus embeddings so far, embedding a sample of the documents to fit on")
+                vectors = sample()
+            if len(vectors) < needed:
+                print(f"[WARNING] Only {len(vectors)} corpus embeddings to fit the vector compression on (needs {needed}): "
+                      f"vectors stay uncompressed this run. Wipe and re-index once documents are embedded to compress them.")
+                _compressor = VectorCompressor(dimension)        # not saved: the next run fits again
+                return _compressor
+            compressor = VectorCompressor.fit(vectors, VECTOR_PCA_DIM, VECTOR_QUANTIZATION)
+            compressor.save()
+    _compressor = compressor
+    return _compressor
@@ -0,0 +1,47 @@
+import os
+import json
+from config import *
+from src.tools.vector_compression import encode_full, decode_full
+
+
+def vector_log_path(index_name):
+    return os.path.join(vector_logs_dir, f"{index_name}.jsonl")
+
+
+class VectorLog():
+    """
+    Side artifact of the fused embed-and-index stage: the vectors it sent to an index,
+    as JSON lines {"doc_id", "model", "embedding"} (base64 float32), so documents don't
+    have to be rewritten with their embedding. Later lines win for a repeated doc_id.
+    """
+    def __init__(self, path, append=True):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.f = open(path, "a" if append else "w", encoding="utf-8")
+        self.written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, doc_id, model, vector):
+        self.f.write(json.dumps({"doc_id": doc_id, "model": model, "embedding": encode_full(vector)}) + "\n")
+        self.written += 1
+
+    def close(self):
+        self.f.close()
+
+
+def iter_vector_log(path):
+    """Yields (doc_id, model, vector) from a vector log, skipping a torn last line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            yield entry["doc_id"], entry["model"], decode_full(entry["embedding"])
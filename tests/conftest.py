@@ -0,0 +1,52 @@
+import os
+import sys
+from collections import Counter
+import pytest
+import tiktoken
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))    # repo root, for `config` / `src`
+
+import src.tools.tokenizer as tokenizer
+from config import *
+
+# cl100k_base's pre-tokenizer: words are split off with their leading space
+CL100K_PATTERN = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+WORDS = "invoice delivery route driver schedule payment station block shift depot van parcel customer the".split()
+
+
+def _learn_ranks(words, n_merges=60):
+    """Byte-level BPE ranks with `n_merges` merges learned on ` word` pieces."""
+    ranks = {bytes([i]): i for i in range(256)}
+    pieces = [[bytes([b]) for b in f" {w}".encode()] for w in words]
+    for _ in range(n_merges):
+        pairs = Counter((a, b) for p in pieces for a, b in zip(p, p[1:]))
+        if not pairs:
+            break
+        (a, b), _ = pairs.most_common(1)[0]
+        ranks[a + b] = len(ranks)
+        merged = []
+        for p in pieces:
+            out, i = [], 0
+            while i < len(p):
+                if i + 1 < len(p) and (p[i], p[i + 1]) == (a, b):
+                    out.append(a + b)
+                    i += 2
+                else:
+                    out.append(p[i])
+                    i += 1
+            merged.append(out)
+        pieces = merged
+    return ranks
+
+
+@pytest.fixture
+def offline_encoding(monkeypatch):
+    """
+    A small BPE encoding with cl100k_base's split pattern, registered under the names the
+    pipeline asks for, so tokenizer tests don't download the real vocabulary.
+    """
+    encoding = tiktoken.Encoding("offline", pat_str=CL100K_PATTERN, mergeable_ranks=_learn_ranks(WORDS), special_tokens={})
+    for name in (ENCODER_NAME, EMBEDDINGS_MODEL):
+        monkeypatch.setitem(tokenizer._encoders, name, encoding)
+    monkeypatch.setattr(tokenizer, "_counts", type(tokenizer._counts)())
+    return encoding
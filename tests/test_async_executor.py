@@ -0,0 +1,116 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from src.tools.async_executor import AsyncExecutor, TokenBucket, retry_after_seconds, get_executor
+
+
+def executor(**kwargs):
+    return AsyncExecutor("test", **{"max_concurrent": 3, "rpm": 60000, "tpm": 10**7, "max_retries": 2, **kwargs})
+
+
+class RateLimited(Exception):
+    status_code = 429
+    response = SimpleNamespace(headers={"retry-after-ms": "10"})
+
+
+def test_bucket_waits_for_refill():
+    bucket = TokenBucket(600)                                   # 10 per second
+
+    async def drain():
+        await bucket.acquire(600)
+        started = time.monotonic()
+        await bucket.acquire(2)
+        return time.monotonic() - started
+
+    assert 0.1 < asyncio.run(drain()) < 1.0
+
+
+def test_map_keeps_a_sliding_window():
+    ex, peak, active = executor(), [0], [0]
+
+    async def work(i):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01 * (i % 3))
+        active[0] -= 1
+        if i == 4:
+            raise ValueError("bad item")
+        return i * 2
+
+    async def run():
+        return [r async for r in ex.map(work, range(10), total=10)]
+
+    results = asyncio.run(run())
+    assert peak[0] == 3
+    assert sorted(item for item, _, _ in results) == list(range(10))
+    assert {item: result for item, result, error in results if error is None} == {i: i * 2 for i in range(10) if i != 4}
+    assert [type(error) for item, _, error in results if item == 4] == [ValueError]
+    assert (ex.completed, ex.failed) == (9, 1)
+
+
+def test_call_retries_rate_limits():
+    ex, attempts = executor(), []
+
+    async def request():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RateLimited()
+        return "ok"
+
+    assert asyncio.run(ex.call(request, tokens=5)) == "ok"
+    assert len(attempts) == 3 and ex.rate_limited == 2
+    assert attempts[1] - attempts[0] >= 0.01                   # honoured retry-after-ms
+    assert ex.requests.rate_factor < 1.0                        # slowed down, recovering gradually
+    assert (ex.in_flight, ex.waiting, ex.tokens_used) == (0, 0, 5)
+
+
+def test_call_gives_up():
+    ex = executor(max_retries=1)
+
+    async def rate_limited():
+        raise RateLimited()
+
+    async def broken():
+        raise ValueError("not retryable")
+
+    with pytest.raises(RateLimited):
+        asyncio.run(ex.call(rate_limited))
+    with pytest.raises(ValueError):
+        asyncio.run(ex.call(broken))
+    assert ex.rate_limited == 1 and ex.in_flight == 0
+
+
+def test_retry_after_header_formats():
+    def error(headers):
+        return SimpleNamespace(response=SimpleNamespace(headers=headers))
+    assert retry_after_seconds(error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(error({"retry-after": "3"})) == 3.0
+    assert retry_after_seconds(error({}), default=7) == 7
+
+
+def test_shared_between_event_loops_on_threads():
+    ex, lock, totals = executor(max_concurrent=8), threading.Lock(), []
+
+    async def request():
+        await asyncio.sleep(0)
+        return 1
+
+    async def run():
+        results = [result async for _, result, error in ex.map(lambda i: ex.call(request), range(500))]
+        with lock:
+            totals.append(sum(results))
+
+    threads = [threading.Thread(target=lambda: asyncio.run(run())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert totals == [500] * 4
+    assert (ex.in_flight, ex.waiting) == (0, 0)
+
+
+def test_get_executor_is_process_wide():
+    assert get_executor("chat") is get_executor("chat")
+    assert get_executor("chat") is not get_executor("embeddings")
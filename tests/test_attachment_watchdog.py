@@ -0,0 +1,109 @@
+import json
+import os
+import time
+import pytest
+import src.tools.attachemnt_classifier as classifier_module
+from src.tools.attachemnt_classifier import AttachmentClassifier
+from src.tools.attachment_watchdog import AttachmentWatchdog, AttachmentQuarantined
+
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def hang(path):
+    time.sleep(60)
+
+
+def fail(path):
+    raise ValueError("corrupt file")
+
+
+def exhaust_memory(path):
+    raise MemoryError("allocation failed")
+
+
+def crash(path):
+    os._exit(1)
+
+
+@pytest.fixture
+def watchdog(tmp_path):
+    with AttachmentWatchdog(timeout=1, memory_limit_mb=None, quarantine_dir=str(tmp_path / "quarantine"),
+                            report_path=str(tmp_path / "quarantine" / "report.jsonl")) as dog:
+        yield dog
+
+
+@pytest.fixture
+def attachment(tmp_path):
+    path = tmp_path / "attachment.pdf"
+    path.write_text("content", encoding="utf-8")
+    return str(path)
+
+
+def report(tmp_path):
+    with open(tmp_path / "quarantine" / "report.jsonl", "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_returns_extracted_text(watchdog, attachment):
+    assert watchdog.run("txt", attachment, read_text) == "content"
+    assert watchdog.run("txt", attachment, read_text) == "content"   # same long-lived worker
+    assert not watchdog.quarantined
+
+
+def test_quarantines_on_timeout(tmp_path, watchdog, attachment):
+    start = time.monotonic()
+    with pytest.raises(AttachmentQuarantined):
+        watchdog.run("pdf", attachment, hang)
+    assert time.monotonic() - start < 10
+    assert not os.path.exists(attachment)
+    assert os.path.exists(tmp_path / "quarantine" / "attachment.pdf")
+    [record] = report(tmp_path)
+    assert record["parser"] == "pdf" and record["reason"].startswith("timeout")
+
+
+def test_recovers_after_a_killed_worker(tmp_path, watchdog, attachment):
+    other = tmp_path / "other.txt"
+    other.write_text("still works", encoding="utf-8")
+    with pytest.raises(AttachmentQuarantined):
+        watchdog.run("pdf", attachment, hang)
+    assert watchdog.run("txt", str(other), read_text) == "still works"
+
+
+def test_quarantines_on_memory_error_and_crash(tmp_path, watchdog, attachment):
+    second = tmp_path / "second.pdf"
+    second.write_text("x", encoding="utf-8")
+    with pytest.raises(AttachmentQuarantined):
+        watchdog.run("pdf", attachment, exhaust_memory)
+    with pytest.raises(AttachmentQuarantined):
+        watchdog.run("pdf", str(second), crash)
+    assert [r["reason"] for r in report(tmp_path)] == ["memory cap of None MB exceeded", "worker crashed"]
+
+
+def test_parser_errors_are_not_quarantined(watchdog, attachment):
+    with pytest.raises(RuntimeError, match="corrupt file"):
+        watchdog.run("pdf", attachment, fail)
+    assert os.path.exists(attachment) and not watchdog.quarantined
+
+
+def hanging_probe(path, max_pages=2):
+    if "hangs" in path:
+        time.sleep(60)
+    return "some digital text in this pdf"
+
+
+def test_classifier_probes_pdfs_under_the_watchdog(tmp_path, watchdog, monkeypatch):
+    attachments = tmp_path / "attachments"
+    attachments.mkdir()
+    for name in ("good.pdf", "hangs.pdf"):
+        (attachments / name).write_bytes(b"%PDF")
+    monkeypatch.setattr(classifier_module, "pdf_probe_text", hanging_probe)
+
+    classifier = AttachmentClassifier(str(attachments), None)
+    classifier.get_types()
+    categories = classifier.get_scannable_pdfs(watchdog=watchdog)
+    assert [os.path.basename(p) for p in categories["scannable"]] == ["good.pdf"]
+    assert [os.path.basename(p) for p in categories["broken"]] == ["hangs.pdf"]
+    assert [os.path.basename(r["path"]) for r in watchdog.quarantined] == ["hangs.pdf"]
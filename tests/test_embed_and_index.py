@@ -0,0 +1,61 @@
+import sys
+import json
+import asyncio
+import pytest
+
+if sys.version_info < (3, 12):
+    pytest.skip("the indexing services use Python 3.12 f-strings", allow_module_level=True)
+
+import src.services.embed_and_index as embed_and_index
+from src.tools.embedders import HashingEmbedder
+from src.tools.vector_log import VectorLog, iter_vector_log
+
+
+def write(tmp_path, name, doc):
+    path = tmp_path / f"{name}.json"
+    path.write_text(json.dumps(doc), encoding="utf-8")
+    return str(path)
+
+
+def test_stream_items_reuses_only_current_vectors(tmp_path, offline_encoding):
+    embedder = HashingEmbedder(dimension=8)
+    current = write(tmp_path, "current", {"type": "thread", "summary_text": "budget", "embedding": [0.1] * 8, "embedding_model": embedder.name})
+    other_model = write(tmp_path, "other", {"type": "thread", "summary_text": "budget", "embedding": [0.1] * 8, "embedding_model": "old-model"})
+    other_dim = write(tmp_path, "dim", {"type": "thread", "summary_text": "budget", "embedding": [0.1] * 4, "embedding_model": embedder.name})
+    unrecorded = write(tmp_path, "unrecorded", {"type": "thread", "summary_text": "budget", "embedding": [0.1] * 8})
+
+    items = {path: (text, doc) for path, text, _, doc in embed_and_index.stream_items([current, other_model, other_dim, unrecorded], embedder)}
+    assert items[current][0] is None and items[current][1]["embedding"] == [0.1] * 8
+    for path in (other_model, other_dim, unrecorded):
+        text, doc = items[path]
+        assert text == "budget" and "embedding" not in doc and "embedding_model" not in doc
+
+
+class Indices():
+    def refresh(self, index):
+        pass
+
+
+class Client():
+    indices = Indices()
+
+
+def test_full_pass_logs_stored_and_new_vectors(tmp_path, monkeypatch, offline_encoding):
+    embedder = HashingEmbedder(dimension=8)
+    stored = write(tmp_path, "stored", {"doc_id": "t_1", "type": "thread", "summary_text": "budget", "embedding": [0.5] * 8, "embedding_model": embedder.name})
+    fresh = write(tmp_path, "fresh", {"doc_id": "t_2", "type": "thread", "summary_text": "offsite"})
+    indexed = []
+    monkeypatch.setattr(embed_and_index, "bulk_index", lambda client, actions, *args: (indexed.extend(actions), (len(actions), 0))[1])
+    monkeypatch.setattr(embed_and_index, "prepare_doc", lambda doc: doc)
+    monkeypatch.setattr(embed_and_index, "get_compressor", lambda: None)
+
+    log_path = str(tmp_path / "logs" / "threads.jsonl")
+    with VectorLog(log_path, append=False) as log:
+        stream = embed_and_index.EmbedIndexStream(Client(), "threads", embedder=embedder, use_cache=False, log=log, workers=1)
+        stats = asyncio.run(stream.run([stored, fresh], total=2))
+
+    assert stats["indexed"] == 2 and stats["embedded"] == 1
+    logged = {doc_id: (model, list(vector)) for doc_id, model, vector in iter_vector_log(log_path)}
+    assert set(logged) == {"t_1", "t_2"}
+    assert logged["t_1"] == (embedder.name, [0.5] * 8)
+    assert {a["_id"]: a["_source"]["embedding_model"] for a in indexed} == {"t_1": embedder.name, "t_2": embedder.name}
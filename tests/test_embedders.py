@@ -0,0 +1,23 @@
+import numpy as np
+from src.tools.embedders import HashingEmbedder
+
+
+def test_hashing_embedder_is_deterministic():
+    texts = ["Invoice for the depot route", "driver schedule", "Invoice for the depot route"]
+    first = HashingEmbedder(64).embed(texts)
+    second = HashingEmbedder(64).embed(texts)
+    assert first == second
+    assert first[0] == first[2]
+    assert first[0] != first[1]
+
+
+def test_hashing_embedder_dimension_and_norm():
+    embedder = HashingEmbedder(32)
+    vectors = np.asarray(embedder.embed(["parcel delivered to the customer", "van"]))
+    assert embedder.dimension == 32 and embedder.name == "hashing-32"
+    assert vectors.shape == (2, 32)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+
+
+def test_hashing_embedder_empty_text():
+    assert HashingEmbedder(8).embed([""]) == [[0.0] * 8]
@@ -0,0 +1,75 @@
+import asyncio
+from src.tools.embedders import Embedder, HashingEmbedder
+from src.tools.embedding_batcher import pack_batches, embed_batch
+
+
+class FailingEmbedder(Embedder):
+    """HashingEmbedder vectors, but any request containing a text in `bad` fails."""
+    name = "failing"
+    dimension = 8
+
+    def __init__(self, bad, error=None):
+        self.bad = set(bad)
+        self.error = error or ValueError("invalid input")
+        self.requests = []
+
+    def embed(self, texts):
+        self.requests.append(list(texts))
+        if self.bad & set(texts):
+            raise self.error
+        return HashingEmbedder(self.dimension).embed(texts)
+
+
+def items(n, tokens=10):
+    return [(f"k{i}", f"text {i}", tokens) for i in range(n)]
+
+
+def test_pack_batches_respects_input_limit():
+    batches = list(pack_batches(items(10), max_inputs=3, max_tokens=10_000))
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    assert [i for b in batches for i in b] == items(10)         # order kept
+
+
+def test_pack_batches_respects_token_limit():
+    batch_items = [("a", "x", 40), ("b", "x", 40), ("c", "x", 30), ("d", "x", 100), ("e", "x", 1)]
+    batches = list(pack_batches(batch_items, max_inputs=100, max_tokens=100))
+    assert [[key for key, _, _ in b] for b in batches] == [["a", "b"], ["c"], ["d"], ["e"]]
+    assert all(sum(n for _, _, n in b) <= 100 for b in batches)
+
+
+def test_pack_batches_oversized_item_gets_its_own_batch():
+    batches = list(pack_batches([("a", "x", 5), ("big", "x", 500), ("b", "x", 5)], max_inputs=10, max_tokens=100))
+    assert [[key for key, _, _ in b] for b in batches] == [["a"], ["big"], ["b"]]
+
+
+def test_embed_batch_splits_failed_requests_down_to_the_bad_input():
+    embedder = FailingEmbedder(bad={"text 5"})
+    vectors, errors = asyncio.run(embed_batch(items(8), None, embedder))
+    assert set(errors) == {"k5"}
+    assert set(vectors) == {f"k{i}" for i in range(8)} - {"k5"}
+    assert vectors["k0"] == HashingEmbedder(8).embed(["text 0"])[0]
+    assert ["text 5"] in embedder.requests                      # retried down to the single input
+
+
+def test_embed_batch_does_not_split_rate_limited_requests():
+    error = type("RateLimit", (Exception,), {"status_code": 429})()
+    embedder = FailingEmbedder(bad={"text 0"}, error=error)
+    vectors, errors = asyncio.run(embed_batch(items(4), None, embedder))
+    assert vectors == {} and set(errors) == {"k0", "k1", "k2", "k3"}
+    assert len(embedder.requests) == 1
+
+
+def test_embed_batch_serves_cached_texts():
+    class DictCache(dict):
+        def get(self, model, text):
+            return super().get((model, text))
+
+        def put(self, model, text, vector):
+            self[(model, text)] = vector
+
+    cache = DictCache()
+    embedder = FailingEmbedder(bad=set())
+    asyncio.run(embed_batch(items(3), None, embedder, cache))
+    vectors, errors = asyncio.run(embed_batch(items(4), None, embedder, cache))
+    assert len(vectors) == 4 and not errors
+    assert embedder.requests[-1] == ["text 3"]                  # only the uncached text was requested
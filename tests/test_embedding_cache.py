@@ -0,0 +1,53 @@
+import itertools
+import pytest
+import src.tools.embedding_cache as embedding_cache
+from src.tools.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing last_used timestamps, so LRU order doesn't depend on timer resolution."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_round_trip(tmp_path):
+    with EmbeddingCache(str(tmp_path / "cache.sqlite")) as cache:
+        assert cache.get("m", "hello") is None
+        cache.put("m", "hello", [0.5, -1.0, 2.0])
+        assert list(cache.get("m", "hello")) == [0.5, -1.0, 2.0]
+        assert cache.get("other-model", "hello") is None
+        assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 0.333}
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path, clock):
+    with EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=10) as cache:
+        for i in range(10):
+            cache.put("m", f"text {i}", [float(i)])
+        for i in (0, 1):
+            cache.get("m", f"text {i}")                         # touched: now the most recently used
+        for i in range(10, 12):
+            cache.put("m", f"text {i}", [float(i)])
+        cache.flush()
+
+        assert len(cache) == 9                                  # evicted down to 90% of max_entries
+        kept = {i for i in range(12) if cache.get("m", f"text {i}") is not None}
+        assert kept == {0, 1, *range(5, 12)}
+
+
+def test_eviction_by_size(tmp_path, clock):
+    with EmbeddingCache(str(tmp_path / "cache.sqlite"), max_mb=1) as cache:
+        vector = [0.0] * 65_536                                 # 256 KiB each
+        for i in range(6):
+            cache.put("m", f"text {i}", vector)
+        cache.flush()
+        assert len(cache) == 3
+        assert cache.get("m", "text 5") is not None and cache.get("m", "text 0") is None
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    with EmbeddingCache(path) as cache:
+        cache.put("m", "hello", [1.0])
+    with EmbeddingCache(path) as cache:
+        assert list(cache.get("m", "hello")) == [1.0]
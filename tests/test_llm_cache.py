@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+from src.tools.llm_cache import LLMCache, completion_key
+import src.tools.async_thread_summaries as ats
+
+
+def test_completion_key_covers_every_input():
+    base = completion_key("m", "system", "prompt", 0.0)
+    assert base == completion_key("m", "system", "prompt", 0.0)
+    assert len({base,
+                completion_key("m2", "system", "prompt", 0.0),
+                completion_key("m", "system2", "prompt", 0.0),
+                completion_key("m", "system", "prompt2", 0.0),
+                completion_key("m", "system", "prompt", 0.2)}) == 5
+
+
+def test_get_put_and_stats(tmp_path):
+    with LLMCache(str(tmp_path / "cache" / "llm.sqlite")) as cache:
+        assert cache.get("k") is None
+        cache.put("k", "m", 0.0, "summary")
+        assert cache.get("k") == "summary" and len(cache) == 1
+        cache.put("k", "m", 0.0, "newer")                       # same key replaces
+        assert cache.get("k") == "newer" and len(cache) == 1
+        assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 0.667}
+
+
+def test_export_import_roundtrip(tmp_path):
+    with LLMCache(str(tmp_path / "a.sqlite")) as source:
+        source.put("k1", "m", 0.0, "one")
+        source.put("k2", "m", 0.0, "two")
+        assert source.export_jsonl(str(tmp_path / "out" / "llm.jsonl")) == 2
+
+    with LLMCache(str(tmp_path / "b.sqlite")) as target:
+        target.put("k1", "m", 0.0, "local")
+        assert target.import_jsonl(str(tmp_path / "out" / "llm.jsonl")) == 1
+        assert target.get("k1") == "local" and target.get("k2") == "two"
+        target.import_jsonl(str(tmp_path / "out" / "llm.jsonl"), overwrite=True)
+        assert target.get("k1") == "one"
+
+
+class Executor():
+    def __init__(self):
+        self.calls = 0
+
+    async def call(self, request, tokens=1):
+        self.calls += 1
+        return request()
+
+
+def test_complete_answers_repeated_prompts_from_the_cache(tmp_path, monkeypatch):
+    reply = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" summary "))])
+    monkeypatch.setattr(ats, "get_async_openai", lambda: None)
+    monkeypatch.setattr(ats, "call_chat_completion", lambda client, messages: reply)
+    messages = [{"role": "system", "content": "s"}, {"role": "user", "content": "thread"}]
+    executor = Executor()
+
+    with LLMCache(str(tmp_path / "llm.sqlite")) as cache:
+        assert asyncio.run(ats.complete(messages, executor, cache)) == "summary"
+        assert asyncio.run(ats.complete(messages, executor, cache)) == "summary"
+        assert executor.calls == 1 and (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+import src.tools.async_thread_summaries as ats
+from src.tools.tokenizer import count_tokens
+
+
+@pytest.fixture
+def small_prompts(offline_encoding, monkeypatch):
+    monkeypatch.setattr(ats, "MAP_CHUNK_TOKENS", 40)
+    monkeypatch.setattr(ats, "MAX_TOKENS_PER_PROMPT", 60)
+
+
+def fake_complete(monkeypatch, reply):
+    """Replaces the API call; `reply(messages)` gives the completion. Returns the recorded prompts."""
+    calls = []
+
+    async def complete(messages, executor, cache=None):
+        calls.append(messages)
+        return reply(messages)
+
+    monkeypatch.setattr(ats, "complete", complete)
+    return calls
+
+
+def thread(n):
+    return [f"Message_{i}: the budget for project {i} was approved on Monday by the finance team" for i in range(n)]
+
+
+def test_split_into_chunks(offline_encoding):
+    texts = thread(6) + ["word " * 100]
+    chunks = ats.split_into_chunks(texts, 40)
+    assert all(count_tokens(c) <= 40 + 2 * len(texts) for c in chunks)   # separators aside
+    assert chunks[0].startswith("Message_0") and "Message_5" in "".join(chunks)
+    assert sum(c.count("word") for c in chunks) == 100                  # the long text is cut, not dropped
+    assert ats.split_into_chunks([], 40) == []
+
+
+def test_reduces_until_one_prompt(small_prompts, monkeypatch):
+    calls = fake_complete(monkeypatch, lambda messages: "short summary")
+    summary = asyncio.run(ats.map_reduce_summary(thread(20), executor=None))
+    assert summary == "short summary"
+    systems = [m[0]["content"] for m in calls]
+    assert systems.count(ats.CHUNK_SUMMARY_PROMPT) == len(calls) - 1 > 1
+    assert systems[-1] == ats.REDUCE_SUMMARY_PROMPT
+    assert calls[-1][1]["content"].startswith("Part 1: short summary")
+
+
+def test_delta_reduce_keeps_previous_summary(small_prompts, monkeypatch):
+    calls = fake_complete(monkeypatch, lambda messages: "short summary")
+    asyncio.run(ats.map_reduce_summary(thread(20), executor=None, previous_summary="old summary"))
+    assert calls[-1][0]["content"] == ats.DELTA_SUMMARY_PROMPT
+    assert calls[-1][1]["content"].startswith("Current summary:\nold summary")
+
+
+def test_stops_when_summaries_do_not_shrink(small_prompts, monkeypatch):
+    long_summary = " ".join(f"detail{i}" for i in range(40))             # as long as a whole chunk
+    calls = fake_complete(monkeypatch, lambda messages: long_summary)
+    asyncio.run(ats.map_reduce_summary(thread(20), executor=None))
+    assert len(calls) == len(ats.split_into_chunks(thread(20), 40)) + 1  # map, then straight to the final prompt
+    assert calls[-1][0]["content"] == ats.REDUCE_SUMMARY_PROMPT
+    assert count_tokens(calls[-1][1]["content"]) <= 60                  # leftovers are truncated
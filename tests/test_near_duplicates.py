@@ -0,0 +1,53 @@
+import numpy as np
+from src.tools.near_duplicates import MinHasher, MERSENNE_PRIME, NearDuplicates, shingles, find_near_duplicates
+
+
+def test_signature_matches_exact_arithmetic():
+    hasher = MinHasher(num_perm=16)
+    shingle_set = shingles("the quarterly budget review meeting moved to the large room on the third floor")
+    expected = [min((int(a) * x + int(b)) % MERSENNE_PRIME for x in shingle_set)   # Python ints never wrap
+                for a, b in zip(hasher.a, hasher.b)]
+    assert hasher.signature(shingle_set).tolist() == expected
+
+
+def test_shingles_fold_numbers():
+    assert shingles("Invoice 1234 due on 2024-05-01 for order 99") == shingles("Invoice 8 due on 2023-01-17 for order 5")
+    assert shingles("") == set() and len(shingles("two words")) == 1
+
+
+class Index():
+    """Corpus index stand-in over in-memory bodies."""
+    def __init__(self, bodies):
+        self.records = [{"message_id": mid, "body_len": len(body), "date": f"2024-01-{i + 1:02d}T00:00:00+00:00", "body": body}
+                        for i, (mid, body) in enumerate(bodies.items())]
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def read_email(self, rec):
+        return {"body": rec["body"]}
+
+
+NEWSLETTER = ("Weekly digest number {n}: the cafeteria menu, parking changes, upcoming training sessions, "
+              "the holiday schedule, new hires in the sales team and a reminder to submit expense reports on time.")
+
+
+def test_finds_near_duplicates(tmp_path):
+    bodies = {f"news{n}": NEWSLETTER.format(n=n) for n in range(5)}
+    bodies["edited"] = NEWSLETTER.format(n=7) + " Thanks."
+    bodies["other"] = ("Can we move the design review to Thursday? Marketing still needs the final mockups "
+                       "and legal has not signed off on the new terms for the partner programme yet.")
+    bodies["short"] = "Thanks!"
+    result = find_near_duplicates(Index(bodies))
+
+    assert result.duplicates("news0") == ["news1", "news2", "news3", "news4", "edited"]   # earliest represents
+    assert not result.is_duplicate("news0") and result.is_duplicate("edited")
+    assert not result.is_duplicate("other") and not result.is_duplicate("short")
+
+    result.path = str(tmp_path / "dups" / "near_duplicates.json")
+    result.save()
+    assert NearDuplicates.load(result.path).duplicate_of == result.duplicate_of
+    assert len(NearDuplicates.load(str(tmp_path / "missing.json"))) == 0
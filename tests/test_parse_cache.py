@@ -0,0 +1,69 @@
+import os
+from src.tools.parse_cache import ParseCache, file_sha256, cached_extract
+
+
+def test_file_sha256(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_bytes(b"payload")
+    assert file_sha256(str(path)) == "239f59ed55e737c77147cf55ad0c1b030b6d7ee748a7426952f9b852d5a935e5"
+
+
+def test_hits_and_misses(tmp_path):
+    with ParseCache(str(tmp_path / "parse.sqlite"), {"pdf": 1}) as cache:
+        assert cache.get("abc", "pdf") is None
+        cache.put("abc", "pdf", "text")
+        assert cache.get("abc", "pdf") == "text"
+        assert cache.get("abc", "word") is None
+        assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 0.333}
+
+
+def test_version_bump_misses(tmp_path):
+    path = str(tmp_path / "parse.sqlite")
+    with ParseCache(path, {"scannable_pdf": 1}) as cache:
+        cache.put("abc", "scannable_pdf", "old text")
+        cache.put("abc", "scannable_pdf:pymupdf", "old variant text")
+    with ParseCache(path, {"scannable_pdf": 2}) as cache:
+        assert cache.get("abc", "scannable_pdf") is None
+        assert cache.get("abc", "scannable_pdf:pymupdf") is None     # variants share the prefix's version
+
+
+def test_purge_stale_after_version_bump(tmp_path):
+    path = str(tmp_path / "parse.sqlite")
+    with ParseCache(path, {"scannable_pdf": 1, "tabular": 1}) as cache:
+        cache.put("a", "scannable_pdf:pymupdf", "pdf text")
+        cache.put("b", "tabular:compact:5:5:200", "table")
+        assert cache.purge_stale() == 0
+    with ParseCache(path, {"scannable_pdf": 2, "tabular": 1}) as cache:
+        assert cache.purge_stale() == 1
+        assert cache.get("b", "tabular:compact:5:5:200") == "table"
+        assert cache.conn.execute("SELECT COUNT(*) FROM parse_results").fetchone()[0] == 1
+
+
+def test_purge_stale_skips_scan_when_versions_unchanged(tmp_path):
+    with ParseCache(str(tmp_path / "parse.sqlite"), {"pdf": 1}) as cache:
+        cache.purge_stale()
+        cache.conn.execute("INSERT INTO parse_results VALUES ('x', 'pdf', 0, 'stale', 0)")   # unreachable old version
+        assert cache.purge_stale() == 0
+
+
+def test_cached_extract_runs_parser_once(tmp_path):
+    doc = tmp_path / "doc.pdf"
+    doc.write_bytes(b"%PDF")
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        return "extracted"
+
+    with ParseCache(str(tmp_path / "parse.sqlite"), {"pdf": 1}) as cache:
+        assert cached_extract(cache, "pdf", str(doc), extract) == "extracted"
+        assert cached_extract(cache, "pdf", str(doc), extract) == "extracted"
+    assert calls == [str(doc)]
+    assert cached_extract(None, "pdf", str(doc), extract) == "extracted"
+    assert len(calls) == 2
+
+
+def test_cache_creates_its_directory(tmp_path):
+    path = tmp_path / "nested" / "dir" / "parse.sqlite"
+    ParseCache(str(path)).close()
+    assert os.path.exists(path)
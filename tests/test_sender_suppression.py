@@ -0,0 +1,54 @@
+import src.tools.sender_suppression as sender_suppression
+from src.tools.sender_suppression import (SUPPRESS, DOWNGRADE, SenderSuppression, sender_address, boilerplate_share,
+                                          build_sender_suppression)
+
+
+def rec(mid, sender, parent=None, unsubscribe=False, boilerplate=0.0):
+    return {"message_id": mid, "sender": sender, "parent": parent, "size": 1000,
+            "list_unsubscribe": unsubscribe, "boilerplate_share": boilerplate}
+
+
+def corpus():
+    records = []
+    for i in range(6):
+        records.append(rec(f"news{i}", "newsletter@shop.com", unsubscribe=True, boilerplate=0.5))
+        records.append(rec(f"alert{i}", "noreply@monitoring.io"))
+        records.append(rec(f"promo{i}", "deals@shop.com", unsubscribe=True))
+        records.append(rec(f"ann{i}", "ann@corp.com"))
+        records.append(rec(f"bob{i}", "bob@corp.com", parent=f"ann{i}"))   # Ann's mail gets replies
+    records.append(rec("rare", "noreply@rare.io", unsubscribe=True))       # too few messages
+    return records
+
+
+def test_classification():
+    result = build_sender_suppression(corpus())
+    assert result.action("news0") == SUPPRESS and result.is_suppressed("news0")
+    assert result.action("alert0") == DOWNGRADE and result.action("promo0") == DOWNGRADE
+    assert result.is_bulk("alert0") and not result.is_suppressed("alert0")
+    for mid in ("ann0", "bob0", "rare"):
+        assert result.action(mid) is None and not result.is_bulk(mid)
+    assert len(result) == 18
+
+
+def test_allowlist(monkeypatch):
+    monkeypatch.setattr(sender_suppression, "SENDER_ALLOWLIST", ["@shop.com"])
+    result = build_sender_suppression(corpus())
+    assert not result.is_bulk("news0") and not result.is_bulk("promo0") and result.is_bulk("alert0")
+
+
+def test_save_and_load(tmp_path):
+    result = build_sender_suppression(corpus())
+    result.path = str(tmp_path / "suppression" / "senders.json")
+    result.save()
+    loaded = SenderSuppression.load(result.path)
+    assert loaded.messages == result.messages and loaded.senders == result.senders
+    assert len(SenderSuppression.load(str(tmp_path / "missing.json"))) == 0
+
+
+def test_sender_address_and_boilerplate():
+    assert sender_address({"from": "Shop <News@Shop.com>"}) == "news@shop.com"
+    assert sender_address({"participants": ["ann@corp.com", "bob@corp.com"]}) == "ann@corp.com"
+    assert boilerplate_share("") == 0.0
+    assert boilerplate_share("Hello there") == 0.0
+    body = "Big sale today. " + sender_suppression.BOILERPLATE[0]
+    assert 0 < boilerplate_share(body) < 1
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+from src.tools.tabular_parsing import TableSummary, summarize_csv, render_tabular, _rows_to_frames
+
+
+def frame(start, stop):
+    return pd.DataFrame({"id": range(start, stop), "amount": [i * 0.5 for i in range(start, stop)], "city": ["Berlin", "Paris"] * ((stop - start) // 2)})
+
+
+def test_streamed_chunks_match_the_whole_table():
+    summary = TableSummary("t", head_rows=3, tail_rows=2)
+    for start in range(0, 100, 10):
+        summary.update(frame(start, start + 10))
+    assert summary.row_count == 100
+    assert list(summary.head["id"]) == [0, 1, 2]
+    assert list(summary.tail["id"]) == [98, 99]
+
+    stats = summary._column_stats().set_index("column")
+    assert stats.loc["id", "min"] == 0 and stats.loc["id", "max"] == 99 and stats.loc["id", "mean"] == 49.5
+    assert stats.loc["city", "distinct"] == 2 and stats.loc["city", "mean"] == ""
+
+
+def test_distinct_tracking_stops_at_the_cap():
+    summary = TableSummary("t", max_distinct=5)
+    summary.update(pd.DataFrame({"id": range(20)}))
+    assert summary._column_stats().loc[0, "distinct"] == ">5"
+
+
+def test_nulls_and_mixed_columns():
+    summary = TableSummary("t")
+    summary.update(pd.DataFrame({"value": [1, None, "n/a", 4]}))
+    row = summary._column_stats().loc[0]
+    assert (row["non_null"], row["nulls"]) == (3, 1)
+    assert row["min"] == ""                                     # not fully numeric: no numeric stats
+
+
+def test_render_compact_is_bounded():
+    summary = TableSummary("big.csv", head_rows=5, tail_rows=2)
+    for start in range(0, 10_000, 1000):
+        summary.update(frame(start, start + 1000))
+    text = summary.render(max_cell_chars=10)
+    assert "Table big.csv: 10000 rows x 3 columns" in text
+    assert "First 5 rows:" in text and "Last 2 rows:" in text and "... 9993 rows omitted ..." in text
+    assert len(text) < 3000
+
+
+def test_render_small_table_whole_and_clipped():
+    summary = TableSummary("small", head_rows=20)
+    summary.update(pd.DataFrame({"note": ["x" * 500, "short"]}))
+    text = summary.render(max_cell_chars=12)
+    assert "Column stats" not in text
+    assert "x" * 12 in text and "x" * 13 not in text
+
+
+def test_render_empty():
+    assert TableSummary("none").render() == "Table none: (empty)"
+
+
+def test_rows_to_frames_pads_ragged_rows():
+    frames = list(_rows_to_frames(iter([("a", None), (1, 2), (3,), (4, 5, 6)]), chunk_rows=2))
+    assert [len(f) for f in frames] == [2, 1]
+    assert list(frames[0].columns) == ["a", "column_1"]
+    assert frames[0].iloc[1].isna()["column_1"]
+
+
+def test_csv_and_excel_rendering(tmp_path):
+    data = frame(0, 50)
+    csv_path, xlsx_path = tmp_path / "t.csv", tmp_path / "t.xlsx"
+    data.to_csv(csv_path, index=False)
+    data.to_excel(xlsx_path, index=False, sheet_name="Data")
+
+    assert summarize_csv(str(csv_path), chunk_rows=7).row_count == 50
+    assert "50 rows x 3 columns" in render_tabular(str(csv_path))
+    assert "50 rows x 3 columns" in render_tabular(str(xlsx_path))
+    with pytest.raises(ValueError):
+        render_tabular(str(tmp_path / "t.json"))
@@ -0,0 +1,43 @@
+from src.tools.thread_dedup import remove_redundant_text, split_with_separators, RedundancyStats, END_MARKER
+
+PARENT = "We will ship the release on Friday after the final review.\nPlease send me your test results by Thursday."
+
+
+def test_short_sentences_are_never_dropped():
+    assert remove_redundant_text("Thanks.\nSee you Monday.", "Thanks.\nMeeting is Monday.") == "Thanks.\nSee you Monday."
+
+
+def test_line_breaks_survive():
+    assert remove_redundant_text("Line one\nLine two", PARENT) == "Line one\nLine two"
+    assert remove_redundant_text("First point. Second point.\nThird point.", PARENT) == "First point. Second point.\nThird point."
+
+
+def test_inline_quotes_are_removed():
+    body = ("Sounds good to me.\n> We will ship the release on Friday after the final review.\n"
+            "I will send mine today.\n> Please send me your test results by Thursday.\nBest, Ann\n" + END_MARKER)
+    assert remove_redundant_text(body, PARENT + "\n" + END_MARKER) == \
+        "Sounds good to me.\nI will send mine today.\nBest, Ann\n" + END_MARKER
+
+
+def test_reply_header_goes_with_its_quote():
+    body = "Agreed, Friday works.\nOn Mon, Bob wrote:\nWe will ship the release on Friday after the final review."
+    assert remove_redundant_text(body, PARENT) == "Agreed, Friday works."
+    body = "Agreed.\nFrom: Bob Sent: Monday Subject: Release\nWe will ship the release on Friday after the final review."
+    assert remove_redundant_text(body, PARENT) == "Agreed."
+
+
+def test_mostly_repeated_sentences_are_removed():
+    body = "Noted. We will ship the release on Friday after the final code review."
+    assert remove_redundant_text(body, PARENT) == "Noted."
+
+
+def test_stats_and_empty_inputs():
+    stats = RedundancyStats()
+    body = "New info here.\nWe will ship the release on Friday after the final review."
+    assert remove_redundant_text(body, PARENT, stats=stats) == "New info here."
+    assert (stats.messages, stats.chars_before, stats.chars_after) == (1, len(body), len("New info here."))
+    assert remove_redundant_text("", PARENT) == "" and remove_redundant_text("Body", None) == "Body"
+
+
+def test_split_keeps_separators():
+    assert split_with_separators("One. Two\n\nThree") == [("", "One."), (" ", "Two"), ("\n\n", "Three")]
@@ -0,0 +1,73 @@
+import json
+from src.tools.thread_summaries import plan_thread_refresh
+from src.tools.async_thread_summaries import build_summary_messages, build_thread_doc, DELTA_SUMMARY_PROMPT, SUMMARY_PROMPT
+
+
+class Attachments():
+    """Attachment index stand-in: message_id → attachment hashes."""
+    def __init__(self, hashes=None):
+        self.hashes = hashes or {}
+
+    def get(self, mid):
+        return [{"sha256": h} for h in self.hashes.get(mid, [])]
+
+    def paths(self, mid):
+        return []
+
+
+def records(*mids):
+    return [{"message_id": m} for m in mids]
+
+
+def write_previous(out_dir, tid, groups, attachments, summary="old summary"):
+    """Thread document as written by the last run for `groups[tid]`."""
+    entry = plan_thread_refresh({tid: groups[tid]}, attachments, str(out_dir), delta=False)[tid]
+    doc = {"thread_id": tid, "message_ids": [r["message_id"] for r in groups[tid]], "summary_text": summary,
+           "fingerprint": entry["fingerprint"], "attachment_hashes": entry["attachment_hashes"]}
+    (out_dir / f"{tid}.json").write_text(json.dumps(doc), encoding="utf-8")
+
+
+def test_new_unchanged_and_grown_threads(tmp_path):
+    attachments = Attachments({"b1": ["h1"]})
+    write_previous(tmp_path, "a", {"a": records("a1", "a2")}, attachments)
+    write_previous(tmp_path, "b", {"b": records("b1")}, attachments)
+
+    groups = {"a": records("a1", "a2"), "b": records("b1", "b2", "b3"), "c": records("c1")}
+    plan = plan_thread_refresh(groups, attachments, str(tmp_path))
+    assert set(plan) == {"b", "c"}                              # "a" is unchanged
+    assert plan["c"]["mode"] == "full"
+    assert plan["b"]["mode"] == "delta"
+    assert plan["b"]["new_message_ids"] == ["b2", "b3"]
+    assert plan["b"]["previous_summary"] == "old summary"
+
+
+def test_changed_content_gets_a_full_summary(tmp_path):
+    write_previous(tmp_path, "a", {"a": records("a1", "a2")}, Attachments({"a1": ["h1"]}))
+    plan = plan_thread_refresh({"a": records("a1", "a2", "a3")}, Attachments({"a1": ["h2"]}), str(tmp_path))
+    assert plan["a"]["mode"] == "full"                          # an attachment changed, not just new messages
+    plan = plan_thread_refresh({"a": records("a1")}, Attachments({"a1": ["h1"]}), str(tmp_path))
+    assert plan["a"]["mode"] == "full"                          # messages were removed
+
+
+def test_delta_disabled(tmp_path):
+    write_previous(tmp_path, "a", {"a": records("a1")}, Attachments())
+    plan = plan_thread_refresh({"a": records("a1", "a2")}, Attachments(), str(tmp_path), delta=False)
+    assert plan["a"]["mode"] == "full"
+
+
+def test_delta_prompt_carries_the_previous_summary(offline_encoding):
+    data = {"texts": ["Message_b2: new reply"], "mode": "delta", "previous_summary": "old summary"}
+    system, user = build_summary_messages(data)
+    assert system["content"] == DELTA_SUMMARY_PROMPT
+    assert user["content"].startswith("Current summary:\nold summary") and "new reply" in user["content"]
+
+    system, user = build_summary_messages({"texts": ["Message_a1: hello", "Message_a2: bye"]})
+    assert system["content"] == SUMMARY_PROMPT and user["content"] == "Message_a1: hello\n\nMessage_a2: bye"
+
+
+def test_thread_doc_keeps_the_fingerprint():
+    from datetime import datetime, timezone
+    data = {"subjects": {"Budget"}, "participants": {"a@x"}, "dates": [datetime(2024, 1, 1, tzinfo=timezone.utc)],
+            "message_ids": ["a1"], "fingerprint": "f", "attachment_hashes": ["h"]}
+    doc = build_thread_doc("a1", data, "summary")
+    assert (doc["doc_id"], doc["fingerprint"], doc["attachment_hashes"]) == ("t_a1", "f", ["h"])
@@ -0,0 +1,78 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from src.tools.thread_union_find import UnionFind, assign_threads, normalize_subject
+from src.tools.thread_summaries import prune_thread_docs
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def msg(mid, parent="", refs=(), subject="", day=0):
+    return (mid, parent, list(refs), subject, T0 + timedelta(days=day))
+
+
+def test_union_find():
+    uf = UnionFind()
+    uf.union("a", "b")
+    uf.union("c", "d")
+    assert uf.find("a") == uf.find("b") != uf.find("c")
+    uf.union("b", "d")
+    assert len({uf.find(x) for x in "abcd"}) == 1
+
+
+def test_deep_chain_needs_no_recursion():
+    n = 50_000
+    records = [msg("m0")] + [msg(f"m{i}", parent=f"m{i - 1}", day=i / 1000) for i in range(1, n)]
+    thread_map = assign_threads(records, subject_fallback=False)
+    assert set(thread_map.values()) == {"m0"}
+
+
+def test_replies_and_references_group_into_threads():
+    records = [
+        msg("a", subject="Budget", day=0),
+        msg("b", parent="a", day=1),
+        msg("c", refs=["a", "b"], day=2),
+        msg("x", subject="Other", day=0),
+    ]
+    thread_map = assign_threads(records, subject_fallback=False)
+    assert thread_map == {"a": "a", "b": "a", "c": "a", "x": "x"}
+
+
+def test_siblings_of_a_missing_root_meet():
+    records = [msg("b", parent="lost-root", day=2), msg("c", refs=["lost-root"], day=1)]
+    thread_map = assign_threads(records, subject_fallback=False)
+    assert thread_map == {"b": "c", "c": "c"}                   # named after the earliest known message
+
+
+def test_id_less_messages_stay_apart():
+    records = [msg("", parent="a"), msg("a"), msg("b", parent="")]
+    thread_map = assign_threads(records, subject_fallback=False)
+    assert thread_map["a"] == "a" and thread_map["b"] == "b" and thread_map[""] == ""
+
+
+def test_subject_fallback_merges_within_the_window():
+    records = [
+        msg("a", subject="Route plan", day=0),
+        msg("b", subject="RE: Route plan", day=3),               # broken headers: no parent / references
+        msg("c", subject="Fwd: re: route  plan", day=10),
+        msg("d", subject="Route plan", day=60),                  # too far from the others
+    ]
+    assert len(set(assign_threads(records, subject_fallback=False).values())) == 4
+    thread_map = assign_threads(records, subject_fallback=True, window_days=14)
+    assert thread_map == {"a": "a", "b": "a", "c": "a", "d": "d"}
+
+
+def test_normalize_subject():
+    assert normalize_subject("RE: Fwd:  AW[2]: Invoice\xa0March ") == "invoice march"
+    assert normalize_subject(None) == ""
+
+
+def test_prune_thread_docs(tmp_path):
+    out_dir, pending = tmp_path / "threads", tmp_path / "stale.json"
+    out_dir.mkdir()
+    for tid in ("kept", "renamed", "merged"):
+        (out_dir / f"{tid}.json").write_text("{}", encoding="utf-8")
+
+    assert sorted(prune_thread_docs(str(out_dir), {"kept": []}, str(pending))) == ["merged", "renamed"]
+    assert os.listdir(out_dir) == ["kept.json"]
+    assert json.loads(pending.read_text(encoding="utf-8")) == ["t_merged", "t_renamed"]
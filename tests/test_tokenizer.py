@@ -0,0 +1,49 @@
+import random
+from src.tools.tokenizer import encode, truncate, exceeds_tokens, count_tokens, count_tokens_batch
+
+WORDS = "invoice delivery route driver schedule payment station block shift depot van parcel customer the a".split()
+
+
+def sample_text(seed, n_words=4000):
+    rng = random.Random(seed)
+    lines = []
+    while n_words > 0:
+        n = rng.randint(1, 30)
+        lines.append(" ".join(rng.choice(WORDS) + rng.choice(["", ",", ".", "  ", "'s"]) for _ in range(n)))
+        n_words -= n
+    return "\n".join(lines)
+
+
+def test_prefix_encoding_matches_full_encode(offline_encoding):
+    text = sample_text(0)
+    full = offline_encoding.encode(text, disallowed_special=())
+    for max_tokens in [*range(1, 300), 3000, len(full), len(full) + 10]:
+        assert encode(text, max_tokens) == full[:max_tokens], max_tokens
+
+
+def test_prefix_encoding_cuts_between_words(offline_encoding):
+    # one token per word: a prefix cut inside a word would end on a partial token
+    for word in ("driver", "invoice", "schedule"):
+        text = " ".join([word] * 500)
+        full = offline_encoding.encode(text)
+        for max_tokens in range(1, 100):
+            assert encode(text, max_tokens) == full[:max_tokens], (word, max_tokens)
+
+
+def test_prefix_encoding_without_spaces(offline_encoding):
+    text = "x" * 5000 + " tail"
+    assert encode(text, 10) == offline_encoding.encode(text)[:10]
+
+
+def test_truncate_and_exceeds(offline_encoding):
+    text = sample_text(1, 500)
+    n = len(offline_encoding.encode(text))
+    assert truncate(text, n) == text
+    assert offline_encoding.encode(truncate(text, 50)) == offline_encoding.encode(text)[:50]
+    assert exceeds_tokens(text, n - 1) and not exceeds_tokens(text, n)
+
+
+def test_count_tokens_matches_encode(offline_encoding):
+    texts = [sample_text(seed, words) for seed, words in ((2, 10), (3, 5000), (2, 10), (4, 1))]
+    assert count_tokens_batch(texts) == [len(offline_encoding.encode(t)) for t in texts]
+    assert count_tokens(texts[1]) == len(offline_encoding.encode(texts[1]))       # served from the count cache
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from src.tools.vector_compression import VectorCompressor, rescore, encode_full, decode_full
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    basis = rng.normal(size=(8, 64))
+    return (rng.normal(size=(500, 8)) @ basis + 0.01 * rng.normal(size=(500, 64))).astype(np.float32)
+
+
+def test_full_vector_round_trip():
+    vector = np.array([0.25, -1.5, 3.0], dtype=np.float32)
+    assert np.array_equal(decode_full(encode_full(vector)), vector)
+
+
+@pytest.mark.parametrize("pca_dim, quantization", [(16, None), (None, "int8"), (16, "int8"), (None, "fp16")])
+def test_save_load_round_trip(tmp_path, vectors, pca_dim, quantization):
+    path = str(tmp_path / "compression.npz")
+    fitted = VectorCompressor.fit(vectors, pca_dim, quantization)
+    fitted.save(path)
+    loaded = VectorCompressor.load(path)
+
+    assert (loaded.dimension, loaded.pca_dim, loaded.quantization) == (64, pca_dim, quantization)
+    assert loaded.mapping() == fitted.mapping()
+    assert np.array_equal(loaded.compress(vectors[:20]), fitted.compress(vectors[:20]))
+
+
+def test_load_missing_file(tmp_path):
+    assert VectorCompressor.load(str(tmp_path / "missing.npz")) is None
+
+
+def test_compressed_shapes_and_types(vectors):
+    compressor = VectorCompressor.fit(vectors, 16, "int8")
+    compressed = compressor.compress(vectors)
+    assert compressed.shape == (500, 16) and compressed.dtype == np.int8
+    assert compressor.mapping()["dimension"] == 16 and compressor.mapping()["data_type"] == "byte"
+    assert compressor.candidates(10) > 10
+
+
+def test_fit_needs_enough_vectors(vectors):
+    with pytest.raises(ValueError):
+        VectorCompressor.fit(vectors[:4], 16)
+    with pytest.raises(ValueError):
+        VectorCompressor.fit(np.zeros((0, 64)), 16)
+
+
+def test_uncompressed_passthrough():
+    compressor = VectorCompressor(3)
+    assert not compressor.enabled
+    assert compressor.doc_fields([1.0, 2.0, 3.0]) == {"embedding": [1.0, 2.0, 3.0]}
+    assert compressor.candidates(10) == 10
+
+
+def hit(doc_id, vector, score):
+    return {"_id": doc_id, "_score": score, "_source": {"doc_id": doc_id, "embedding_full": encode_full(vector)}}
+
+
+def test_rescore_ranks_by_exact_cosine_and_drops_full_vectors():
+    query = [1.0, 0.0, 0.0]
+    hits = [
+        hit("far", [0.0, 1.0, 0.0], 0.9),                       # compressed scores in the wrong order
+        hit("exact", [2.0, 0.0, 0.0], 0.1),
+        hit("close", [1.0, 0.2, 0.0], 0.5),
+        {"_id": "no_full", "_score": 0.95, "_source": {"doc_id": "no_full"}},
+    ]
+    ranked = rescore(query, hits, k=3)
+    assert [h["_id"] for h in ranked] == ["exact", "close", "far"]
+    assert ranked[0]["_score"] == pytest.approx(1.0)
+    assert all("embedding_full" not in h["_source"] for h in hits)
+
+
+def test_rescore_keeps_hits_without_full_vectors_last():
+    hits = [{"_id": "plain", "_score": 0.9, "_source": {}}, hit("full", [1.0, 0.0], 0.1)]
+    assert [h["_id"] for h in rescore([1.0, 0.0], hits, k=2)] == ["full", "plain"]